@@ -0,0 +1,195 @@
+from celery import current_app
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+from django.utils.timezone import now
+
+from core.constants import ATTEMPT_TOKEN_OPTION, IN_FLIGHT_STATUSES, STATUS_CANCELED
+from core.models import (
+    PendingDispatch,
+    ScheduledTask,
+    TaskError,
+    TaskMeta,
+    WebhookDelivery,
+)
+from core.registry import task_registry
+from core.utils import get_time_limits
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the number of rows from PostgreSQL statistics instead of COUNT(*)
+
+    Unfiltered querysets use `pg_class.reltuples`, filtered ones use the planner estimate. Exact count is used only
+    when the estimate is below ADMIN_EXACT_COUNT_THRESHOLD.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        estimate = self.get_estimate()
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+    def get_estimate(self):
+        """Returns estimated number of rows or None if there are no statistics"""
+
+        query = self.object_list.query
+        with connection.cursor() as cursor:
+            if not query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+
+            try:
+                sql, params = query.chain().sql_with_params()
+            except EmptyResultSet:
+                return 0
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            return plan[0]["Plan"]["Plan Rows"]
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """Filters by exact username (uses indexes instead of listing all users)"""
+
+    title = "user"
+    parameter_name = "username"
+    template = "admin/input_filter.html"
+
+    def lookups(self, request, model_admin):
+        # The filter is rendered as a text input, but Django shows filters with lookups only
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(user__username=self.value())
+        return queryset
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Base admin class for the large tables: no COUNT(*) on page load and exact id search only"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_help_text = "Exact ID"
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        try:
+            return queryset.filter(pk=self.model._meta.pk.to_python(search_term)), False
+        except ValidationError:
+            return queryset.none(), False
+
+
+@admin.register(TaskMeta)
+class TaskMetaAdmin(ScalableModelAdmin):
+    """Admin view for TaskMeta"""
+
+    list_display = ("id", "name", "type", "status", "user", "created_at", "finished_at")
+    list_select_related = ("user",)
+    list_filter = ("status", ("created_at", admin.DateFieldListFilter), UsernameFilter)
+    ordering = ("-created_at",)
+    sortable_by = ("created_at",)
+    search_fields = ("id",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("id", "created_at")
+    actions = ("cancel_tasks", "requeue_tasks")
+
+    @admin.action(description="Cancel selected tasks")
+    def cancel_tasks(self, request, queryset):
+        """Cancels tasks with a single UPDATE and revokes them with a single broadcast"""
+
+        cancelable_statuses = [
+            status
+            for status, next_statuses in TaskMeta.available_statuses_map.items()
+            if STATUS_CANCELED in next_statuses
+        ]
+        with transaction.atomic():
+            tasks = list(
+                queryset.filter(status__in=cancelable_statuses)
+                .select_related(None)
+                .select_for_update()
+                .only("id", "name", "result", "callback_url")
+            )
+            task_ids = [task.id for task in tasks]
+            finished_at = now()
+            TaskMeta.objects.filter(id__in=task_ids).update(status=STATUS_CANCELED, finished_at=finished_at)
+            ScheduledTask.objects.filter(task_id__in=task_ids).delete()
+            PendingDispatch.objects.filter(task_id__in=task_ids).delete()
+            for task in tasks:
+                task.status, task.finished_at = STATUS_CANCELED, finished_at
+            WebhookDelivery.objects.bulk_create(WebhookDelivery.for_task(task) for task in tasks if task.callback_url)
+        if task_ids:
+            current_app.control.revoke([str(task_id) for task_id in task_ids])
+        self.message_user(request, f"{len(task_ids)} tasks have been canceled.", messages.SUCCESS)
+
+    @admin.action(description="Requeue selected failed tasks")
+    def requeue_tasks(self, request, queryset):
+        """
+        Moves failed tasks back to RETRY_PENDING with a single UPDATE and publishes them again
+
+        Every requeued task gets a new attempt token, so only the new message can start it. Tasks whose duplicate
+        (with the same dedup key) is in flight are skipped.
+        """
+
+        with transaction.atomic():
+            tasks = list(
+                queryset.filter(status__in=TaskMeta.requeue_statuses_map)
+                .select_related(None)
+                .select_for_update()
+                .only("id", "type", "kwargs", "status", "dedup_key")
+            )
+            in_flight_keys = set(
+                TaskMeta.objects.filter(
+                    dedup_key__in={task.dedup_key for task in tasks if task.dedup_key}, status__in=IN_FLIGHT_STATUSES
+                ).values_list("dedup_key", flat=True)
+            )
+            requeued = []
+            for task in tasks:
+                if task.dedup_key is not None:
+                    if task.dedup_key in in_flight_keys:
+                        continue
+                    in_flight_keys.add(task.dedup_key)
+                task.set_requeued()
+                requeued.append(task)
+            TaskMeta.objects.bulk_update(requeued, ["status", "next_retry_at", "attempt_token"])
+            ScheduledTask.objects.filter(task_id__in=[task.id for task in requeued]).delete()
+            transaction.on_commit(lambda: self.publish_tasks(requeued))
+        self.message_user(request, f"{len(requeued)} tasks have been requeued.", messages.SUCCESS)
+        if len(requeued) < len(tasks):
+            self.message_user(
+                request,
+                f"{len(tasks) - len(requeued)} tasks have been skipped, since their duplicates are in flight.",
+                messages.WARNING,
+            )
+
+    @staticmethod
+    def publish_tasks(tasks: list):
+        with current_app.producer_or_acquire() as producer:
+            for task in tasks:
+                task_registry.get(task.type).task.apply_async(
+                    kwargs={**task.kwargs, ATTEMPT_TOKEN_OPTION: str(task.attempt_token)},
+                    task_id=str(task.id),
+                    producer=producer,
+                    **get_time_limits(task.kwargs),
+                )
+
+
+@admin.register(TaskError)
+class TaskErrorAdmin(ScalableModelAdmin):
+    """Admin view for TaskError"""
+
+    list_display = ("id", "task_id", "message", "created_at")
+    ordering = ("-id",)
+    sortable_by = ("id",)
+    search_fields = ("id",)
+    raw_id_fields = ("task",)
+    readonly_fields = ("created_at",)
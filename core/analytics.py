@@ -0,0 +1,229 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from core.constants import (
+    ROLLUP_GRANULARITY_DAY,
+    ROLLUP_GRANULARITY_HOUR,
+    ROLLUP_GRANULARITY_MINUTE,
+    TERMINAL_STATUSES,
+)
+from core.models import RollupWatermark, TaskMeta, TaskRollup
+
+# Durations (in milliseconds) are counted in log-scaled buckets (HISTOGRAM_GAMMA ** (i - 1), HISTOGRAM_GAMMA ** i],
+# so percentiles computed from a histogram are within 2.5% of the exact values and histograms merge by adding counts
+HISTOGRAM_GAMMA = 1.05
+PERCENTILES = (50, 95)
+
+TASK_ROLLUP_WATERMARK = "task_rollup"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+RollupKey = Tuple[str, datetime, str, str]
+
+# Tasks finished in the range are aggregated per minute, name, status and histogram bucket of both durations
+FINISHED_TASKS_QUERY = """
+    SELECT date_trunc('minute', finished_at), name, status,
+           ceil(ln(greatest(extract(epoch FROM finished_at - started_at) * 1000, 1)) / ln(%(gamma)s))::int,
+           ceil(ln(greatest(extract(epoch FROM started_at - created_at) * 1000, 1)) / ln(%(gamma)s))::int,
+           count(*),
+           coalesce(sum(extract(epoch FROM finished_at - started_at) * 1000), 0)::float8,
+           coalesce(sum(extract(epoch FROM started_at - created_at) * 1000), 0)::float8
+    FROM {table}
+    WHERE finished_at > %(since)s AND finished_at <= %(until)s AND status IN %(statuses)s {condition}
+    GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def get_histogram_index(value: float) -> int:
+    """Returns the histogram bucket of the duration in milliseconds"""
+
+    return math.ceil(math.log(max(value, 1)) / math.log(HISTOGRAM_GAMMA))
+
+
+def merge_histograms(*histograms: Dict[str, int]) -> Dict[str, int]:
+    """Returns the histogram of all the durations counted by the histograms"""
+
+    merged = {}
+    for histogram in histograms:
+        for index, count in histogram.items():
+            merged[index] = merged.get(index, 0) + count
+    return merged
+
+
+def get_percentile(histogram: Dict[str, int], percent: float) -> Optional[float]:
+    """
+    Returns the estimated percentile of the durations counted by the histogram
+
+    :param histogram: numbers of durations per bucket
+    :param percent: percentile (0 - 100)
+    :return: duration in milliseconds (None if the histogram is empty)
+    """
+
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank, seen = percent / 100 * total, 0
+    for index in sorted(histogram, key=int):
+        seen += histogram[index]
+        if seen >= rank:
+            break
+    # the value minimizing the relative error within the bucket
+    return 2 * HISTOGRAM_GAMMA ** int(index) / (HISTOGRAM_GAMMA + 1)
+
+
+def get_duration_summary(total: float, histogram: Dict[str, int]) -> dict:
+    """Returns mean and percentiles of the durations"""
+
+    count = sum(histogram.values())
+    return {
+        "avg": total / count if count else None,
+        **{f"p{percent}": get_percentile(histogram, percent) for percent in PERCENTILES},
+    }
+
+
+def get_buckets(minute: datetime) -> Iterable[Tuple[str, datetime]]:
+    """Returns the time buckets of all the granularities containing the minute"""
+
+    yield ROLLUP_GRANULARITY_MINUTE, minute
+    yield ROLLUP_GRANULARITY_HOUR, minute.replace(minute=0)
+    yield ROLLUP_GRANULARITY_DAY, minute.replace(hour=0, minute=0)
+
+
+def add_to_rollup(rollup: TaskRollup, other: TaskRollup):
+    """Adds the tasks counted by the other rollup"""
+
+    rollup.count += other.count
+    rollup.run_time_sum += other.run_time_sum
+    rollup.run_time_histogram = merge_histograms(rollup.run_time_histogram, other.run_time_histogram)
+    rollup.queue_wait_sum += other.queue_wait_sum
+    rollup.queue_wait_histogram = merge_histograms(rollup.queue_wait_histogram, other.queue_wait_histogram)
+
+
+def get_totals(rollups: Iterable[TaskRollup]) -> List[TaskRollup]:
+    """Returns the sums of the rollups per name and status"""
+
+    totals = {}
+    for rollup in rollups:
+        key = (rollup.name, rollup.status)
+        if key not in totals:
+            totals[key] = TaskRollup(name=rollup.name, status=rollup.status)
+        add_to_rollup(totals[key], rollup)
+    return list(totals.values())
+
+
+def aggregate_finished_tasks(
+    since: datetime, until: datetime, task_ids: Optional[List[str]] = None
+) -> Dict[RollupKey, TaskRollup]:
+    """
+    Aggregates the tasks finished in the time range
+
+    :param since: start of the range (exclusive)
+    :param until: end of the range (inclusive)
+    :param task_ids: aggregate only these tasks (all the tasks by default)
+    :return: unsaved rollups of all the granularities
+    """
+
+    rollups = {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            FINISHED_TASKS_QUERY.format(
+                table=connection.ops.quote_name(TaskMeta._meta.db_table),
+                condition="" if task_ids is None else "AND id = ANY(%(task_ids)s::uuid[])",
+            ),
+            {
+                "gamma": HISTOGRAM_GAMMA,
+                "since": since,
+                "until": until,
+                "statuses": TERMINAL_STATUSES,
+                "task_ids": task_ids,
+            },
+        )
+        for minute, name, status, run_time_index, queue_wait_index, count, run_time_sum, queue_wait_sum in cursor:
+            # tasks canceled before the start have no durations
+            part = TaskRollup(
+                count=count,
+                run_time_sum=run_time_sum,
+                run_time_histogram={} if run_time_index is None else {str(run_time_index): count},
+                queue_wait_sum=queue_wait_sum,
+                queue_wait_histogram={} if queue_wait_index is None else {str(queue_wait_index): count},
+            )
+            for granularity, bucket in get_buckets(minute):
+                key = (granularity, bucket, name, status)
+                if key not in rollups:
+                    rollups[key] = TaskRollup(granularity=granularity, bucket=bucket, name=name, status=status)
+                add_to_rollup(rollups[key], part)
+    return rollups
+
+
+def save_rollups(rollups: Dict[RollupKey, TaskRollup]):
+    """Adds the aggregated tasks to the stored rollups"""
+
+    if not rollups:
+        return
+    # the rollups of the aggregated range (and a few other ones of the same names started since the day of its start)
+    stored_rollups = [
+        rollup
+        for rollup in TaskRollup.objects.select_for_update().filter(
+            bucket__gte=min(bucket for _, bucket, _, _ in rollups), name__in={name for _, _, name, _ in rollups}
+        )
+        if (rollup.granularity, rollup.bucket, rollup.name, rollup.status) in rollups
+    ]
+    for rollup in stored_rollups:
+        add_to_rollup(rollup, rollups.pop((rollup.granularity, rollup.bucket, rollup.name, rollup.status)))
+    TaskRollup.objects.bulk_update(
+        stored_rollups,
+        ["count", "run_time_sum", "run_time_histogram", "queue_wait_sum", "queue_wait_histogram"],
+        batch_size=1000,
+    )
+    TaskRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+def refresh_rollups(until: Optional[datetime] = None) -> int:
+    """
+    Aggregates the tasks finished since the watermark into the rollups and moves the watermark
+
+    Tasks finished within the last ANALYTICS_REFRESH_DELAY seconds are left for the next refresh, since their
+    transactions (or write-behind transitions) may be not applied yet.
+
+    :param until: new watermark
+    :return: number of updated rollups
+    """
+
+    until = until or now() - timedelta(seconds=settings.ANALYTICS_REFRESH_DELAY)
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=TASK_ROLLUP_WATERMARK, defaults={"finished_at": EPOCH}
+        )
+        if until <= watermark.finished_at:
+            return 0
+        rollups = aggregate_finished_tasks(watermark.finished_at, until)
+        updated = len(rollups)
+        save_rollups(rollups)
+        watermark.finished_at = until
+        watermark.save()
+    return updated
+
+
+def add_to_rollups(task_ids: List[str]) -> int:
+    """
+    Aggregates the tasks finished before the watermark (e.g. imported ones) into the rollups
+
+    Must be called in the transaction creating the tasks. The watermark lock is held until the commit, so the tasks
+    finished later are aggregated by the next refresh exactly once.
+
+    :param task_ids: ids of the new finished tasks
+    :return: number of updated rollups
+    """
+
+    watermark = RollupWatermark.objects.select_for_update().filter(name=TASK_ROLLUP_WATERMARK).first()
+    if watermark is None or not task_ids:
+        # nothing has been aggregated yet, the first refresh aggregates all the tasks
+        return 0
+    rollups = aggregate_finished_tasks(EPOCH, watermark.finished_at, task_ids)
+    updated = len(rollups)
+    save_rollups(rollups)
+    return updated
@@ -0,0 +1,273 @@
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from celery import current_app
+from celery.worker.autoscale import Autoscaler
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Avg, Count, F
+from django.utils.timezone import now
+from kombu.exceptions import OperationalError
+from redis import RedisError
+
+from core.constants import STATUS_PENDING
+from core.metrics import (
+    QUEUE_DEPTH,
+    QUEUE_OLDEST_PENDING_AGE,
+    RECOMMENDED_CONCURRENCY,
+    WORKER_BUSY_RATIO,
+    WORKER_CONCURRENCY,
+)
+from core.models import TaskMeta
+from core.redis_client import get_redis
+from core.registry import task_registry
+
+logger = logging.getLogger(__name__)
+
+# hash of the recommended concurrency of a worker consuming the queue by queue name
+RECOMMENDATIONS_KEY = "autoscale_recommendations"
+
+
+class QueueSample(NamedTuple):
+    """State of a queue and the workers consuming it"""
+
+    queue: str
+    # messages waiting in the broker
+    depth: int
+    # seconds since the creation of the oldest pending task (None if there are no pending tasks)
+    oldest_pending_age: Optional[float]
+    # tasks run by the workers consuming the queue
+    busy: int
+    # pool size of the workers consuming the queue
+    concurrency: int
+    workers: int
+    # average run time (in seconds) of the recently finished tasks (None if no task has been finished)
+    run_time: Optional[float]
+
+    @property
+    def busy_ratio(self) -> float:
+        return self.busy / self.concurrency if self.concurrency else 0.0
+
+
+def get_queue_depths(connection, queues: Iterable[str]) -> Dict[str, int]:
+    """Returns numbers of the messages ready in the broker queues (0 if the queue isn't declared)"""
+
+    depths = {}
+    for queue in queues:
+        try:
+            with connection.channel() as channel:
+                depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+        except connection.channel_errors:
+            depths[queue] = 0
+    return depths
+
+
+def get_queue_task_types(queues: Iterable[str]) -> Dict[str, List[str]]:
+    """Returns the task types of the queues"""
+
+    return {
+        queue: [name for name, task_type in task_registry.types.items() if task_type.queue == queue] for queue in queues
+    }
+
+
+def get_oldest_pending_age(task_types: List[str]) -> Optional[float]:
+    """
+    Returns seconds since the creation of the oldest pending task of the types
+
+    The query reads the (status, created_at) index up to the first task of the types. Tasks waiting for a delayed
+    start or for the fair-share dispatcher aren't in the broker yet, so they are skipped.
+    """
+
+    created_at = (
+        TaskMeta.objects.filter(
+            status=STATUS_PENDING, type__in=task_types, schedule__isnull=True, pending_dispatch__isnull=True
+        )
+        .order_by("created_at")
+        .values_list("created_at", flat=True)
+        .first()
+    )
+    return (now() - created_at).total_seconds() if created_at else None
+
+
+def get_run_times(window: int) -> Dict[str, Tuple[int, float]]:
+    """
+    Returns numbers and average run times (in seconds) of the tasks finished within the window per task type
+
+    :param window: window in seconds
+    """
+
+    rows = (
+        TaskMeta.objects.filter(finished_at__gte=now() - timedelta(seconds=window), started_at__isnull=False)
+        .values("type")
+        .annotate(count=Count("id"), run_time=Avg(F("finished_at") - F("started_at")))
+        .values_list("type", "count", "run_time")
+    )
+    return {task_type: (count, run_time.total_seconds()) for task_type, count, run_time in rows}
+
+
+def get_worker_stats(app, timeout: float) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Inspects the workers
+
+    :param app: Celery app
+    :param timeout: time in seconds to wait for the replies
+    :return: numbers of the running tasks, pool slots and workers per consumed queue
+    """
+
+    inspect = app.control.inspect(timeout=timeout)
+    active_queues = inspect.active_queues() or {}
+    stats = inspect.stats() or {}
+    active = inspect.active() or {}
+
+    queue_stats = {}
+    for worker, queues in active_queues.items():
+        concurrency = stats.get(worker, {}).get("pool", {}).get("max-concurrency", 0)
+        for queue in queues:
+            busy, slots, workers = queue_stats.get(queue["name"], (0, 0, 0))
+            queue_stats[queue["name"]] = (busy + len(active.get(worker, [])), slots + concurrency, workers + 1)
+    return queue_stats
+
+
+def recommend_concurrency(sample: QueueSample) -> int:
+    """
+    Returns total concurrency of the workers consuming the queue
+
+    The running tasks take busy / AUTOSCALE_TARGET_BUSY_RATIO slots (the rest is the headroom for the arriving
+    tasks) and the backlog of depth tasks taking run_time seconds each is drained within AUTOSCALE_TARGET_WAIT by
+    depth * run_time / AUTOSCALE_TARGET_WAIT slots (a slot per message until the run time is measured). If the
+    oldest pending task has already waited longer, at least one slot is added to the current concurrency.
+    """
+
+    run_time = settings.AUTOSCALE_TARGET_WAIT if sample.run_time is None else sample.run_time
+    recommended = math.ceil(sample.busy / settings.AUTOSCALE_TARGET_BUSY_RATIO) + math.ceil(
+        sample.depth * run_time / settings.AUTOSCALE_TARGET_WAIT
+    )
+    if sample.depth and (sample.oldest_pending_age or 0) > settings.AUTOSCALE_TARGET_WAIT:
+        recommended = max(recommended, sample.concurrency + 1)
+    return min(max(recommended, settings.AUTOSCALE_MIN_CONCURRENCY), settings.AUTOSCALE_MAX_CONCURRENCY)
+
+
+class BacklogMonitor:
+    """
+    Samples the queues and publishes the metrics and the recommended worker concurrency
+
+    Recommendations (per worker consuming the queue) are stored in Redis for the BacklogAutoscaler and expire after
+    a few missed samples, so the workers fall back to the default autoscaling if the monitor stops.
+    """
+
+    inspect_timeout = 1.0
+
+    def __init__(self, app=None, queues: Optional[List[str]] = None):
+        self.app = app or current_app
+        self.queues = queues or settings.AUTOSCALE_QUEUES
+
+    def sample(self, connection) -> List[QueueSample]:
+        """
+        Returns the state of the queues
+
+        :param connection: broker connection
+        """
+
+        depths = get_queue_depths(connection, self.queues)
+        worker_stats = get_worker_stats(self.app, self.inspect_timeout)
+        run_times = get_run_times(settings.AUTOSCALE_RUN_TIME_WINDOW)
+
+        samples = []
+        for queue, task_types in get_queue_task_types(self.queues).items():
+            finished = [run_times[task_type] for task_type in task_types if task_type in run_times]
+            finished_count = sum(count for count, _ in finished)
+            samples.append(
+                QueueSample(
+                    queue,
+                    depths[queue],
+                    get_oldest_pending_age(task_types) if task_types else None,
+                    *worker_stats.get(queue, (0, 0, 0)),
+                    sum(count * run_time for count, run_time in finished) / finished_count if finished_count else None,
+                )
+            )
+        return samples
+
+    def publish(self, samples: List[QueueSample]) -> Dict[str, int]:
+        """
+        Publishes the metrics and the recommendations of the samples
+
+        :return: recommended total concurrency by queue
+        """
+
+        recommendations = {}
+        for sample in samples:
+            recommendations[sample.queue] = recommend_concurrency(sample)
+            QUEUE_DEPTH.labels(queue=sample.queue).set(sample.depth)
+            QUEUE_OLDEST_PENDING_AGE.labels(queue=sample.queue).set(sample.oldest_pending_age or 0)
+            WORKER_BUSY_RATIO.labels(queue=sample.queue).set(sample.busy_ratio)
+            WORKER_CONCURRENCY.labels(queue=sample.queue).set(sample.concurrency)
+            RECOMMENDED_CONCURRENCY.labels(queue=sample.queue).set(recommendations[sample.queue])
+
+        per_worker = {
+            sample.queue: math.ceil(recommendations[sample.queue] / max(sample.workers, 1)) for sample in samples
+        }
+        if per_worker:
+            get_redis().pipeline().hset(RECOMMENDATIONS_KEY, mapping=per_worker).expire(
+                RECOMMENDATIONS_KEY, 3 * settings.AUTOSCALE_MONITOR_INTERVAL
+            ).execute()
+        return recommendations
+
+    def run(self, interval: Optional[int] = None):
+        """Samples the queues until interrupted"""
+
+        interval = interval or settings.AUTOSCALE_MONITOR_INTERVAL
+        while True:
+            started_at = time.monotonic()
+            connection = self.app.connection_for_read()
+            try:
+                with connection:
+                    recommendations = self.publish(self.sample(connection))
+                logger.info(f"Recommended concurrency: {recommendations}")
+            except (OperationalError, RedisError, DatabaseError, *connection.connection_errors) as error:
+                logger.warning(f"Failed to sample the queues: {error}")
+            time.sleep(max(interval - (time.monotonic() - started_at), 0))
+
+
+def get_recommendation(queues: List[str]) -> Optional[int]:
+    """Returns recommended concurrency of a worker consuming the queues (None if there are no recommendations)"""
+
+    try:
+        values = [int(value) for value in get_redis().hmget(RECOMMENDATIONS_KEY, queues) if value is not None]
+    except RedisError as error:
+        logger.warning(f"Failed to get the recommended concurrency: {error}")
+        return None
+    return sum(values) if values else None
+
+
+class BacklogAutoscaler(Autoscaler):
+    """
+    Celery autoscaler resizing the pool to the concurrency recommended by the BacklogMonitor
+
+    Enabled with `WORKER_AUTOSCALER=core.autoscaling:BacklogAutoscaler` and the `--autoscale=max,min` option of the
+    worker. The recommendation is limited by max and min, and the pool shrinks at most once per keepalive period
+    after the start or the last growth. Without a recommendation the pool is resized by the number of the reserved
+    tasks as the default autoscaler does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last_scale_up = time.monotonic()
+
+    @property
+    def queues(self) -> List[str]:
+        return list(self.worker.app.amqp.queues.consume_from)
+
+    def _maybe_scale(self, req=None):
+        recommended = get_recommendation(self.queues)
+        if recommended is None:
+            return super()._maybe_scale(req)
+        target = min(max(recommended, self.min_concurrency), self.max_concurrency)
+        if target > self.processes:
+            self.scale_up(target - self.processes)
+            return True
+        if target < self.processes:
+            self.scale_down(self.processes - target)
+            return True
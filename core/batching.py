@@ -0,0 +1,72 @@
+import logging
+from typing import List, NamedTuple, Optional
+
+from celery import current_app
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from kombu import Connection
+from kombu.message import Message
+
+logger = logging.getLogger(__name__)
+
+BATCH_OPTION = "batch"
+BATCHED_TASK_NAME = "core.tasks.sample_task"
+
+
+class TaskMessage(NamedTuple):
+    """Celery task message pulled from the batch queue"""
+
+    message: Message
+    task_id: str
+    args: list
+    kwargs: dict
+    retries: int
+    eta: Optional[str]
+
+    @property
+    def is_due(self) -> bool:
+        return self.eta is None or parse_datetime(self.eta).timestamp() <= current_app.now().timestamp()
+
+
+def route_task(name, args, kwargs, options, task=None, **kw) -> Optional[dict]:
+    """Celery router sending the tasks submitted with the `batch` option to the batch queue"""
+
+    if name == BATCHED_TASK_NAME and kwargs and kwargs.get(BATCH_OPTION):
+        return {"queue": settings.TASK_BATCH_QUEUE}
+    return None
+
+
+def pull_task_messages(connection: Connection, size: int) -> List[TaskMessage]:
+    """
+    Pulls up to `size` task messages from the batch queue without acknowledging them
+
+    Messages of other tasks are rejected (they are not routed to the batch queue).
+
+    :param connection: broker connection, unacknowledged messages are returned to the queue when it's closed
+    :param size: maximum number of messages
+    :return: pulled task messages
+    """
+
+    queue = current_app.amqp.queues[settings.TASK_BATCH_QUEUE](connection.default_channel)
+    queue.declare()
+    task_messages = []
+    while len(task_messages) < size:
+        message = queue.get(no_ack=False, accept=current_app.conf.accept_content)
+        if message is None:
+            break
+        if message.headers.get("task") != BATCHED_TASK_NAME:
+            logger.error(f"Unexpected task message {message.headers.get('task')} in the batch queue.")
+            message.reject()
+            continue
+        args, kwargs, _ = message.decode()
+        task_messages.append(
+            TaskMessage(
+                message=message,
+                task_id=message.headers["id"],
+                args=args,
+                kwargs=kwargs,
+                retries=message.headers.get("retries") or 0,
+                eta=message.headers.get("eta"),
+            )
+        )
+    return task_messages
@@ -0,0 +1,336 @@
+import csv
+import logging
+import uuid
+from contextlib import suppress
+from datetime import timezone
+from io import StringIO
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+import orjson
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from core.analytics import add_to_rollups
+from core.constants import DEFAULT_TASK_TYPE, TERMINAL_STATUSES
+from core.exceptions import ImportRecordException
+from core.models import ImportCheckpoint, TaskError, TaskMeta
+from core.registry import task_registry
+from core.utils import uuid7
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+# columns of the COPY statements, the rest of the TaskError columns are filled by the database
+TASK_COLUMNS = (
+    "id",
+    "user_id",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "next_retry_at",
+    "result",
+    "name",
+    "type",
+    "kwargs",
+    "callback_url",
+    "dedup_key",
+    "progress",
+    "progress_message",
+    "status",
+)
+ERROR_COLUMNS = ("task_id", "message", "traceback", "created_at")
+
+# PostgreSQL COPY text format escapes
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+Row = Tuple[Optional[str], ...]
+
+
+class ImportResult(NamedTuple):
+    """Numbers of the records processed by the bulk import"""
+
+    records: int
+    tasks: int
+    errors: int
+    skipped: int
+
+
+def read_records(file: IO[str], input_format: str, skip: int = 0) -> Iterator[Tuple[int, Union[str, dict]]]:
+    """
+    Reads raw task records lazily
+
+    :param file: input file
+    :param input_format: one of FORMATS
+    :param skip: number of the records already loaded (they are not returned)
+    :return: record numbers (starting from 1) and NDJSON lines or CSV rows
+    """
+
+    if input_format == FORMAT_CSV:
+        records = enumerate(csv.DictReader(file), 1)
+    else:
+        records = enumerate((line for line in file if line.strip()), 1)
+    for number, record in records:
+        if number > skip:
+            yield number, record
+
+
+def parse_record(record: Union[str, dict]) -> dict:
+    """
+    Parses the raw record
+
+    NDJSON records are objects with the TaskMeta fields, `username` and `errors` (list of objects with `message`,
+    `traceback` and `created_at`). CSV records have the same columns, `kwargs` and `errors` hold JSON.
+    """
+
+    try:
+        if isinstance(record, str):
+            record = orjson.loads(record)
+            if not isinstance(record, dict):
+                raise ImportRecordException("The record is not an object.")
+            return record
+        record = {field: value for field, value in record.items() if value != ""}
+        for field in ("kwargs", "errors"):
+            if field in record:
+                record[field] = orjson.loads(record[field])
+        return record
+    except orjson.JSONDecodeError as error:
+        raise ImportRecordException(f"Invalid JSON: {error}.")
+
+
+def format_copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(table: str, columns: Tuple[str, ...], rows: List[Row]):
+    """Loads the rows into the table with COPY (text format)"""
+
+    if not rows:
+        return
+    buffer = StringIO()
+    for row in rows:
+        buffer.write("\t".join(map(format_copy_value, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {connection.ops.quote_name(table)} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+class TaskImporter:
+    """
+    Loads historical tasks and their errors with PostgreSQL COPY
+
+    The input is processed in chunks of `chunk_size` records: users are resolved with one query per chunk and the
+    rows of the chunk are copied in a transaction advancing the ImportCheckpoint of the source, so memory use is
+    bounded by the chunk and a rerun with the same source continues after the last loaded chunk. The loaded tasks
+    are added to the analytics rollups in the same transaction.
+    """
+
+    def __init__(self, source: str, chunk_size: int = 10000, skip_invalid: bool = False):
+        """
+        :param source: checkpoint name of the input (e.g. its path)
+        :param chunk_size: number of records loaded in a transaction
+        :param skip_invalid: skip invalid records instead of stopping the import
+        """
+
+        self.source = source
+        self.chunk_size = chunk_size
+        self.skip_invalid = skip_invalid
+
+    def get_checkpoint(self) -> int:
+        """Returns number of the records already loaded from the source"""
+
+        checkpoint = ImportCheckpoint.objects.filter(source=self.source).first()
+        return checkpoint.records if checkpoint else 0
+
+    @staticmethod
+    def parse_datetime(record: dict, field: str, required: bool = False):
+        value = record.get(field)
+        if value is None:
+            if required:
+                raise ImportRecordException(f"{field} is required.")
+            return None
+        try:
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ImportRecordException(f"{field} {value!r} is not a valid datetime.")
+        return make_aware(parsed, timezone.utc) if is_naive(parsed) else parsed
+
+    @staticmethod
+    def truncate(value: Optional[str], field: str, model=TaskMeta) -> str:
+        """Validates the text and truncates it to the maximum length of the field"""
+
+        if value is None:
+            return ""
+        if not isinstance(value, str):
+            raise ImportRecordException(f"{field} {value!r} is not a string.")
+        return value[: model._meta.get_field(field).max_length]
+
+    @staticmethod
+    def get_task_id(record: dict) -> Optional[uuid.UUID]:
+        """Returns the id of the record (None if it isn't set)"""
+
+        if not record.get("id"):
+            return None
+        try:
+            return uuid.UUID(str(record["id"]))
+        except ValueError:
+            raise ImportRecordException(f"Invalid id {record['id']!r}.")
+
+    @staticmethod
+    def get_callback_url(record: dict) -> str:
+        """Validates the callback URL as the TaskMeta field does (COPY doesn't run the validators)"""
+
+        url = record.get("callback_url") or ""
+        if not url:
+            return url
+        if not isinstance(url, str):
+            raise ImportRecordException(f"Invalid callback_url {url!r}.")
+        try:
+            TaskMeta._meta.get_field("callback_url").run_validators(url)
+        except ValidationError:
+            raise ImportRecordException(f"Invalid callback_url {url!r}.")
+        return url
+
+    def get_rows(self, record: dict, user_ids: Dict[str, int], taken_ids: Set[uuid.UUID]) -> Tuple[Row, List[Row]]:
+        """
+        Validates the record
+
+        :param user_ids: ids of the users of the chunk by username
+        :param taken_ids: ids of the tasks already existing or loaded by the chunk
+        :return: TaskMeta row and TaskError rows
+        """
+
+        # imported tasks aren't published to the broker, so in-flight ones would never be finished
+        status = record.get("status")
+        if status not in TERMINAL_STATUSES:
+            raise ImportRecordException(f"Invalid status {status!r}, only finished tasks can be imported.")
+        name = record.get("name")
+        if not isinstance(name, str) or not name or len(name) > TaskMeta._meta.get_field("name").max_length:
+            raise ImportRecordException(f"Invalid name {name!r}.")
+        user_id = user_ids.get(record.get("username"))
+        if user_id is None:
+            raise ImportRecordException(f"Unknown user {record.get('username')!r}.")
+        task_id = self.get_task_id(record) or uuid7()
+        if task_id in taken_ids:
+            raise ImportRecordException(f"Task {task_id} already exists.")
+        task_type = record.get("type") or DEFAULT_TASK_TYPE
+        if task_type not in task_registry.types:
+            raise ImportRecordException(f"Unknown type {task_type!r}.")
+        callback_url = self.get_callback_url(record)
+        created_at = self.parse_datetime(record, "created_at", required=True)
+        kwargs = record.get("kwargs") or {}
+        if not isinstance(kwargs, dict):
+            raise ImportRecordException("kwargs must be an object.")
+        errors = record.get("errors") or []
+        if not isinstance(errors, list) or not all(isinstance(error, dict) for error in errors):
+            raise ImportRecordException("errors must be a list of objects.")
+        # finished tasks are aggregated into the duration rollups
+        started_at = self.parse_datetime(record, "started_at")
+        finished_at = self.parse_datetime(record, "finished_at", required=True)
+        if started_at is not None and finished_at < started_at:
+            raise ImportRecordException("finished_at is earlier than started_at.")
+        next_retry_at = self.parse_datetime(record, "next_retry_at")
+
+        task_row = (
+            str(task_id),
+            str(user_id),
+            created_at.isoformat(),
+            *(value and value.isoformat() for value in (started_at, finished_at, next_retry_at)),
+            self.truncate(record.get("result"), "result"),
+            name,
+            task_type,
+            orjson.dumps(kwargs).decode(),
+            callback_url,
+            None,
+            "0",
+            "",
+            status,
+        )
+        error_rows = [
+            (
+                str(task_id),
+                self.truncate(error.get("message"), "message", TaskError),
+                self.truncate(error.get("traceback"), "traceback", TaskError),
+                (self.parse_datetime(error, "created_at") or created_at).isoformat(),
+            )
+            for error in errors
+        ]
+        return task_row, error_rows
+
+    def load_chunk(self, chunk: List[Tuple[int, Union[str, dict]]]) -> ImportResult:
+        """Loads the chunk of raw records and advances the checkpoint"""
+
+        records, skipped = [], 0
+        for number, record in chunk:
+            try:
+                records.append((number, parse_record(record)))
+            except ImportRecordException as error:
+                skipped += self.handle_invalid_record(number, error)
+
+        usernames = {record.get("username") for _, record in records} - {None}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        # duplicate ids would fail the COPY of the whole chunk, so they are checked with one query per chunk
+        task_ids = set()
+        for _, record in records:
+            with suppress(ImportRecordException):
+                task_ids.add(self.get_task_id(record))
+        taken_ids = set(TaskMeta.objects.filter(id__in=task_ids - {None}).values_list("id", flat=True))
+        task_rows, error_rows = [], []
+        for number, record in records:
+            try:
+                task_row, task_error_rows = self.get_rows(record, user_ids, taken_ids)
+            except ImportRecordException as error:
+                skipped += self.handle_invalid_record(number, error)
+                continue
+            taken_ids.add(uuid.UUID(task_row[0]))
+            task_rows.append(task_row)
+            error_rows.extend(task_error_rows)
+
+        with transaction.atomic():
+            copy_rows(TaskMeta._meta.db_table, TASK_COLUMNS, task_rows)
+            copy_rows(TaskError._meta.db_table, ERROR_COLUMNS, error_rows)
+            # the tasks finished before the rollup watermark would be missed by the rollup refreshes
+            add_to_rollups([task_row[0] for task_row in task_rows])
+            ImportCheckpoint.objects.update_or_create(source=self.source, defaults={"records": chunk[-1][0]})
+        return ImportResult(len(chunk), len(task_rows), len(error_rows), skipped)
+
+    def handle_invalid_record(self, number: int, error: ImportRecordException) -> int:
+        """
+        Stops the import (records of the chunk aren't loaded) or skips the invalid record
+
+        :return: number of skipped records
+        """
+
+        if not self.skip_invalid:
+            raise ImportRecordException(f"Record {number}: {error}")
+        logger.warning(f"Record {number} is skipped: {error}")
+        return 1
+
+    def run(self, file: IO[str], input_format: str) -> ImportResult:
+        """
+        Loads the records of the input not loaded yet
+
+        :param file: input file
+        :param input_format: one of FORMATS
+        """
+
+        result = ImportResult(0, 0, 0, 0)
+        chunk = []
+        for record in read_records(file, input_format, skip=self.get_checkpoint()):
+            chunk.append(record)
+            if len(chunk) == self.chunk_size:
+                result = ImportResult(*map(sum, zip(result, self.load_chunk(chunk))))
+                chunk = []
+        if chunk:
+            result = ImportResult(*map(sum, zip(result, self.load_chunk(chunk))))
+        return result
@@ -13,3 +13,52 @@ STATUS_CHOICES = [
     (STATUS_RETRY_PENDING, "Retry Pending"),
     (STATUS_CANCELED, "Canceled"),
 ]
+
+# Final statuses of the task, completion webhooks are sent on transitions to them
+TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELED)
+# Statuses of the tasks which are still going to run, identical submissions are attached to them in dedup mode
+IN_FLIGHT_STATUSES = (STATUS_PENDING, STATUS_IN_PROGRESS, STATUS_RETRY_PENDING)
+
+# Execution styles of the task types, every style has its own queue consumed by a worker with the matching pool:
+# processes (prefork) for CPU-bound tasks, threads for I/O-bound ones and inline (solo) for quick ones
+EXECUTION_PROCESSES = "processes"
+EXECUTION_THREADS = "threads"
+EXECUTION_INLINE = "inline"
+
+EXECUTION_CHOICES = [
+    (EXECUTION_PROCESSES, "Process pool"),
+    (EXECUTION_THREADS, "Thread pool"),
+    (EXECUTION_INLINE, "Inline"),
+]
+
+DEFAULT_TASK_TYPE = "sample"
+
+RETRY_POLICY_FIXED = "fixed"
+RETRY_POLICY_EXPONENTIAL = "exponential"
+RETRY_POLICY_FULL_JITTER = "full_jitter"
+RETRY_POLICY_DECORRELATED_JITTER = "decorrelated_jitter"
+
+RETRY_POLICY_CHOICES = [
+    (RETRY_POLICY_FIXED, "Fixed delay"),
+    (RETRY_POLICY_EXPONENTIAL, "Exponential backoff"),
+    (RETRY_POLICY_FULL_JITTER, "Exponential backoff with full jitter"),
+    (RETRY_POLICY_DECORRELATED_JITTER, "Decorrelated jitter"),
+]
+
+STALLED_TASKS_POLICY_REQUEUE = "requeue"
+STALLED_TASKS_POLICY_FAIL = "fail"
+
+# Named parameter of the message published by the stalled tasks reaper. The requeued task is started only by the
+# messages carrying its token, so the stale message redelivered by the broker (late acknowledgement) is skipped
+ATTEMPT_TOKEN_OPTION = "attempt_token"
+
+# Time buckets of the task duration rollups (values are PostgreSQL date_trunc fields)
+ROLLUP_GRANULARITY_MINUTE = "minute"
+ROLLUP_GRANULARITY_HOUR = "hour"
+ROLLUP_GRANULARITY_DAY = "day"
+
+ROLLUP_GRANULARITY_CHOICES = [
+    (ROLLUP_GRANULARITY_MINUTE, "Minute"),
+    (ROLLUP_GRANULARITY_HOUR, "Hour"),
+    (ROLLUP_GRANULARITY_DAY, "Day"),
+]
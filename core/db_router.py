@@ -0,0 +1,134 @@
+import logging
+import math
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from redis import RedisError
+
+from core.metrics import REPLICA_LAG
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_DATABASE = "default"
+PRIMARY_PIN_KEY = "db_primary_pin:{}"
+
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+class ReplicaLagMonitor:
+    """
+    Measures replication lag of the replicas (at most once per REPLICA_LAG_CHECK_INTERVAL in every process)
+
+    Lag is measured in a background thread, so requests never wait for the replicas. Until the first measurement
+    finishes, or when the last one is older than two intervals (the replicas hang), reads go to the primary.
+    """
+
+    lag_query = """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """
+
+    def __init__(self):
+        self.lags: Dict[str, float] = {}
+        self.measured_at = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_replicas() -> List[str]:
+        return [alias for alias in settings.DATABASES if alias != PRIMARY_DATABASE]
+
+    def measure(self, alias: str) -> float:
+        """Returns replication lag of the replica in seconds (infinity if the replica is not reachable)"""
+
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(self.lag_query)
+                lag = float(cursor.fetchone()[0] or 0)
+        except DatabaseError as error:
+            logger.warning(f"Failed to measure replication lag of {alias}: {error}")
+            lag = math.inf
+        REPLICA_LAG.labels(database=alias).set(lag)
+        return lag
+
+    def refresh(self, replicas: List[str]):
+        """
+        Measures replication lag of the replicas and releases the lock acquired by `get_available_replicas`
+
+        :param replicas: aliases of the replicas
+        """
+
+        try:
+            lags = {alias: self.measure(alias) for alias in replicas}
+            self.lags, self.measured_at = lags, time.monotonic()
+        except Exception:
+            logger.exception("Failed to measure replication lag")
+        finally:
+            # Connections of the background thread are not closed by the request/task signals
+            connections.close_all()
+            self.lock.release()
+
+    def get_available_replicas(self) -> List[str]:
+        """Returns replicas with replication lag within REPLICA_MAX_LAG (starts a new measurement if it's due)"""
+
+        replicas = self.get_replicas()
+        if not replicas:
+            return []
+        age = math.inf if self.measured_at is None else time.monotonic() - self.measured_at
+        if age >= settings.REPLICA_LAG_CHECK_INTERVAL and self.lock.acquire(blocking=False):
+            threading.Thread(target=self.refresh, args=(replicas,), name="replica-lag-monitor", daemon=True).start()
+        if age > 2 * settings.REPLICA_LAG_CHECK_INTERVAL:
+            return []
+        return [alias for alias in replicas if self.lags.get(alias, math.inf) <= settings.REPLICA_MAX_LAG]
+
+
+replica_lag_monitor = ReplicaLagMonitor()
+
+
+def pin_to_primary(user_id: int):
+    """Sends reads of the user to the primary for REPLICA_STICKY_SECONDS (read-your-writes)"""
+
+    try:
+        get_redis().set(PRIMARY_PIN_KEY.format(user_id), 1, ex=settings.REPLICA_STICKY_SECONDS)
+    except RedisError as error:
+        logger.warning(f"Failed to pin user {user_id} to the primary database: {error}")
+
+
+def is_pinned_to_primary(user_id: int) -> bool:
+    """Checks whether the user has written recently (the primary is used if it can't be checked)"""
+
+    try:
+        return bool(get_redis().exists(PRIMARY_PIN_KEY.format(user_id)))
+    except RedisError as error:
+        logger.warning(f"Failed to check primary database pin of user {user_id}: {error}")
+        return True
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads to the replicas when `replica_reads` is enabled for the current request
+
+    Writes, migrations and all other reads go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads.get():
+            return PRIMARY_DATABASE
+        replicas = replica_lag_monitor.get_available_replicas()
+        return random.choice(replicas) if replicas else PRIMARY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DATABASE
@@ -4,3 +4,11 @@ class TaskException(Exception):
 
 class UnknownTaskException(Exception):
     pass
+
+
+class ImportRecordException(Exception):
+    pass
+
+
+class UnsafeURLException(Exception):
+    pass
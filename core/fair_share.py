@@ -0,0 +1,173 @@
+import logging
+from functools import partial
+from typing import Dict, Hashable, List, Optional
+
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from core.constants import STATUS_IN_PROGRESS, STATUS_PENDING
+from core.models import FairShareQueue, PendingDispatch, TaskMeta
+from core.tracing import SPAN_KIND_PRODUCER, SpanContext, start_span
+from core.utils import get_time_limits
+
+logger = logging.getLogger(__name__)
+
+# weights are clamped to keep the number of rounds bounded
+MIN_WEIGHT = 0.01
+
+
+class DeficitRoundRobin:
+    """
+    Splits free worker slots between the queues with deficit round-robin
+
+    Every visit adds the weight of a queue to its deficit and releases as many tasks as the whole deficit covers,
+    so the slots are shared in proportion to the weights and a queue with a few tasks is drained in the first round.
+    The deficits and the visiting order are kept between the allocations: queues are visited starting from the least
+    recently visited one (new queues first), so a round cut short by the free slots is continued by the next
+    allocation. Drained queues are forgotten.
+    """
+
+    def __init__(
+        self, deficits: Optional[Dict[Hashable, float]] = None, last_visits: Optional[Dict[Hashable, int]] = None
+    ):
+        """
+        :param deficits: unused slots of the queues
+        :param last_visits: logical times of the last visits of the queues
+        """
+
+        self.deficits = dict(deficits or {})
+        self.last_visits = dict(last_visits or {})
+
+    def allocate(
+        self, pending: Dict[Hashable, int], weights: Dict[Hashable, float], capacity: int
+    ) -> Dict[Hashable, int]:
+        """
+        Allocates the free slots
+
+        :param pending: numbers of the tasks of the queues (equally recent queues are visited in this order)
+        :param weights: weights of the queues (1 by default)
+        :param capacity: number of free slots
+        :return: numbers of the tasks to be released per queue
+        """
+
+        clock = max(self.last_visits.values(), default=0)
+        queues = sorted((queue for queue, count in pending.items() if count), key=lambda q: self.last_visits.get(q, 0))
+        remaining = {queue: pending[queue] for queue in queues}
+        allocation = dict.fromkeys(pending, 0)
+        while capacity > 0 and remaining:
+            for queue in list(remaining):
+                clock += 1
+                self.last_visits[queue] = clock
+                deficit = self.deficits.get(queue, 0.0) + max(weights.get(queue, 1), MIN_WEIGHT)
+                slots = min(int(deficit), remaining[queue], capacity)
+                allocation[queue] += slots
+                self.deficits[queue] = deficit - slots
+                remaining[queue] -= slots
+                capacity -= slots
+                if not remaining[queue]:
+                    del remaining[queue]
+                if not capacity:
+                    break
+        self.deficits = {queue: self.deficits.get(queue, 0.0) for queue in remaining}
+        self.last_visits = {queue: self.last_visits.get(queue, 0) for queue in remaining}
+        return allocation
+
+
+def get_user_weights() -> Dict[int, float]:
+    """Returns FAIR_SHARE_WEIGHTS by user id"""
+
+    if not settings.FAIR_SHARE_WEIGHTS:
+        return {}
+    users = User.objects.filter(username__in=settings.FAIR_SHARE_WEIGHTS).values_list("username", "id")
+    return {user_id: settings.FAIR_SHARE_WEIGHTS[username] for username, user_id in users}
+
+
+def get_in_flight_count() -> int:
+    """Returns number of the published tasks waiting for a worker or running"""
+
+    return TaskMeta.objects.filter(
+        status__in=(STATUS_PENDING, STATUS_IN_PROGRESS), pending_dispatch__isnull=True, schedule__isnull=True
+    ).count()
+
+
+def publish_tasks(tasks: List[PendingDispatch]):
+    """Publishes the dispatched tasks to the broker"""
+
+    for task in tasks:
+        # the message continues the trace of the request creating the task
+        with start_span(
+            "celery.publish",
+            SPAN_KIND_PRODUCER,
+            {"celery.task_name": task.name},
+            SpanContext.from_traceparent(task.traceparent),
+        ):
+            current_app.send_task(
+                task.name, kwargs=task.kwargs, task_id=str(task.task_id), **get_time_limits(task.kwargs)
+            )
+
+
+def dispatch_pending_tasks(capacity: Optional[int] = None) -> int:
+    """
+    Publishes the tasks of the per-user queues to the broker while the workers have free slots
+
+    Users are visited by turns continued from the previous dispatch (see DeficitRoundRobin), so light users aren't
+    stuck behind the tasks of a user who has submitted a flood of them.
+
+    :param capacity: number of worker slots (FAIR_SHARE_CAPACITY by default)
+    :return: number of published tasks
+    """
+
+    if not PendingDispatch.objects.exists():
+        return 0
+    capacity = settings.FAIR_SHARE_CAPACITY if capacity is None else capacity
+    free_slots = capacity - get_in_flight_count()
+    if free_slots <= 0:
+        return 0
+
+    dispatched = 0
+    with transaction.atomic():
+        # the lock serializes the dispatchers updating the round-robin state
+        queues = list(FairShareQueue.objects.select_for_update())
+        scheduler = DeficitRoundRobin(
+            {queue.user_id: queue.deficit for queue in queues}, {queue.user_id: queue.last_visit for queue in queues}
+        )
+        pending = dict(
+            PendingDispatch.objects.values("user_id")
+            .annotate(count=Count("task_id"))
+            .order_by("user_id")
+            .values_list("user_id", "count")
+        )
+        allocation = scheduler.allocate(pending, get_user_weights(), free_slots)
+
+        for user_id, slots in allocation.items():
+            if not slots:
+                continue
+            tasks = list(
+                PendingDispatch.objects.select_for_update(skip_locked=True)
+                .filter(user_id=user_id)
+                .order_by("task_id")[:slots]
+            )
+            PendingDispatch.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+            # the messages are published once the rows are deleted, so a rolled back dispatch publishes nothing
+            transaction.on_commit(partial(publish_tasks, tasks))
+            dispatched += len(tasks)
+
+        FairShareQueue.objects.exclude(user_id__in=scheduler.deficits).delete()
+        FairShareQueue.objects.bulk_create(
+            [
+                FairShareQueue(user_id=user_id, deficit=deficit, last_visit=scheduler.last_visits[user_id])
+                for user_id, deficit in scheduler.deficits.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["deficit", "last_visit"],
+        )
+
+    if dispatched:
+        logger.info(
+            f"{dispatched} tasks of {sum(1 for slots in allocation.values() if slots)} users have been dispatched."
+        )
+    return dispatched
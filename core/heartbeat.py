@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from functools import partial
+from typing import List, Optional
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from redis import RedisError
+
+from core.constants import (
+    ATTEMPT_TOKEN_OPTION,
+    STALLED_TASKS_POLICY_REQUEUE,
+    STATUS_FAILED,
+    STATUS_IN_PROGRESS,
+    STATUS_RETRY_PENDING,
+)
+from core.models import TaskMeta
+from core.redis_client import get_redis
+from core.utils import get_time_limits
+
+logger = logging.getLogger(__name__)
+
+HEARTBEATS_KEY = "task_heartbeats"
+STALLED_TASK_ERROR = "Task heartbeat has expired."
+
+
+def get_heartbeat_member(celery_task_name: str, task_id: str) -> str:
+    """Returns member of the heartbeats sorted set, it keeps Celery task name to be able to requeue the task"""
+
+    return f"{celery_task_name}|{task_id}"
+
+
+class HeartbeatMonitor:
+    """
+    Sends heartbeats of the tasks running in the worker process
+
+    Heartbeats of all running tasks are written to a Redis sorted set (score is the time of the last heartbeat)
+    with a single command per interval from a background thread, so the cost doesn't depend on the task duration.
+    """
+
+    def __init__(self, interval: Optional[int] = None):
+        self.interval = interval
+        self.members = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def start(self, celery_task_name: str, *task_ids: str):
+        """Registers running tasks and sends their first heartbeat"""
+
+        members = [get_heartbeat_member(celery_task_name, task_id) for task_id in task_ids]
+        with self.lock:
+            self.members.update(members)
+        self._ensure_thread()
+        self._send(members)
+
+    def stop(self, celery_task_name: str, *task_ids: str):
+        """Unregisters finished tasks and removes their heartbeats"""
+
+        members = [get_heartbeat_member(celery_task_name, task_id) for task_id in task_ids]
+        with self.lock:
+            self.members.difference_update(members)
+        try:
+            get_redis().zrem(HEARTBEATS_KEY, *members)
+        except RedisError as error:
+            logger.warning(f"Failed to remove heartbeats of the tasks {', '.join(map(str, task_ids))}: {error}")
+
+    def abandon(self, celery_task_name: str, *task_ids: str):
+        """Unregisters tasks which couldn't be finished, their heartbeats expire and the reaper handles them"""
+
+        members = [get_heartbeat_member(celery_task_name, task_id) for task_id in task_ids]
+        with self.lock:
+            self.members.difference_update(members)
+
+    def beat(self):
+        """Sends heartbeats of all running tasks"""
+
+        with self.lock:
+            members = list(self.members)
+        if members:
+            self._send(members)
+
+    def _send(self, members: List[str]):
+        try:
+            get_redis().zadd(HEARTBEATS_KEY, dict.fromkeys(members, time.time()))
+        except RedisError as error:
+            logger.warning(f"Failed to send heartbeats: {error}")
+
+    def _ensure_thread(self):
+        """Starts the background thread (once per process, threads don't survive the prefork pool fork)"""
+
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="task-heartbeats", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval or settings.HEARTBEAT_INTERVAL)
+            self.beat()
+
+
+heartbeat_monitor = HeartbeatMonitor()
+
+
+def handle_expired_heartbeats(timeout: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+    """
+    Requeues or fails IN_PROGRESS tasks whose heartbeat has expired
+
+    Expired heartbeats are read with a range query of the sorted set, so the cost depends on the number of
+    stalled tasks only.
+
+    :param timeout: heartbeat expiration time in seconds
+    :param batch_size: maximum number of tasks handled in one call
+    :return: number of handled tasks
+    """
+
+    timeout = timeout or settings.HEARTBEAT_TIMEOUT
+    batch_size = batch_size or settings.HEARTBEAT_REAPER_BATCH_SIZE
+    redis = get_redis()
+    members = [
+        member.decode()
+        for member in redis.zrangebyscore(HEARTBEATS_KEY, "-inf", time.time() - timeout, start=0, num=batch_size)
+    ]
+    if not members:
+        return 0
+
+    celery_task_names = dict(reversed(member.split("|", 1)) for member in members)
+    with transaction.atomic():
+        tasks = TaskMeta.objects.select_for_update(skip_locked=True).filter(
+            id__in=celery_task_names.keys(), status=STATUS_IN_PROGRESS
+        )
+        handled_ids = set()
+        for task in tasks:
+            handle_stalled_task(task, celery_task_names[str(task.id)])
+            handled_ids.add(str(task.id))
+
+    # heartbeats of the running tasks locked by another transaction (skipped above) are kept to be checked again
+    running_ids = {
+        str(task_id)
+        for task_id in TaskMeta.objects.filter(
+            id__in=celery_task_names.keys() - handled_ids, status=STATUS_IN_PROGRESS
+        ).values_list("id", flat=True)
+    }
+    stopped_members = [member for member in members if member.split("|", 1)[1] not in running_ids]
+    if stopped_members:
+        redis.zrem(HEARTBEATS_KEY, *stopped_members)
+    return len(handled_ids)
+
+
+def handle_stalled_task(task: TaskMeta, celery_task_name: str):
+    """Requeues or fails stalled task according to the STALLED_TASKS_POLICY setting"""
+
+    requeues = task.errors.filter(message=STALLED_TASK_ERROR).count()
+    task.add_error(STALLED_TASK_ERROR, f"No heartbeat for more than {settings.HEARTBEAT_TIMEOUT} seconds.")
+    if settings.STALLED_TASKS_POLICY == STALLED_TASKS_POLICY_REQUEUE and requeues < settings.STALLED_TASKS_MAX_REQUEUES:
+        # the lost attempt's message is redelivered by the broker if the worker hasn't acknowledged it, the token
+        # lets only the requeued message start the task (written directly, since the status may be published)
+        task.attempt_token = uuid.uuid4()
+        TaskMeta.objects.filter(id=task.id).update(attempt_token=task.attempt_token)
+        task.finish(STATUS_RETRY_PENDING)
+        transaction.on_commit(
+            partial(
+                current_app.send_task,
+                celery_task_name,
+                kwargs={**task.kwargs, ATTEMPT_TOKEN_OPTION: str(task.attempt_token)},
+                task_id=str(task.id),
+                **get_time_limits(task.kwargs),
+            )
+        )
+        logger.warning(f"The stalled task {task.id} has been requeued.")
+    else:
+        task.finish(STATUS_FAILED)
+        logger.error(f"The stalled task {task.id} has been failed.")
@@ -0,0 +1,54 @@
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import QuerySet
+
+from core.constants import STATUS_CHOICES
+from core.models import TaskError, TaskMeta
+
+
+class BenchmarkCommand(BaseCommand):
+    """Base class for benchmark management commands"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Number of measurements for every case")
+
+    @staticmethod
+    def measure(repeat: int, func: Callable) -> float:
+        """Returns median execution time of the function in seconds"""
+
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started_at)
+        return statistics.median(timings)
+
+    @staticmethod
+    @contextmanager
+    def benchmark_tasks(count: int) -> Iterator[QuerySet]:
+        """
+        Creates tasks in all statuses (with errors) and rolls them back on exit
+
+        :param count: number of tasks
+        :return: queryset of the created tasks
+        """
+
+        statuses = [status for status, _ in STATUS_CHOICES]
+        with transaction.atomic():
+            user = User.objects.create(username=f"benchmark-{uuid.uuid4().hex}")
+            tasks = TaskMeta.objects.bulk_create(
+                TaskMeta(user=user, name=f"task-{i}", status=statuses[i % len(statuses)], result="result")
+                for i in range(count)
+            )
+            TaskError.objects.bulk_create(
+                TaskError(task=task, message="error", traceback="traceback") for task in tasks[:: len(statuses)]
+            )
+            yield TaskMeta.objects.filter(user=user)
+            transaction.set_rollback(True)
@@ -0,0 +1,42 @@
+from django.db import close_old_connections, connection
+
+from core.constants import STATUS_IN_PROGRESS, STATUS_PENDING
+from core.management.benchmark import BenchmarkCommand
+from core.models import TaskMeta
+from core.utils import uuid7
+
+
+class Command(BenchmarkCommand):
+    """Benchmark of short task throughput with and without persistent database connections"""
+
+    help = "Compares throughput of short tasks opening a new connection per task and reusing connections"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--tasks", type=int, default=500, help="Number of short tasks in every measurement")
+
+    @staticmethod
+    def run_tasks(count: int):
+        """Runs short tasks (a read and a status update) the way the Celery Django fixup wraps them"""
+
+        for _ in range(count):
+            close_old_connections()
+            TaskMeta.objects.filter(status=STATUS_PENDING).exists()
+            TaskMeta.objects.filter(pk=uuid7(), status=STATUS_PENDING).update(status=STATUS_IN_PROGRESS)
+            close_old_connections()
+
+    def handle(self, *args, **options):
+        conn_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        self.stdout.write(f"Tasks: {options['tasks']}")
+        try:
+            for max_age in (0, conn_max_age or 600):
+                connection.close()
+                connection.settings_dict["CONN_MAX_AGE"] = max_age
+                run_time = self.measure(options["repeat"], lambda: self.run_tasks(options["tasks"]))
+                self.stdout.write(
+                    f"CONN_MAX_AGE={max_age:<5} time: {run_time * 1000:8.2f} ms, "
+                    f"throughput: {options['tasks'] / run_time:8.0f} tasks/s"
+                )
+        finally:
+            connection.close()
+            connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
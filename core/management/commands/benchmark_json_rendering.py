@@ -0,0 +1,41 @@
+import io
+
+from django.utils.text import compress_string
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.management.benchmark import BenchmarkCommand
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from core.serializers import TaskProjectionSerializer
+
+
+class Command(BenchmarkCommand):
+    """Benchmark of JSON rendering/parsing and compression of the task list response"""
+
+    help = "Compares render/parse time of the stdlib and orjson based classes and bytes on the wire"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--tasks", type=int, default=10000, help="Number of tasks in the list")
+
+    def handle(self, *args, **options):
+        with self.benchmark_tasks(options["tasks"]) as queryset:
+            serializer = TaskProjectionSerializer()
+            # The list response holds formatted strings, the projected rows hold UUID and datetime objects
+            rows = list(serializer.project(queryset))
+            payloads = {"response": serializer.to_representation(rows), "rows": rows}
+
+        self.stdout.write(f"Tasks: {options['tasks']}")
+        for payload_name, data in payloads.items():
+            for renderer, parser in ((JSONRenderer(), JSONParser()), (ORJSONRenderer(), ORJSONParser())):
+                content = renderer.render(data)
+                render_time = self.measure(options["repeat"], lambda: renderer.render(data))
+                parse_time = self.measure(options["repeat"], lambda: parser.parse(io.BytesIO(content)))
+                compressed_content = compress_string(content)
+                self.stdout.write(
+                    f"{payload_name:8} {renderer.__class__.__name__:15} render: {render_time * 1000:8.2f} ms, "
+                    f"{parser.__class__.__name__:13} parse: {parse_time * 1000:8.2f} ms, "
+                    f"bytes: {len(content)}, gzip bytes: {len(compressed_content)} "
+                    f"({len(compressed_content) / len(content):.1%})"
+                )
@@ -0,0 +1,67 @@
+import heapq
+import random
+import statistics
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.constants import RETRY_POLICY_CHOICES
+from core.retry import get_retry_delay
+
+
+class Command(BaseCommand):
+    """Simulation of the retry load produced by the retry policies after a downstream outage"""
+
+    help = "Simulates tasks failing together during an outage and prints the retry load curve of every retry policy"
+
+    sparkline_chars = " ▁▂▃▄▅▆▇█"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=10000, help="Number of tasks failing at the same time")
+        parser.add_argument("--outage", type=int, default=120, help="Outage duration in seconds")
+        parser.add_argument("--countdown", type=int, default=10, help="Base retry delay in seconds")
+        parser.add_argument("--cap", type=int, default=300, help="Maximum retry delay in seconds")
+        parser.add_argument("--max-retries", type=int, default=8, help="Maximum number of retries")
+        parser.add_argument("--bucket", type=int, default=10, help="Load curve resolution in seconds")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    def simulate(self, policy: str, options: dict):
+        """Returns attempt times and completion times of the tasks (attempts fail until the outage is over)"""
+
+        attempts, completions = [], []
+        queue = [(0.0, 0, None) for _ in range(options["tasks"])]
+        while queue:
+            attempt_at, retries, previous_delay = heapq.heappop(queue)
+            attempts.append(attempt_at)
+            if attempt_at >= options["outage"]:
+                completions.append(attempt_at)
+            elif retries < options["max_retries"]:
+                delay = get_retry_delay(policy, options["countdown"], options["cap"], retries, previous_delay)
+                heapq.heappush(queue, (attempt_at + delay, retries + 1, delay))
+        return attempts, completions
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        bucket = options["bucket"]
+        self.stdout.write(
+            f"Tasks: {options['tasks']}, outage: {options['outage']} s, countdown: {options['countdown']} s, "
+            f"cap: {options['cap']} s, max retries: {options['max_retries']}, bucket: {bucket} s"
+        )
+        for policy, title in RETRY_POLICY_CHOICES:
+            attempts, completions = self.simulate(policy, options)
+            load = Counter(int(attempt_at // bucket) for attempt_at in attempts if attempt_at > 0)
+            curve = [load.get(index, 0) for index in range(max(load, default=0) + 1)]
+            peak = max(curve, default=0)
+            sparkline = "".join(
+                self.sparkline_chars[round(value / peak * (len(self.sparkline_chars) - 1))] if peak else " "
+                for value in curve
+            )
+            self.stdout.write(f"\n{title} ({policy})")
+            self.stdout.write(
+                f"  retries: {len(attempts) - options['tasks']}, peak retries per bucket: {peak}, "
+                f"completed: {len(completions)}, failed: {options['tasks'] - len(completions)}"
+            )
+            if completions:
+                quantiles = statistics.quantiles(completions, n=20)
+                self.stdout.write(f"  completion time p50: {quantiles[9]:.0f} s, p95: {quantiles[18]:.0f} s")
+            self.stdout.write(f"  load: |{sparkline}|")
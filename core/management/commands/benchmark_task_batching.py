@@ -0,0 +1,65 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.management.benchmark import BenchmarkCommand
+from core.models import TaskMeta
+from core.tasks import run_task_batches, sample_task
+
+
+class Command(BenchmarkCommand):
+    """Benchmark of short task throughput in the per-message and batched execution modes"""
+
+    help = "Compares throughput and queries per task of short tasks executed one by one and in batches"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--tasks", type=int, default=500, help="Number of short tasks in every measurement")
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of tasks in a batch")
+
+    @staticmethod
+    def run_per_message(tasks):
+        for task in tasks:
+            sample_task.apply(kwargs=task.kwargs, task_id=str(task.id))
+
+    @staticmethod
+    def run_batched(tasks, batch_size: int):
+        while tasks:
+            batch, tasks = tasks[:batch_size], tasks[batch_size:]
+            run_task_batches.run_batch([(task.id, [], task.kwargs, 0) for task in batch])
+
+    def measure_mode(self, repeat: int, count: int, run) -> tuple:
+        """Returns median execution time (tasks are created before every measurement) and number of queries"""
+
+        timings, queries = [], 0
+        for _ in range(repeat):
+            with transaction.atomic():
+                user = User.objects.create(username=f"benchmark-{uuid.uuid4().hex}")
+                tasks = TaskMeta.objects.bulk_create(
+                    TaskMeta(user=user, name=f"task-{i}", kwargs={"param1": 0, "param2": "benchmark"})
+                    for i in range(count)
+                )
+                with CaptureQueriesContext(connection) as context:
+                    started_at = time.perf_counter()
+                    run(tasks)
+                    timings.append(time.perf_counter() - started_at)
+                queries = len(context.captured_queries)
+                transaction.set_rollback(True)
+        return statistics.median(timings), queries
+
+    def handle(self, *args, **options):
+        count, batch_size = options["tasks"], options["batch_size"]
+        self.stdout.write(f"Tasks: {count}, batch size: {batch_size}")
+        for title, run in (
+            ("per-message", self.run_per_message),
+            ("batched", lambda tasks: self.run_batched(tasks, batch_size)),
+        ):
+            run_time, queries = self.measure_mode(options["repeat"], count, run)
+            self.stdout.write(
+                f"{title:<12} time: {run_time * 1000:8.2f} ms, throughput: {count / run_time:8.0f} tasks/s, "
+                f"queries per task: {queries / count:5.2f}"
+            )
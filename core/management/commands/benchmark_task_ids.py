@@ -0,0 +1,86 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils.timezone import now
+from psycopg2.extras import execute_values
+
+from core.management.benchmark import BenchmarkCommand
+from core.models import TaskError, TaskMeta
+from core.utils import uuid7
+
+
+class Command(BenchmarkCommand):
+    """Insert throughput benchmark of random (v4) and time-ordered (v7) TaskMeta primary keys"""
+
+    help = "Compares insert throughput and index sizes of TaskMeta with UUIDv4 and UUIDv7 primary keys"
+
+    tasks_table = "benchmark_taskmeta"
+    errors_table = "benchmark_taskerror"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=500000, help="Number of tasks to insert")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of tasks in one INSERT")
+
+    def create_tables(self, cursor):
+        """Creates empty copies of the TaskMeta and TaskError tables (with indexes and FK)"""
+
+        cursor.execute(f"CREATE TABLE {self.tasks_table} (LIKE {TaskMeta._meta.db_table} INCLUDING ALL)")
+        cursor.execute(f"CREATE TABLE {self.errors_table} (LIKE {TaskError._meta.db_table} INCLUDING ALL)")
+        cursor.execute(f"ALTER TABLE {self.errors_table} ADD FOREIGN KEY (task_id) REFERENCES {self.tasks_table} (id)")
+
+    def get_index_size(self, cursor, table: str, column: str) -> int:
+        """Returns total size of the indexes of the table column in bytes"""
+
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(pg_relation_size(i.indexrelid)), 0)
+            FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND a.attname = %s
+            """,
+            [table, column],
+        )
+        return cursor.fetchone()[0]
+
+    def insert_tasks(self, generator, count: int, batch_size: int):
+        """Inserts tasks (with an error for every 10th task) and returns rows per second and index sizes"""
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            user = User.objects.create(username=f"benchmark-{uuid.uuid4().hex}")
+            self.create_tables(cursor)
+            created_at = now()
+
+            started_at = time.perf_counter()
+            for offset in range(0, count, batch_size):
+                task_ids = [generator() for _ in range(min(batch_size, count - offset))]
+                execute_values(
+                    cursor,
+                    f"INSERT INTO {self.tasks_table} (id, user_id, created_at, result, name, status) VALUES %s",
+                    [(task_id, user.id, created_at, "", "task", "PENDING") for task_id in task_ids],
+                    page_size=batch_size,
+                )
+                execute_values(
+                    cursor,
+                    f"INSERT INTO {self.errors_table} (task_id, message, traceback, created_at) VALUES %s",
+                    [(task_id, "error", "", created_at) for task_id in task_ids[::10]],
+                    page_size=batch_size,
+                )
+            rows_per_second = count / (time.perf_counter() - started_at)
+
+            sizes = self.get_index_size(cursor, self.tasks_table, "id"), self.get_index_size(
+                cursor, self.errors_table, "task_id"
+            )
+            transaction.set_rollback(True)
+        return rows_per_second, sizes
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Tasks: {options['tasks']}")
+        for title, generator in (("UUIDv4", uuid.uuid4), ("UUIDv7", uuid7)):
+            rows_per_second, (pk_size, errors_index_size) = self.insert_tasks(
+                generator, options["tasks"], options["batch_size"]
+            )
+            self.stdout.write(
+                f"{title}: {rows_per_second:10.0f} rows/s, "
+                f"PK index: {pk_size / 2**20:8.1f} MiB, TaskError.task_id index: {errors_index_size / 2**20:6.1f} MiB"
+            )
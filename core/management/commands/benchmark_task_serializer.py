@@ -0,0 +1,35 @@
+from core.management.benchmark import BenchmarkCommand
+from core.serializers import TaskProjectionSerializer, TaskSerializer
+
+
+class Command(BenchmarkCommand):
+    """Microbenchmark of TaskSerializer against TaskProjectionSerializer for list responses"""
+
+    help = "Compares list serialization time of TaskSerializer and TaskProjectionSerializer"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--tasks", type=int, default=5000, help="Number of tasks in the list")
+        parser.add_argument("--fields", default=None, help="Comma-separated sparse fieldset")
+
+    def handle(self, *args, **options):
+        fields = options["fields"].split(",") if options["fields"] else None
+
+        with self.benchmark_tasks(options["tasks"]) as queryset:
+
+            def run_serializer():
+                return TaskSerializer(queryset.all(), many=True, fields=fields).data
+
+            def run_projection():
+                serializer = TaskProjectionSerializer(fields=fields)
+                return serializer.to_representation(serializer.project(queryset.all()))
+
+            assert run_serializer() == run_projection(), "Serializers output mismatch"
+
+            serializer_time = self.measure(options["repeat"], run_serializer)
+            projection_time = self.measure(options["repeat"], run_projection)
+
+        self.stdout.write(f"Tasks: {options['tasks']}, fields: {options['fields'] or 'all'}")
+        self.stdout.write(f"TaskSerializer:           {serializer_time * 1000:10.2f} ms")
+        self.stdout.write(f"TaskProjectionSerializer: {projection_time * 1000:10.2f} ms")
+        self.stdout.write(f"Speedup: {serializer_time / projection_time:.1f}x")
@@ -0,0 +1,110 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from typing import List, Set, Tuple
+
+from django.core.management.base import CommandError
+
+from core.management.benchmark import BenchmarkCommand
+
+# Imports everything a Celery worker imports on start (Django setup with system checks and the task modules)
+WORKER_BOOTSTRAP = """
+import json, sys, time
+started_at = time.perf_counter()
+from task_management import celery_app
+celery_app.loader.import_default_modules()
+print(json.dumps({"time": time.perf_counter() - started_at, "modules": sorted(sys.modules)}))
+"""
+
+# Modules that must not be imported by workers (the web part of the project)
+FORBIDDEN_WORKER_MODULES = (
+    "django.contrib.admin",
+    "rest_framework",
+    "drf_yasg",
+    "django_filters",
+    "coreapi",
+    "core.admin",
+    "core.serializers",
+    "core.views",
+)
+
+
+class Command(BenchmarkCommand):
+    """Benchmark of the Celery worker startup imports"""
+
+    help = (
+        "Compares startup time of the worker with the full and the worker settings profiles "
+        "(with `python -X importtime` breakdown) and fails if the worker profile regresses"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--full-settings", default="task_management.settings", help="Full settings module")
+        parser.add_argument(
+            "--worker-settings", default="task_management.settings_worker", help="Worker settings module"
+        )
+        parser.add_argument(
+            "--max-ratio",
+            type=float,
+            default=0.75,
+            help="Maximum startup time of the worker profile relative to the full profile",
+        )
+
+    @staticmethod
+    def run_bootstrap(settings_module: str) -> Tuple[float, Set[str], List[Tuple[str, float]]]:
+        """
+        Runs the worker bootstrap in a fresh interpreter with `-X importtime`
+
+        :param settings_module: DJANGO_SETTINGS_MODULE of the run
+        :return: startup time in seconds, names of the imported modules and import time (in seconds) by package
+        """
+
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", WORKER_BOOTSTRAP],
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings_module},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"Worker bootstrap with {settings_module} has failed:\n{process.stderr[-2000:]}")
+
+        packages = Counter()
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or line.endswith("imported package"):
+                continue
+            self_time, _, module = line.split(":", 1)[1].split("|")
+            packages[module.strip().split(".")[0]] += int(self_time) / 10**6
+        result = json.loads(process.stdout)
+        return result["time"], set(result["modules"]), packages.most_common()
+
+    def measure_profile(self, settings_module: str, repeat: int) -> Tuple[float, Set[str]]:
+        """Returns median startup time and the imported modules of the profile"""
+
+        runs = [self.run_bootstrap(settings_module) for _ in range(repeat)]
+        startup_time = statistics.median(startup_time for startup_time, _, _ in runs)
+        _, modules, packages = runs[0]
+        self.stdout.write(f"{settings_module:35} startup: {startup_time * 1000:8.2f} ms, modules: {len(modules)}")
+        for package, import_time in packages[:10]:
+            self.stdout.write(f"    {package:33} import: {import_time * 1000:8.2f} ms")
+        return startup_time, modules
+
+    def handle(self, *args, **options):
+        full_time, _ = self.measure_profile(options["full_settings"], options["repeat"])
+        worker_time, worker_modules = self.measure_profile(options["worker_settings"], options["repeat"])
+
+        if "core.tasks" not in worker_modules:
+            raise CommandError("Tasks are not imported by the worker bootstrap.")
+        forbidden_modules = sorted(
+            module
+            for module in worker_modules
+            if any(module == name or module.startswith(f"{name}.") for name in FORBIDDEN_WORKER_MODULES)
+        )
+        if forbidden_modules:
+            raise CommandError(f"Worker startup imports web modules: {', '.join(forbidden_modules)}")
+        ratio = worker_time / full_time
+        if ratio > options["max_ratio"]:
+            raise CommandError(f"Worker startup takes {ratio:.0%} of the full profile (max {options['max_ratio']:.0%})")
+        self.stdout.write(f"Worker startup takes {ratio:.0%} of the full profile")
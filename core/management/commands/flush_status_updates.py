@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.status_flusher import StatusFlusher
+
+
+class Command(BaseCommand):
+    """Runs the status flusher of the write-behind mode"""
+
+    help = "Applies task status transitions published by the workers in write-behind mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Maximum number of transitions applied at once")
+        parser.add_argument("--max-staleness", type=float, help="Maximum time in seconds to wait for a full batch")
+        parser.add_argument("--once", action="store_true", help="Apply a single batch and exit")
+
+    def handle(self, *args, **options):
+        flusher = StatusFlusher()
+        try:
+            if options["once"]:
+                flusher.ensure_group()
+                applied = flusher.flush(options["batch_size"], options["max_staleness"])
+                self.stdout.write(f"{applied} status transitions have been applied.")
+            else:
+                flusher.run(options["batch_size"], options["max_staleness"])
+        except KeyboardInterrupt:
+            pass
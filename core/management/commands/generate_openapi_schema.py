@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import get_code_fingerprint, load_schema, write_schema
+
+
+class Command(BaseCommand):
+    """Generates the OpenAPI schema served by /swagger/"""
+
+    help = "Generates the OpenAPI schema into OPENAPI_SCHEMA_FILE unless it's up to date with the code"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate the schema even if it's up to date")
+
+    def handle(self, *args, **options):
+        if not options["force"] and load_schema() is not None:
+            self.stdout.write(f"OpenAPI schema {settings.OPENAPI_SCHEMA_FILE} is up to date.")
+            return
+        path = write_schema()
+        self.stdout.write(f"OpenAPI schema has been written to {path} (code fingerprint {get_code_fingerprint()}).")
@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from core.bulk_import import FORMAT_CSV, FORMATS, TaskImporter
+from core.exceptions import ImportRecordException
+
+
+class Command(BaseCommand):
+    """Loads historical tasks with PostgreSQL COPY"""
+
+    help = (
+        "Loads tasks and their errors from NDJSON or CSV file in chunks, "
+        "a rerun with the same file continues after the last loaded chunk"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file")
+        parser.add_argument("--format", choices=FORMATS, help="Input format (by the file extension by default)")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Number of records loaded at once")
+        parser.add_argument("--source", help="Checkpoint name of the input (the absolute file path by default)")
+        parser.add_argument("--skip-invalid", action="store_true", help="Skip invalid records instead of stopping")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or (FORMAT_CSV if path.endswith(".csv") else FORMATS[0])
+        importer = TaskImporter(
+            source=options["source"] or os.path.abspath(path),
+            chunk_size=options["chunk_size"],
+            skip_invalid=options["skip_invalid"],
+        )
+        loaded = importer.get_checkpoint()
+        if loaded:
+            self.stdout.write(f"Resuming after {loaded} loaded records.")
+
+        started_at = time.perf_counter()
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                result = importer.run(file, input_format)
+        except (ImportRecordException, DatabaseError) as error:
+            raise CommandError(f"{error}\nThe loaded chunks are kept, rerun the command to continue.")
+        run_time = time.perf_counter() - started_at
+
+        self.stdout.write(
+            f"Records: {result.records}, tasks: {result.tasks}, errors: {result.errors}, skipped: {result.skipped} "
+            f"in {run_time:.2f} s ({result.records / run_time if run_time else 0:.0f} records/s)"
+        )
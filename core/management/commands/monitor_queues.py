@@ -0,0 +1,37 @@
+from celery import current_app
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+
+from core.autoscaling import BacklogMonitor
+
+
+class Command(BaseCommand):
+    """Runs the queue backlog monitor"""
+
+    help = "Samples the queues and publishes the metrics and the recommended worker concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=int, help="Time in seconds between the samples")
+        parser.add_argument("--metrics-port", type=int, help="Port of the Prometheus metrics endpoint")
+        parser.add_argument("--once", action="store_true", help="Take a single sample and exit")
+
+    def handle(self, *args, **options):
+        # the task types are registered by the task modules
+        current_app.loader.import_default_modules()
+        monitor = BacklogMonitor()
+        if options["metrics_port"]:
+            start_http_server(options["metrics_port"])
+        try:
+            if options["once"]:
+                with current_app.connection_for_read() as connection:
+                    samples = monitor.sample(connection)
+                recommendations = monitor.publish(samples)
+                for sample in samples:
+                    self.stdout.write(
+                        f"{sample.queue}: {sample.depth} queued, oldest pending {sample.oldest_pending_age or 0:.0f}s, "
+                        f"busy {sample.busy}/{sample.concurrency}, recommended {recommendations[sample.queue]}"
+                    )
+            else:
+                monitor.run(options["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,31 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.webhooks import WebhookSender
+
+
+class Command(BaseCommand):
+    """Runs the completion webhooks sender"""
+
+    help = "Sends completion webhooks queued in the WebhookDelivery table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, help="Number of concurrent deliveries")
+        parser.add_argument("--batch-size", type=int, help="Number of deliveries claimed at once")
+        parser.add_argument("--once", action="store_true", help="Send a single batch and exit")
+
+    def handle(self, *args, **options):
+        try:
+            sender = WebhookSender(concurrency=options["concurrency"])
+        except ImproperlyConfigured as error:
+            raise CommandError(str(error))
+        try:
+            if options["once"]:
+                sent = sender.send_batch(options["batch_size"])
+                self.stdout.write(f"{sent} webhook deliveries have been attempted.")
+            else:
+                sender.run(options["batch_size"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sender.close()
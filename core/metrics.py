@@ -0,0 +1,24 @@
+from prometheus_client import Counter, Gauge
+
+REPLICA_LAG = Gauge("task_management_replica_lag_seconds", "Measured replication lag of the replica", ["database"])
+DB_CONNECTIONS_OPENED = Counter(
+    "task_management_db_connections_opened", "Database connections opened by the process", ["database"]
+)
+DB_CONNECTIONS_REUSED = Counter(
+    "task_management_db_connections_reused", "Requests/tasks started with an open persistent connection", ["database"]
+)
+RESULT_CACHE_REQUESTS = Counter("task_management_result_cache_requests", "Result cache lookups", ["result"])
+RESULT_CACHE_EVICTIONS = Counter("task_management_result_cache_evictions", "Results evicted from the result cache")
+QUEUE_DEPTH = Gauge("task_management_queue_depth", "Messages waiting in the broker queue", ["queue"])
+QUEUE_OLDEST_PENDING_AGE = Gauge(
+    "task_management_queue_oldest_pending_seconds", "Time since the creation of the oldest pending task", ["queue"]
+)
+WORKER_BUSY_RATIO = Gauge(
+    "task_management_worker_busy_ratio", "Share of the pool slots of the workers consuming the queue in use", ["queue"]
+)
+WORKER_CONCURRENCY = Gauge(
+    "task_management_worker_concurrency", "Pool slots of the workers consuming the queue", ["queue"]
+)
+RECOMMENDED_CONCURRENCY = Gauge(
+    "task_management_recommended_concurrency", "Recommended pool slots of the workers consuming the queue", ["queue"]
+)
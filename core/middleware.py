@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from core.profiling import PROFILE_HEADER, Profile, is_profiling_requested, is_sampled
+from core.tracing import SPAN_KIND_SERVER, TRACEPARENT_HEADER, SpanContext, start_span
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses with gzip if the client allows it (Accept-Encoding)
+
+    Unlike GZipMiddleware, responses shorter than COMPRESSION_MIN_LENGTH are sent as is, since compressing them costs
+    more CPU than it saves on the wire.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
+
+
+class TracingMiddleware:
+    """Runs the request in a server span continuing the trace of the `traceparent` header (see core.tracing)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        parent = SpanContext.from_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        with start_span(f"{request.method}", SPAN_KIND_SERVER, {"http.method": request.method}, parent) as span:
+            response = self.get_response(request)
+            if request.resolver_match is not None:
+                span.update_name(f"{request.method} {request.resolver_match.route}")
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.set_error(f"HTTP {response.status_code}")
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests sampled with PROFILING_SAMPLE_RATE or sent with the PROFILE_HEADER (see core.profiling)
+
+    The breakdown of the profiled request is returned in the Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_profiling_requested(request.headers.get(PROFILE_HEADER)) and not is_sampled(
+            settings.PROFILING_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+
+        with Profile(f"{request.method} {request.path}", {"method": request.method, "path": request.path}) as profile:
+            response = self.get_response(request)
+            profile.attributes["status_code"] = response.status_code
+        summary = profile.summary
+        if summary is not None:
+            response["Server-Timing"] = (
+                f'db;dur={summary["query_time"] * 1000:.1f};desc="{summary["query_count"]} queries", '
+                f'serializer;dur={summary["serializer_time"] * 1000:.1f}, total;dur={summary["duration"] * 1000:.1f}'
+            )
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+import core.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="taskmeta",
+            name="id",
+            field=models.UUIDField(
+                default=core.utils.uuid7, editable=False, primary_key=True, serialize=False, verbose_name="Task ID"
+            ),
+        ),
+    ]
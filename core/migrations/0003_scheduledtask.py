@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-19 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_taskmeta_uuid7_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledTask",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="schedule",
+                        serialize=False,
+                        to="core.taskmeta",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Celery task name")),
+                ("kwargs", models.JSONField(default=dict)),
+                ("retries", models.PositiveIntegerField(default=0)),
+                ("due_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "ordering": ["due_at"],
+            },
+        ),
+    ]
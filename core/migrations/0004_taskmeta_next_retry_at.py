@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_scheduledtask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="next_retry_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_taskmeta_next_retry_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="kwargs",
+            field=models.JSONField(default=dict, verbose_name="Celery task named parameters"),
+        ),
+    ]
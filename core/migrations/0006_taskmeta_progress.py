@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_taskmeta_kwargs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="progress",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="Progress percent"),
+        ),
+        migrations.AddField(
+            model_name="taskmeta",
+            name="progress_message",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 17:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("core", "0006_taskmeta_progress"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="taskmeta",
+            index=models.Index(fields=["created_at"], name="core_taskme_created_443e35_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="taskmeta",
+            index=models.Index(fields=["status", "created_at"], name="core_taskme_status_5d15d6_idx"),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-19 17:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_taskmeta_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="callback_url",
+            field=models.URLField(blank=True, max_length=2048, verbose_name="Completion webhook URL"),
+        ),
+        migrations.CreateModel(
+            name="WebhookDelivery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("url", models.URLField(max_length=2048)),
+                ("payload", models.JSONField(default=dict)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.CharField(blank=True, max_length=255)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("failed_at", models.DateTimeField(null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="webhook_deliveries",
+                        to="core.taskmeta",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["next_attempt_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="webhookdelivery",
+            index=models.Index(
+                condition=models.Q(("failed_at__isnull", True)),
+                fields=["next_attempt_at"],
+                name="core_webhook_pending_idx",
+            ),
+        ),
+    ]
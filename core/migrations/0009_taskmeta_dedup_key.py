@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-19 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("core", "0008_taskmeta_callback_url_webhookdelivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="dedup_key",
+            field=models.CharField(
+                max_length=64, null=True, verbose_name="Hash of name, parameters and user in dedup mode"
+            ),
+        ),
+        # the unique index is built concurrently so that the table isn't locked for writes
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        'CREATE UNIQUE INDEX CONCURRENTLY "core_taskmeta_in_flight_dedup_key" ON "core_taskmeta" '
+                        "(\"dedup_key\") WHERE \"status\" IN ('PENDING', 'IN_PROGRESS', 'RETRY_PENDING')"
+                    ),
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "core_taskmeta_in_flight_dedup_key"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="taskmeta",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(("status__in", ("PENDING", "IN_PROGRESS", "RETRY_PENDING"))),
+                        fields=("dedup_key",),
+                        name="core_taskmeta_in_flight_dedup_key",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_taskmeta_dedup_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="type",
+            field=models.CharField(default="sample", max_length=36, verbose_name="Task type (see core.registry)"),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_taskmeta_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("name", models.CharField(max_length=36, primary_key=True, serialize=False)),
+                ("finished_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TaskRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "granularity",
+                    models.CharField(choices=[("minute", "Minute"), ("hour", "Hour"), ("day", "Day")], max_length=10),
+                ),
+                ("bucket", models.DateTimeField(verbose_name="Start of the time bucket")),
+                ("name", models.CharField(max_length=36)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("IN_PROGRESS", "In Progress"),
+                            ("COMPLETED", "Completed"),
+                            ("FAILED", "Failed"),
+                            ("RETRY_PENDING", "Retry Pending"),
+                            ("CANCELED", "Canceled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("run_time_sum", models.FloatField(default=0, verbose_name="Total run time in milliseconds")),
+                ("run_time_histogram", models.JSONField(default=dict)),
+                ("queue_wait_sum", models.FloatField(default=0, verbose_name="Total queue wait in milliseconds")),
+                ("queue_wait_histogram", models.JSONField(default=dict)),
+            ],
+            options={
+                "ordering": ["granularity", "bucket", "name", "status"],
+            },
+        ),
+        migrations.AddField(
+            model_name="taskmeta",
+            name="started_at",
+            field=models.DateTimeField(null=True, verbose_name="Start of the latest attempt"),
+        ),
+        migrations.AddConstraint(
+            model_name="taskrollup",
+            constraint=models.UniqueConstraint(
+                fields=("granularity", "bucket", "name", "status"), name="core_taskrollup_bucket_name_status"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_taskmeta_started_at_taskrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "source",
+                    models.CharField(
+                        max_length=255, primary_key=True, serialize=False, verbose_name="Input file path or import name"
+                    ),
+                ),
+                ("records", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
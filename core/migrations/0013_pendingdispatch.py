@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 18:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0012_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingDispatch",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pending_dispatch",
+                        serialize=False,
+                        to="core.taskmeta",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Celery task name")),
+                ("kwargs", models.JSONField(default=dict)),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["task"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pendingdispatch",
+            index=models.Index(fields=["user", "task"], name="core_pendin_user_id_b42953_idx"),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-19 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("core", "0013_pendingdispatch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FairShareQueue",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="fair_share_queue",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("deficit", models.FloatField(default=0)),
+                ("last_visit", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_fairsharequeue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskmeta",
+            name="attempt_token",
+            field=models.UUIDField(null=True, verbose_name="Token of the requeued attempt (see ATTEMPT_TOKEN_OPTION)"),
+        ),
+    ]
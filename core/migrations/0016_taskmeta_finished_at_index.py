@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-19 18:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("core", "0015_taskmeta_attempt_token"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="taskmeta",
+            index=models.Index(fields=["finished_at"], name="core_taskme_finishe_e9e515_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_taskmeta_finished_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingdispatch",
+            name="traceparent",
+            field=models.CharField(blank=True, max_length=55, verbose_name="Trace context of the creating span"),
+        ),
+        migrations.AddField(
+            model_name="scheduledtask",
+            name="traceparent",
+            field=models.CharField(blank=True, max_length=55, verbose_name="Trace context of the scheduling span"),
+        ),
+    ]
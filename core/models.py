@@ -1,12 +1,18 @@
 import logging
 import uuid
-from typing import Tuple
+from datetime import timedelta
+from typing import Optional, Tuple
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils.timezone import now
 
 from core.constants import (
+    DEFAULT_TASK_TYPE,
+    IN_FLIGHT_STATUSES,
+    ROLLUP_GRANULARITY_CHOICES,
     STATUS_CANCELED,
     STATUS_CHOICES,
     STATUS_COMPLETED,
@@ -14,8 +20,11 @@ from core.constants import (
     STATUS_IN_PROGRESS,
     STATUS_PENDING,
     STATUS_RETRY_PENDING,
+    TERMINAL_STATUSES,
 )
 from core.exceptions import TaskException
+from core.utils import uuid7
+from core.write_behind import publish_transition
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +32,23 @@ logger = logging.getLogger(__name__)
 class TaskMeta(models.Model):
     """TaskMeta entity model"""
 
-    id = models.UUIDField("Task ID", primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField("Task ID", primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    started_at = models.DateTimeField("Start of the latest attempt", null=True)
     finished_at = models.DateTimeField(null=True)
+    next_retry_at = models.DateTimeField(null=True)
     result = models.CharField(max_length=255)
 
     name = models.CharField(max_length=36)
+    type = models.CharField("Task type (see core.registry)", max_length=36, default=DEFAULT_TASK_TYPE)
+    kwargs = models.JSONField("Celery task named parameters", default=dict)
+    callback_url = models.URLField("Completion webhook URL", max_length=2048, blank=True)
+    dedup_key = models.CharField("Hash of name, parameters and user in dedup mode", max_length=64, null=True)
+    progress = models.PositiveSmallIntegerField("Progress percent", default=0)
+    progress_message = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempt_token = models.UUIDField("Token of the requeued attempt (see ATTEMPT_TOKEN_OPTION)", null=True)
 
     available_statuses_map = {
         STATUS_PENDING: (STATUS_IN_PROGRESS, STATUS_CANCELED),
@@ -43,20 +61,60 @@ class TaskMeta(models.Model):
         ),
         STATUS_RETRY_PENDING: (STATUS_IN_PROGRESS, STATUS_CANCELED),
     }
+    # transitions made only by the administrators (failed tasks stay failed for the workers and the status flusher)
+    requeue_statuses_map = {STATUS_FAILED: (STATUS_RETRY_PENDING,)}
+
+    # fields written by the status transitions (applied by the status flusher in write-behind mode)
+    write_behind_fields = (
+        "status",
+        "started_at",
+        "finished_at",
+        "next_retry_at",
+        "progress",
+        "progress_message",
+        "result",
+    )
 
     class Meta:
         """Metadata for the TaskMeta model"""
 
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["status", "created_at"]),
+            # incremental refresh of the duration rollups
+            models.Index(fields=["finished_at"]),
+        ]
+        constraints = [
+            # at most one in-flight task per dedup key, concurrent identical submissions fail to insert a copy
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=Q(status__in=IN_FLIGHT_STATUSES),
+                name="core_taskmeta_in_flight_dedup_key",
+            ),
+        ]
 
     def __str__(self) -> str:
         """String for representing the TaskMeta object."""
 
         return f"{self.name} {self.id}"
 
-    def start(self):
+    def start(self, attempt_token: Optional[str] = None):
+        """
+        Starts the attempt
+
+        :param attempt_token: token of the message, it must match the token of the requeued task
+        """
+
+        if self.attempt_token is not None and str(self.attempt_token) != attempt_token:
+            raise TaskException(f"The message of the task {self.id} has been superseded by its requeue.")
         self.change_status(STATUS_IN_PROGRESS)
-        self.save()
+        self.started_at = now()
+        self.next_retry_at = None
+        self.progress = 0
+        self.progress_message = ""
+        if not self.publish_transition():
+            self.save()
 
     def change_status(self, status: str):
         self.validate_next_status(status)
@@ -66,11 +124,50 @@ class TaskMeta(models.Model):
         if status not in self.next_available_statuses:
             raise TaskException(f"Can not change status from {self.status} to {status} for the task {self.id}.")
 
-    def finish(self, status):
+    def finish(self, status, result: Optional[str] = None):
+        self.set_finished(status, result)
+        if self.publish_transition():
+            return
+        with transaction.atomic():
+            self.save()
+            if self.callback_url and status in TERMINAL_STATUSES:
+                WebhookDelivery.for_task(self).save()
+
+    def publish_transition(self, fields: Optional[Tuple[str, ...]] = None) -> bool:
+        """
+        Publishes the status transition to the status flusher in write-behind mode
+
+        :param fields: fields written by the transition (all write_behind_fields by default)
+        :return: False if the transition is to be saved directly
+        """
+
+        if not settings.STATUS_WRITE_BEHIND:
+            return False
+        return publish_transition(
+            self.id, {field: getattr(self, field) for field in fields or self.write_behind_fields}
+        )
+
+    def set_finished(self, status, result: Optional[str] = None):
+        """Finishes the attempt without saving (batches are saved with set-based updates)"""
+
         self.change_status(status)
         self.finished_at = now()
-        self.result = "Some task's result might be here"
-        self.save()
+        self.result = result or "Some task's result might be here"
+
+    def wait_for_retry(self, countdown: float):
+        """Finishes the attempt and records the time of the next retry"""
+
+        self.next_retry_at = now() + timedelta(seconds=countdown)
+        self.finish(STATUS_RETRY_PENDING)
+
+    def set_requeued(self):
+        """Moves the task back to RETRY_PENDING with a new attempt token without saving (see requeue_statuses_map)"""
+
+        if STATUS_RETRY_PENDING not in self.requeue_statuses_map.get(self.status, ()):
+            raise TaskException(f"Can not requeue the task {self.id} in status {self.status}.")
+        self.status = STATUS_RETRY_PENDING
+        self.next_retry_at = None
+        self.attempt_token = uuid.uuid4()
 
     def add_error(self, message: str, traceback: str):
         """Stores related error information"""
@@ -98,3 +195,197 @@ class TaskError(models.Model):
         """Metadata for the TaskError model"""
 
         ordering = ["id"]
+
+
+class ScheduledTask(models.Model):
+    """
+    ScheduledTask entity model
+
+    Stores delayed task executions (delayed starts and retries) until they are due to be published to the broker,
+    so that workers don't have to keep ETA messages in memory.
+    """
+
+    task = models.OneToOneField(TaskMeta, on_delete=models.CASCADE, primary_key=True, related_name="schedule")
+    name = models.CharField("Celery task name", max_length=255)
+    kwargs = models.JSONField(default=dict)
+    retries = models.PositiveIntegerField(default=0)
+    due_at = models.DateTimeField(db_index=True)
+    traceparent = models.CharField("Trace context of the scheduling span", max_length=55, blank=True)
+
+    class Meta:
+        """Metadata for the ScheduledTask model"""
+
+        ordering = ["due_at"]
+
+    def __str__(self) -> str:
+        """String for representing the ScheduledTask object."""
+
+        return f"{self.name} {self.task_id} at {self.due_at}"
+
+
+class PendingDispatch(models.Model):
+    """
+    PendingDispatch entity model
+
+    Task waiting in the per-user queue of the fair-share dispatcher (see core.fair_share), which publishes it to
+    the broker when there is a free worker slot and the user's turn has come.
+    """
+
+    task = models.OneToOneField(TaskMeta, on_delete=models.CASCADE, primary_key=True, related_name="pending_dispatch")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField("Celery task name", max_length=255)
+    kwargs = models.JSONField(default=dict)
+    traceparent = models.CharField("Trace context of the creating span", max_length=55, blank=True)
+
+    class Meta:
+        """Metadata for the PendingDispatch model"""
+
+        ordering = ["task"]
+        indexes = [
+            models.Index(fields=["user", "task"]),
+        ]
+
+    def __str__(self) -> str:
+        """String for representing the PendingDispatch object."""
+
+        return f"{self.name} {self.task_id} of {self.user_id}"
+
+
+class FairShareQueue(models.Model):
+    """
+    FairShareQueue entity model
+
+    Deficit round-robin state of a user queue of the fair-share dispatcher kept between the dispatches, so a round
+    cut by the free slots is continued by the next dispatch. The row is deleted once the queue is drained.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="fair_share_queue")
+    # slots earned by the queue but not used yet
+    deficit = models.FloatField(default=0)
+    # logical time of the last visit, the least recently visited queues are visited first
+    last_visit = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        """String for representing the FairShareQueue object."""
+
+        return f"{self.user_id}: {self.deficit} at {self.last_visit}"
+
+
+class WebhookDelivery(models.Model):
+    """
+    WebhookDelivery entity model
+
+    Durable queue of completion webhooks, the deliveries are sent by the webhook sender (`send_webhooks` command)
+    and deleted once the receiver has accepted them.
+    """
+
+    task = models.ForeignKey(TaskMeta, on_delete=models.CASCADE, related_name="webhook_deliveries")
+    url = models.URLField(max_length=2048)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.CharField(max_length=255, blank=True)
+    next_attempt_at = models.DateTimeField(default=now)
+    failed_at = models.DateTimeField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Metadata for the WebhookDelivery model"""
+
+        ordering = ["next_attempt_at"]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"], condition=Q(failed_at__isnull=True), name="core_webhook_pending_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """String for representing the WebhookDelivery object."""
+
+        return f"{self.url} {self.task_id}"
+
+    @classmethod
+    def for_task(cls, task: TaskMeta) -> "WebhookDelivery":
+        """Returns delivery of the completion webhook of the finished task"""
+
+        return cls(
+            task=task,
+            url=task.callback_url,
+            payload={
+                "event": "task.finished",
+                "task": {
+                    "uuid": str(task.id),
+                    "name": task.name,
+                    "status": task.status,
+                    "finished_at": task.finished_at and task.finished_at.isoformat(),
+                    "result": task.result if task.status == STATUS_COMPLETED else None,
+                },
+            },
+        )
+
+
+class TaskRollup(models.Model):
+    """
+    TaskRollup entity model
+
+    Number, run time and queue wait of the finished tasks per time bucket, name and status. Durations are kept in
+    mergeable histograms (see core.analytics), so percentiles of several buckets are computed from their sum.
+    """
+
+    granularity = models.CharField(max_length=10, choices=ROLLUP_GRANULARITY_CHOICES)
+    bucket = models.DateTimeField("Start of the time bucket")
+    name = models.CharField(max_length=36)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    run_time_sum = models.FloatField("Total run time in milliseconds", default=0)
+    run_time_histogram = models.JSONField(default=dict)
+    queue_wait_sum = models.FloatField("Total queue wait in milliseconds", default=0)
+    queue_wait_histogram = models.JSONField(default=dict)
+
+    class Meta:
+        """Metadata for the TaskRollup model"""
+
+        ordering = ["granularity", "bucket", "name", "status"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "name", "status"], name="core_taskrollup_bucket_name_status"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """String for representing the TaskRollup object."""
+
+        return f"{self.name} {self.status} {self.granularity} {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    """
+    RollupWatermark entity model
+
+    The tasks finished before the watermark have been aggregated into the rollups.
+    """
+
+    name = models.CharField(max_length=36, primary_key=True)
+    finished_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        """String for representing the RollupWatermark object."""
+
+        return f"{self.name} {self.finished_at}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    ImportCheckpoint entity model
+
+    Number of the input records already loaded by the bulk import (`import_tasks` command), it's updated in the
+    transaction of every chunk, so an interrupted import is resumed right after the last loaded chunk.
+    """
+
+    source = models.CharField("Input file path or import name", max_length=255, primary_key=True)
+    records = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        """String for representing the ImportCheckpoint object."""
+
+        return f"{self.source} {self.records}"
@@ -0,0 +1,152 @@
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import sys
+import time
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Optional
+
+import orjson
+from django.conf import settings
+from django.db import connections
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+# request header enabling the profiling of the request, its value must be PROFILING_TOKEN
+PROFILE_HEADER = "X-Profile"
+
+# time spent in these modules is reported as the serializer time (they aren't imported here, since the workers
+# don't load DRF)
+SERIALIZER_MODULES = (
+    "rest_framework.serializers",
+    "rest_framework.fields",
+    "rest_framework.relations",
+    "core.serializers",
+)
+
+active_profile: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+
+
+class Profile:
+    """
+    cProfile profile of a request or task execution with its SQL query count and time
+
+    Used as a context manager. On exit, the stats are saved to PROFILING_DIR as `<name>.prof` (loadable with
+    `pstats.Stats` or snakeviz) together with the `<name>.json` summary.
+    """
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        """
+        :param name: profiled operation (e.g. "GET /api/tasks/"), it's a part of the file names
+        :param attributes: additional fields of the summary
+        """
+
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.profiler = cProfile.Profile()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.started_at = None
+        self.summary = None
+        self.stack = ExitStack()
+        self.token = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """Execute wrapper counting the queries of all the database connections"""
+
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += time.perf_counter() - started_at
+
+    def __enter__(self) -> "Profile":
+        self.token = active_profile.set(self)
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.record_query))
+        self.started_at = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        duration = time.perf_counter() - self.started_at
+        self.stack.close()
+        active_profile.reset(self.token)
+        try:
+            self.summary = self.get_summary(duration)
+            self.save()
+        except Exception as error:
+            # profiling must not break the profiled operations
+            logger.warning(f"Failed to save the profile of {self.name}: {error}")
+
+    def get_serializer_time(self, stats: pstats.Stats) -> float:
+        """Returns time (in seconds) spent in the serializers including the queries made by them"""
+
+        files = {sys.modules[name].__file__ for name in SERIALIZER_MODULES if name in sys.modules}
+        serializer_time = 0.0
+        for (file, _, _), (_, _, _, _, callers) in stats.stats.items():
+            if file not in files:
+                continue
+            # calls entering the serializers from the outside (the nested ones are included in their time)
+            serializer_time += sum(
+                cumulative_time
+                for (caller_file, _, _), (*_, cumulative_time) in callers.items()
+                if caller_file not in files
+            )
+        return serializer_time
+
+    def get_summary(self, duration: float) -> dict:
+        """Returns the durations (in seconds) and the number of queries"""
+
+        return {
+            "name": self.name,
+            **self.attributes,
+            "duration": duration,
+            "query_count": self.query_count,
+            "query_time": self.query_time,
+            "serializer_time": self.get_serializer_time(pstats.Stats(self.profiler)),
+        }
+
+    def save(self) -> str:
+        """
+        Saves the stats and the summary to PROFILING_DIR
+
+        :return: path of the stats without the extension
+        """
+
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILING_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{slugify(self.name)}-{uuid.uuid4().hex[:8]}"
+        )
+        self.profiler.dump_stats(f"{path}.prof")
+        summary = self.summary
+        with open(f"{path}.json", "wb") as file:
+            file.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
+        logger.info(
+            f"{self.name} has been profiled: {summary['duration'] * 1000:.1f} ms, {summary['query_count']} queries "
+            f"({summary['query_time'] * 1000:.1f} ms), serializers {summary['serializer_time'] * 1000:.1f} ms "
+            f"[{path}.prof]"
+        )
+        return path
+
+
+def is_sampled(sample_rate: float) -> bool:
+    """Checks that the operation is selected for profiling (a nested operation isn't profiled separately)"""
+
+    return active_profile.get() is None and sample_rate > 0 and random.random() < sample_rate
+
+
+def is_profiling_requested(header_value: Optional[str]) -> bool:
+    """Checks the value of PROFILE_HEADER against PROFILING_TOKEN"""
+
+    if not settings.PROFILING_TOKEN or not header_value or active_profile.get() is not None:
+        return False
+    return hmac.compare_digest(header_value.encode(), settings.PROFILING_TOKEN.encode())
@@ -0,0 +1,60 @@
+import logging
+from typing import Dict, Iterable
+
+from django.conf import settings
+from redis import RedisError
+
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = "task_progress:{}"
+
+
+def store_progress(task_id: str, percent: int, message: str):
+    """Stores the latest progress of the task in Redis"""
+
+    key = PROGRESS_KEY.format(task_id)
+    try:
+        get_redis().pipeline().hset(key, mapping={"percent": percent, "message": message}).expire(
+            key, settings.PROGRESS_TTL
+        ).execute()
+    except RedisError as error:
+        logger.warning(f"Failed to store progress of the task {task_id}: {error}")
+
+
+def clear_progress(*task_ids: str):
+    """Removes progress of the finished tasks from Redis"""
+
+    try:
+        get_redis().delete(*(PROGRESS_KEY.format(task_id) for task_id in task_ids))
+    except RedisError as error:
+        logger.warning(f"Failed to clear progress of the tasks {', '.join(map(str, task_ids))}: {error}")
+
+
+def get_progress_map(task_ids: Iterable) -> Dict[str, dict]:
+    """
+    Returns the latest progress of the tasks stored in Redis (with a single round trip)
+
+    :param task_ids: ids of the tasks
+    :return: {task id: {"percent": ..., "message": ...}} for the tasks that have progress in Redis
+    """
+
+    task_ids = [str(task_id) for task_id in task_ids]
+    if not task_ids:
+        return {}
+
+    pipeline = get_redis().pipeline(transaction=False)
+    for task_id in task_ids:
+        pipeline.hgetall(PROGRESS_KEY.format(task_id))
+    try:
+        values = pipeline.execute()
+    except RedisError as error:
+        logger.warning(f"Failed to read progress of the tasks: {error}")
+        return {}
+
+    return {
+        task_id: {"percent": int(value[b"percent"]), "message": value[b"message"].decode()}
+        for task_id, value in zip(task_ids, values)
+        if value
+    }
@@ -0,0 +1,11 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    """Returns Redis client for application data (connections are pooled by the client)"""
+
+    return redis.Redis.from_url(settings.REDIS_URL)
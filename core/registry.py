@@ -0,0 +1,78 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from celery import Task
+from django.utils.module_loading import import_string
+
+from core.constants import EXECUTION_CHOICES
+
+
+class TaskType(NamedTuple):
+    """
+    Task type available in the API
+
+    The parameters serializer is referenced by its import path, so workers don't import the web stack.
+    """
+
+    name: str
+    task: Task
+    params_serializer: str
+    execution: str
+
+    def get_params_serializer(self):
+        return import_string(self.params_serializer)
+
+    @property
+    def queue(self) -> str:
+        """Queue consumed by the worker pool of the execution style"""
+
+        return self.execution
+
+
+class TaskRegistry:
+    """Maps task type names to the Celery tasks implementing them"""
+
+    def __init__(self):
+        self.types: Dict[str, TaskType] = {}
+        self.task_names: Dict[str, TaskType] = {}
+
+    def register(self, name: str, params_serializer: str, execution: str):
+        """
+        Returns decorator registering the Celery task as the implementation of the task type
+
+        :param name: task type name
+        :param params_serializer: import path of the serializer validating the task parameters
+        :param execution: execution style (one of EXECUTION_CHOICES)
+        """
+
+        if execution not in dict(EXECUTION_CHOICES):
+            raise ValueError(f"Unknown execution style {execution} of the task type {name}.")
+
+        def decorator(task: Task) -> Task:
+            if name in self.types:
+                raise ValueError(f"Task type {name} is already registered.")
+            self.types[name] = self.task_names[task.name] = TaskType(name, task, params_serializer, execution)
+            return task
+
+        return decorator
+
+    def get(self, name: str) -> TaskType:
+        return self.types[name]
+
+    def get_by_task_name(self, task_name: str) -> Optional[TaskType]:
+        return self.task_names.get(task_name)
+
+    @property
+    def choices(self) -> List[Tuple[str, str]]:
+        return [(name, name) for name in self.types]
+
+
+task_registry = TaskRegistry()
+
+
+def route_task(name, args, kwargs, options, task=None, **kw) -> Optional[dict]:
+    """Celery router sending the tasks of the registered types to the queue of their execution style"""
+
+    task_type = task_registry.get_by_task_name(name)
+    if task_type is None:
+        return None
+    return {"queue": task_type.queue}
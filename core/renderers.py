@@ -0,0 +1,34 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renderer which serializes to JSON with orjson
+
+    UUID and datetime values are serialized natively, other types fall back to the DRF JSON encoder.
+    """
+
+    encoder = encoders.JSONEncoder()
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring
+
+        orjson supports only 2-space indentation, so any requested indent (e.g. `indent=4` in the media type or
+        the browsable API default) is rendered with OPT_INDENT_2.
+        """
+
+        if data is None:
+            return b""
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=self.encoder.default, option=options)
+
+        # Keep the output a strict javascript subset the same way as JSONRenderer does
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
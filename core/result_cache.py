@@ -0,0 +1,62 @@
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from redis import RedisError
+
+from core.metrics import RESULT_CACHE_EVICTIONS, RESULT_CACHE_REQUESTS
+from core.redis_client import get_redis
+from core.utils import canonical_hash
+
+logger = logging.getLogger(__name__)
+
+RESULT_KEY = "result_cache:{}"
+# Sorted set of the cached keys scored by their expiration time (extended on every hit), so the least recently used
+# ones are evicted first and the expired ones are removed by the score range
+RESULT_LRU_KEY = "result_cache_lru"
+
+
+def get_result_cache_key(task_name: str, params: dict) -> str:
+    """Returns the result cache key of the task type with the parameters"""
+
+    return canonical_hash([task_name, params])
+
+
+def get_cached_result(key: str) -> Optional[str]:
+    """Returns the cached result (and extends its TTL) or None (also if Redis is not available)"""
+
+    redis = get_redis()
+    try:
+        value = redis.getex(RESULT_KEY.format(key), ex=settings.RESULT_CACHE_TTL)
+        if value is not None:
+            redis.zadd(RESULT_LRU_KEY, {key: time.time() + settings.RESULT_CACHE_TTL})
+    except RedisError as error:
+        logger.warning(f"Failed to read cached result {key}: {error}")
+        value = None
+
+    RESULT_CACHE_REQUESTS.labels(result="miss" if value is None else "hit").inc()
+    return None if value is None else value.decode()
+
+
+def cache_result(key: str, result: str):
+    """Caches the result for RESULT_CACHE_TTL seconds, the least recently used over RESULT_CACHE_MAX_SIZE are evicted"""
+
+    redis = get_redis()
+    timestamp = time.time()
+    try:
+        *_, size = (
+            redis.pipeline()
+            .set(RESULT_KEY.format(key), result, ex=settings.RESULT_CACHE_TTL)
+            .zremrangebyscore(RESULT_LRU_KEY, "-inf", timestamp)
+            .zadd(RESULT_LRU_KEY, {key: timestamp + settings.RESULT_CACHE_TTL})
+            .zcard(RESULT_LRU_KEY)
+            .execute()
+        )
+        excess = size - settings.RESULT_CACHE_MAX_SIZE
+        if excess > 0:
+            evicted_keys = [member.decode() for member, _ in redis.zpopmin(RESULT_LRU_KEY, excess)]
+            redis.delete(*[RESULT_KEY.format(evicted_key) for evicted_key in evicted_keys])
+            RESULT_CACHE_EVICTIONS.inc(len(evicted_keys))
+    except RedisError as error:
+        logger.warning(f"Failed to cache result {key}: {error}")
@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+from typing import Optional
+
+from django.conf import settings
+from redis import RedisError
+
+from core.constants import (
+    RETRY_POLICY_DECORRELATED_JITTER,
+    RETRY_POLICY_EXPONENTIAL,
+    RETRY_POLICY_FIXED,
+    RETRY_POLICY_FULL_JITTER,
+)
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Hash of the attempts and retries of the Celery task within a RETRY_BUDGET_WINDOW (by task name and window number)
+RETRY_BUDGET_KEY = "retry_budget:{}:{}"
+
+
+def get_retry_delay(
+    policy: str, base: float, cap: float, retries: int, previous_delay: Optional[float] = None
+) -> float:
+    """
+    Returns delay in seconds before the next retry
+
+    :param policy: one of the RETRY_POLICY_CHOICES
+    :param base: base delay in seconds (the `countdown` option)
+    :param cap: maximum delay in seconds (ignored by the fixed policy)
+    :param retries: number of retries already made
+    :param previous_delay: delay before the previous retry (used by the decorrelated jitter policy)
+    """
+
+    if policy == RETRY_POLICY_FIXED:
+        return base
+    if policy == RETRY_POLICY_EXPONENTIAL:
+        return min(cap, base * 2**retries)
+    if policy == RETRY_POLICY_FULL_JITTER:
+        return random.uniform(0, min(cap, base * 2**retries))
+    if policy == RETRY_POLICY_DECORRELATED_JITTER:
+        return min(cap, random.uniform(base, (previous_delay or base) * 3))
+    raise ValueError(f"Unknown retry policy {policy}")
+
+
+def get_retry_budget_keys(task_name: str) -> tuple:
+    """Returns keys of the current and the previous retry budget windows of the task"""
+
+    window = int(time.time() // settings.RETRY_BUDGET_WINDOW)
+    return RETRY_BUDGET_KEY.format(task_name, window), RETRY_BUDGET_KEY.format(task_name, window - 1)
+
+
+def record_attempts(task_name: str, count: int = 1):
+    """Counts the executions of the task in its retry budget"""
+
+    key, _ = get_retry_budget_keys(task_name)
+    try:
+        get_redis().pipeline().hincrby(key, "attempts", count).expire(key, 2 * settings.RETRY_BUDGET_WINDOW).execute()
+    except RedisError as error:
+        logger.warning(f"Failed to record attempts of {task_name}: {error}")
+
+
+def acquire_retry(task_name: str) -> bool:
+    """
+    Takes a retry from the budget shared by all the tasks with the name
+
+    Retries within the current and the previous RETRY_BUDGET_WINDOW are limited to RETRY_BUDGET_MIN plus
+    RETRY_BUDGET_RATIO of the attempts, so a failing downstream service gets a bounded retry load instead of every
+    failed task retrying. Retries are allowed if Redis is not available.
+
+    :return: whether the retry fits into the budget
+    """
+
+    key, previous_key = get_retry_budget_keys(task_name)
+    redis = get_redis()
+    try:
+        retries, _, (attempts,), (previous_attempts, previous_retries) = (
+            redis.pipeline()
+            .hincrby(key, "retries", 1)
+            .expire(key, 2 * settings.RETRY_BUDGET_WINDOW)
+            .hmget(key, "attempts")
+            .hmget(previous_key, "attempts", "retries")
+            .execute()
+        )
+        attempts = int(attempts or 0) + int(previous_attempts or 0)
+        if retries + int(previous_retries or 0) <= settings.RETRY_BUDGET_MIN + settings.RETRY_BUDGET_RATIO * attempts:
+            return True
+        redis.hincrby(key, "retries", -1)
+    except RedisError as error:
+        logger.warning(f"Failed to acquire retry of {task_name}: {error}")
+        return True
+    return False
@@ -0,0 +1,92 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from celery import Task, current_app
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from core.models import ScheduledTask
+from core.tracing import SPAN_KIND_PRODUCER, SpanContext, get_traceparent, start_span
+from core.utils import get_time_limits
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_task(celery_task: Task, task_id: str, kwargs: dict, delay: int, retries: int = 0):
+    """
+    Schedules task execution after the delay
+
+    Short delays are left to the broker (ETA message), longer ones are stored in the ScheduledTask table with the
+    trace context of the current span and published by `release_due_tasks` when they are due.
+
+    :param celery_task: Celery task to be executed
+    :param task_id: TaskMeta id
+    :param kwargs: named parameters of the Celery task
+    :param delay: delay in seconds
+    :param retries: number of retries already made
+    """
+
+    if delay < settings.SCHEDULER_MIN_DELAY:
+        celery_task.apply_async(
+            kwargs=kwargs, task_id=task_id, countdown=delay, retries=retries, **get_time_limits(kwargs)
+        )
+        return
+
+    ScheduledTask.objects.update_or_create(
+        task_id=task_id,
+        defaults=dict(
+            name=celery_task.name,
+            kwargs=kwargs,
+            retries=retries,
+            due_at=now() + timedelta(seconds=delay),
+            traceparent=get_traceparent(),
+        ),
+    )
+    logger.info(f"The task {task_id} has been scheduled in {delay} seconds.")
+
+
+def release_due_tasks(batch_size: Optional[int] = None) -> int:
+    """
+    Publishes due scheduled tasks to the broker
+
+    Rows are locked with SKIP LOCKED, so several releasers can run concurrently without publishing a task twice.
+
+    :param batch_size: maximum number of tasks released in one transaction
+    :return: number of released tasks
+    """
+
+    batch_size = batch_size or settings.SCHEDULER_BATCH_SIZE
+    released = 0
+    while True:
+        with transaction.atomic():
+            due_tasks = list(
+                ScheduledTask.objects.select_for_update(skip_locked=True)
+                .filter(due_at__lte=now())
+                .order_by("due_at")[:batch_size]
+            )
+            for scheduled_task in due_tasks:
+                # the message continues the trace of the scheduling span
+                with start_span(
+                    "celery.publish",
+                    SPAN_KIND_PRODUCER,
+                    {"celery.task_name": scheduled_task.name},
+                    SpanContext.from_traceparent(scheduled_task.traceparent),
+                ):
+                    current_app.send_task(
+                        scheduled_task.name,
+                        kwargs=scheduled_task.kwargs,
+                        task_id=str(scheduled_task.task_id),
+                        retries=scheduled_task.retries,
+                        **get_time_limits(scheduled_task.kwargs),
+                    )
+            ScheduledTask.objects.filter(pk__in=[scheduled_task.pk for scheduled_task in due_tasks]).delete()
+
+        released += len(due_tasks)
+        if len(due_tasks) < batch_size:
+            break
+
+    if released:
+        logger.info(f"{released} scheduled tasks have been released.")
+    return released
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import drf_yasg
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml, yaml_sane_dump
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.views import SPEC_RENDERERS, get_schema_view
+from rest_framework import permissions
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+
+logger = logging.getLogger(__name__)
+
+API_INFO = openapi.Info(
+    title="Swagger API",
+    default_version="v1",
+    description="API for Task management system [demo]",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="alex.n.ermoalev@gmail.com"),
+    license=openapi.License(name="Absolutely free License"),
+)
+
+# Top-level vendor extension of the schema file identifying the code it has been generated from
+FINGERPRINT_KEY = "x-code-fingerprint"
+
+
+# Packages whose code shapes the schema (their tests and migrations don't)
+SCHEMA_SOURCE_PACKAGES = ("core", "task_management")
+SCHEMA_SOURCE_EXCLUDED_DIRS = {"tests", "migrations", "management"}
+
+
+def get_source_files() -> List[Path]:
+    """Returns the source files of the SCHEMA_SOURCE_PACKAGES the schema is generated from"""
+
+    base_dir = Path(settings.BASE_DIR)
+    return [
+        path
+        for package in SCHEMA_SOURCE_PACKAGES
+        for path in sorted((base_dir / package).rglob("*.py"))
+        if not SCHEMA_SOURCE_EXCLUDED_DIRS.intersection(path.relative_to(base_dir).parts)
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_code_fingerprint() -> str:
+    """
+    Returns hash of the code (and the drf_yasg version) the schema is generated from
+
+    OPENAPI_SCHEMA_VERSION (e.g. the commit set at build time) is used as the code version if it's set, otherwise
+    the sources of the SCHEMA_SOURCE_PACKAGES are hashed.
+    """
+
+    digest = hashlib.sha256(drf_yasg.__version__.encode())
+    if settings.OPENAPI_SCHEMA_VERSION:
+        digest.update(settings.OPENAPI_SCHEMA_VERSION.encode())
+        return digest.hexdigest()
+    for path in get_source_files():
+        digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schema() -> bytes:
+    """Generates the public OpenAPI schema (in JSON) of all the endpoints"""
+
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    schema[FINGERPRINT_KEY] = get_code_fingerprint()
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema() -> str:
+    """Generates the schema into the OPENAPI_SCHEMA_FILE and returns the path"""
+
+    Path(settings.OPENAPI_SCHEMA_FILE).write_bytes(generate_schema())
+    return settings.OPENAPI_SCHEMA_FILE
+
+
+def load_schema() -> Optional[bytes]:
+    """Returns the precomputed schema if it has been generated from the current code"""
+
+    path = settings.OPENAPI_SCHEMA_FILE
+    if not path or not os.path.exists(path):
+        return None
+    content = Path(path).read_bytes()
+    if json.loads(content).get(FINGERPRINT_KEY) != get_code_fingerprint():
+        logger.warning(f"OpenAPI schema {path} has been generated from another version of the code, ignoring it.")
+        return None
+    return content
+
+
+@lru_cache(maxsize=None)
+def get_schema() -> bytes:
+    """Returns the schema in JSON (loaded from OPENAPI_SCHEMA_FILE or generated once per process)"""
+
+    return load_schema() or generate_schema()
+
+
+@lru_cache(maxsize=None)
+def get_rendered_schema(codec_class: type) -> Tuple[bytes, str]:
+    """Returns the schema encoded by the codec and its ETag"""
+
+    content = get_schema()
+    if issubclass(codec_class, OpenAPICodecYaml):
+        content = yaml_sane_dump(json.loads(content, object_pairs_hook=OrderedDict), binary=True)
+    return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class SchemaView(
+    get_schema_view(
+        API_INFO,
+        public=True,
+        permission_classes=[permissions.IsAuthenticated],
+        authentication_classes=[SessionAuthentication, BasicAuthentication],
+    )
+):
+    """Serves the precomputed schema with ETag instead of introspecting the views on every request"""
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, SPEC_RENDERERS):
+            # the UI pages only reference the schema URL
+            return super().get(request, version, format)
+
+        content, etag = get_rendered_schema(renderer.codec_class)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=renderer.media_type)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,12 +1,38 @@
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils.timezone import now
 from rest_framework import serializers
 
+from core.analytics import get_duration_summary
 from core.constants import (
+    DEFAULT_TASK_TYPE,
+    RETRY_POLICY_CHOICES,
+    ROLLUP_GRANULARITY_CHOICES,
+    ROLLUP_GRANULARITY_DAY,
+    ROLLUP_GRANULARITY_HOUR,
+    ROLLUP_GRANULARITY_MINUTE,
     STATUS_CANCELED,
+    STATUS_CHOICES,
     STATUS_COMPLETED,
     STATUS_FAILED,
+    STATUS_IN_PROGRESS,
     STATUS_RETRY_PENDING,
 )
-from core.models import TaskError, TaskMeta
+from core.exceptions import UnsafeURLException
+from core.models import TaskError, TaskMeta, TaskRollup
+from core.progress import get_progress_map
+from core.registry import task_registry
+from core.webhooks import resolve_callback_url
+
+RESULT_STATUSES = (STATUS_COMPLETED,)
+FINISHED_AT_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELED, STATUS_RETRY_PENDING)
+ERRORS_STATUSES = (STATUS_FAILED, STATUS_RETRY_PENDING)
+NEXT_RETRY_AT_STATUSES = (STATUS_RETRY_PENDING,)
+PROGRESS_STATUSES = (STATUS_IN_PROGRESS,)
 
 
 class TaskErrorSerializer(serializers.ModelSerializer):
@@ -24,7 +50,12 @@ class TaskCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TaskMeta
-        fields = ["uuid", "name"]
+        fields = ["uuid", "name", "type"]
+
+    def validate_type(self, value: str) -> str:
+        if value not in task_registry.types:
+            raise serializers.ValidationError(f"Unknown task type. Available types: {', '.join(task_registry.types)}.")
+        return value
 
 
 class TaskSerializer(TaskCreateSerializer):
@@ -32,21 +63,169 @@ class TaskSerializer(TaskCreateSerializer):
 
     errors = TaskErrorSerializer(many=True, read_only=True)
     user = serializers.CharField(source="user.username", read_only=True)
+    progress = serializers.SerializerMethodField()
 
     class Meta:
         model = TaskMeta
-        fields = ["uuid", "name", "created_at", "finished_at", "status", "result", "errors", "user"]
+        fields = [
+            "uuid",
+            "name",
+            "type",
+            "created_at",
+            "finished_at",
+            "next_retry_at",
+            "status",
+            "progress",
+            "result",
+            "errors",
+            "user",
+        ]
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs):
+        """
+        Inits serializer
+
+        :param fields: sparse fieldset, only these fields are built (all fields if not provided)
+        """
+
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
     def to_representation(self, instance):
         """Custom representation for TaskMeta model instances that remove data depending on status"""
 
         data = super().to_representation(instance)
-        if instance.status != STATUS_COMPLETED:
+        if instance.status not in RESULT_STATUSES:
             data.pop("result", None)
-        if instance.status not in [STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELED, STATUS_RETRY_PENDING]:
+        if instance.status not in FINISHED_AT_STATUSES:
             data.pop("finished_at", None)
-        if instance.status not in [STATUS_FAILED, STATUS_RETRY_PENDING]:
+        if instance.status not in ERRORS_STATUSES:
             data.pop("errors", None)
+        if instance.status not in NEXT_RETRY_AT_STATUSES:
+            data.pop("next_retry_at", None)
+        if instance.status not in PROGRESS_STATUSES:
+            data.pop("progress", None)
+        return data
+
+    def get_progress(self, instance) -> Optional[dict]:
+        """Returns the latest progress from Redis, falls back to the value flushed to the database"""
+
+        if instance.status not in PROGRESS_STATUSES:
+            return None
+        progress_map = get_progress_map([instance.id])
+        return progress_map.get(str(instance.id), {"percent": instance.progress, "message": instance.progress_message})
+
+
+class TaskProjectionSerializer:
+    """
+    Lightweight read-only serializer for TaskMeta lists
+
+    Reads only the requested columns with a values() projection and builds dicts directly. The output is the same
+    as the TaskSerializer output, including the status-dependent field rules.
+    """
+
+    columns_map = {
+        "uuid": "id",
+        "name": "name",
+        "type": "type",
+        "created_at": "created_at",
+        "finished_at": "finished_at",
+        "next_retry_at": "next_retry_at",
+        "status": "status",
+        "result": "result",
+        "user": "user__username",
+    }
+    status_dependent_fields = {
+        "result": RESULT_STATUSES,
+        "finished_at": FINISHED_AT_STATUSES,
+        "errors": ERRORS_STATUSES,
+        "next_retry_at": NEXT_RETRY_AT_STATUSES,
+        "progress": PROGRESS_STATUSES,
+    }
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        """
+        Inits serializer
+
+        :param fields: sparse fieldset, all TaskSerializer fields if not provided
+        """
+
+        requested = TaskSerializer.Meta.fields if fields is None else set(fields)
+        self.fields = [field_name for field_name in TaskSerializer.Meta.fields if field_name in requested]
+
+    def get_columns(self) -> List[str]:
+        """Returns the model columns to be read for the requested fields"""
+
+        columns = ["id"]
+        for field_name in self.fields:
+            column = self.columns_map.get(field_name)
+            if column and column not in columns:
+                columns.append(column)
+        if "progress" in self.fields:
+            columns.extend(["progress", "progress_message"])
+        if "status" not in columns and any(field_name in self.status_dependent_fields for field_name in self.fields):
+            columns.append("status")
+        return columns
+
+    def project(self, queryset: QuerySet) -> QuerySet:
+        """Returns values() projection of the queryset that contains only the requested columns"""
+
+        return queryset.values(*self.get_columns())
+
+    def get_errors_map(self, rows: List[dict]) -> Dict:
+        """Loads errors of the tasks with error-exposing statuses with a single query"""
+
+        task_ids = [row["id"] for row in rows if row["status"] in ERRORS_STATUSES]
+        errors_map = defaultdict(list)
+        if not task_ids:
+            return errors_map
+        errors = TaskError.objects.filter(task_id__in=task_ids).values_list("task_id", "message", "created_at")
+        for task_id, message, created_at in errors:
+            errors_map[task_id].append(
+                {"message": message, "created_at": self.datetime_field.to_representation(created_at)}
+            )
+        return errors_map
+
+    @staticmethod
+    def get_progress_map(rows: List[dict]) -> Dict:
+        """Reads the latest progress of IN_PROGRESS tasks from Redis with a single round trip"""
+
+        return get_progress_map(row["id"] for row in rows if row["status"] in PROGRESS_STATUSES)
+
+    def to_representation(self, rows: Iterable[dict]) -> List[dict]:
+        """
+        Builds representation for the projected rows
+
+        :param rows: rows of the queryset returned by the project method
+        """
+
+        rows = list(rows)
+        errors_map = self.get_errors_map(rows) if "errors" in self.fields else {}
+        progress_map = self.get_progress_map(rows) if "progress" in self.fields else {}
+        to_datetime = self.datetime_field.to_representation
+        data = []
+        for row in rows:
+            item = {}
+            for field_name in self.fields:
+                allowed_statuses = self.status_dependent_fields.get(field_name)
+                if allowed_statuses and row["status"] not in allowed_statuses:
+                    continue
+                if field_name == "uuid":
+                    item[field_name] = str(row["id"])
+                elif field_name == "errors":
+                    item[field_name] = errors_map.get(row["id"], [])
+                elif field_name == "progress":
+                    item[field_name] = progress_map.get(
+                        str(row["id"]), {"percent": row["progress"], "message": row["progress_message"]}
+                    )
+                elif field_name in ("created_at", "finished_at", "next_retry_at"):
+                    item[field_name] = to_datetime(row[field_name])
+                else:
+                    item[field_name] = row[self.columns_map[field_name]]
+            data.append(item)
         return data
 
 
@@ -55,6 +234,16 @@ class TaskOptionsSerializer(serializers.Serializer):
 
     countdown = serializers.IntegerField(min_value=0, required=False)
     max_retries = serializers.IntegerField(min_value=0, required=False)
+    start_delay = serializers.IntegerField(min_value=0, required=False)
+    retry_policy = serializers.ChoiceField(choices=RETRY_POLICY_CHOICES, required=False)
+    retry_backoff_max = serializers.IntegerField(min_value=0, required=False)
+    retry_deadline = serializers.IntegerField(min_value=0, required=False)
+    callback_url = serializers.URLField(max_length=2048, required=False)
+    dedup = serializers.BooleanField(required=False)
+    memoize = serializers.BooleanField(required=False)
+    batch = serializers.BooleanField(required=False)
+    soft_time_limit = serializers.IntegerField(min_value=1, required=False)
+    time_limit = serializers.IntegerField(min_value=1, required=False)
 
     def to_internal_value(self, data):
         if "delay" in data:
@@ -63,6 +252,49 @@ class TaskOptionsSerializer(serializers.Serializer):
             data["max_retries"] = data.pop("retry")
         return super().to_internal_value(data)
 
+    @staticmethod
+    def validate_limit(value: int, maximum: int) -> int:
+        if value > maximum:
+            raise serializers.ValidationError(f"Ensure this value is less than or equal to {maximum}.")
+        return value
+
+    def validate_callback_url(self, value: str) -> str:
+        try:
+            resolve_callback_url(value)
+        except UnsafeURLException as error:
+            raise serializers.ValidationError(str(error))
+        return value
+
+    def validate_soft_time_limit(self, value: int) -> int:
+        return self.validate_limit(value, settings.TASK_MAX_SOFT_TIME_LIMIT)
+
+    def validate_time_limit(self, value: int) -> int:
+        return self.validate_limit(value, settings.TASK_MAX_TIME_LIMIT)
+
+    def validate(self, attrs):
+        """
+        Sets the missing time limits to the server maximums (the soft limit doesn't exceed the hard one)
+
+        Batched tasks run one after another, so their soft limit is TASK_BATCH_MAX_RUN_TIME at most.
+        """
+
+        max_soft_time_limit = (
+            settings.TASK_BATCH_MAX_RUN_TIME if attrs.get("batch") else settings.TASK_MAX_SOFT_TIME_LIMIT
+        )
+        attrs.setdefault("time_limit", settings.TASK_MAX_TIME_LIMIT)
+        attrs.setdefault("soft_time_limit", min(max_soft_time_limit, attrs["time_limit"]))
+        if attrs["soft_time_limit"] > attrs["time_limit"]:
+            raise serializers.ValidationError({"soft_time_limit": ["Ensure this value doesn't exceed time_limit."]})
+        if attrs["soft_time_limit"] > max_soft_time_limit:
+            raise serializers.ValidationError(
+                {
+                    "soft_time_limit": [
+                        f"Ensure this value is less than or equal to {max_soft_time_limit} for batched tasks."
+                    ]
+                }
+            )
+        return attrs
+
 
 class TaskParametersSerializer(serializers.Serializer):
     """Serializer for validating task parameters"""
@@ -71,8 +303,78 @@ class TaskParametersSerializer(serializers.Serializer):
     param2 = serializers.CharField(required=False)
 
 
+class ChecksumParametersSerializer(serializers.Serializer):
+    """Serializer for validating checksum task parameters"""
+
+    data = serializers.CharField(max_length=1000)
+    rounds = serializers.IntegerField(min_value=1, max_value=10_000_000)
+
+
 class TaskConfigurationSerializer(serializers.Serializer):
     """Serializer for validating task parameters"""
 
-    params = TaskParametersSerializer()
+    params = serializers.DictField()
     options = TaskOptionsSerializer()
+
+    def validate_params(self, value: dict) -> dict:
+        """Validates the parameters with the serializer declared by the task type"""
+
+        task_type = task_registry.get(self.initial_data.get("type", DEFAULT_TASK_TYPE))
+        params_serializer = task_type.get_params_serializer()(data=value)
+        if not params_serializer.is_valid():
+            raise serializers.ValidationError(params_serializer.errors)
+        return params_serializer.validated_data
+
+
+class TaskAnalyticsQuerySerializer(serializers.Serializer):
+    """Serializer for validating the query of the task duration rollups"""
+
+    granularity = serializers.ChoiceField(choices=ROLLUP_GRANULARITY_CHOICES, default=ROLLUP_GRANULARITY_HOUR)
+    name = serializers.CharField(max_length=36, required=False)
+    status = serializers.ChoiceField(choices=STATUS_CHOICES, required=False)
+    since = serializers.DateTimeField(required=False, help_text="Start of the range (the last day by default)")
+    until = serializers.DateTimeField(required=False, help_text="End of the range (now by default)")
+
+    bucket_sizes = {
+        ROLLUP_GRANULARITY_MINUTE: timedelta(minutes=1),
+        ROLLUP_GRANULARITY_HOUR: timedelta(hours=1),
+        ROLLUP_GRANULARITY_DAY: timedelta(days=1),
+    }
+
+    def validate(self, attrs):
+        """Sets the default range and limits the number of buckets in it"""
+
+        attrs.setdefault("until", now())
+        attrs.setdefault("since", attrs["until"] - timedelta(days=1))
+        if attrs["since"] >= attrs["until"]:
+            raise serializers.ValidationError({"since": ["Ensure this value is earlier than until."]})
+        if (attrs["until"] - attrs["since"]) / self.bucket_sizes[attrs["granularity"]] > settings.ANALYTICS_MAX_BUCKETS:
+            raise serializers.ValidationError(
+                {"since": [f"Ensure the range contains at most {settings.ANALYTICS_MAX_BUCKETS} buckets."]}
+            )
+        return attrs
+
+
+class TaskRollupSerializer(serializers.ModelSerializer):
+    """Serializer for the task duration rollups (durations are in milliseconds)"""
+
+    run_time = serializers.SerializerMethodField()
+    queue_wait = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TaskRollup
+        fields = ["bucket", "name", "status", "count", "run_time", "queue_wait"]
+
+    def get_run_time(self, rollup: TaskRollup) -> dict:
+        return get_duration_summary(rollup.run_time_sum, rollup.run_time_histogram)
+
+    def get_queue_wait(self, rollup: TaskRollup) -> dict:
+        return get_duration_summary(rollup.queue_wait_sum, rollup.queue_wait_histogram)
+
+
+class TaskAnalyticsSerializer(serializers.Serializer):
+    """Serializer for the task duration rollups of a range and their totals (the bucket of the totals is null)"""
+
+    granularity = serializers.CharField()
+    buckets = TaskRollupSerializer(many=True)
+    totals = TaskRollupSerializer(many=True)
@@ -0,0 +1,64 @@
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from celery.states import FAILURE
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.metrics import DB_CONNECTIONS_OPENED, DB_CONNECTIONS_REUSED
+from core.tracing import (
+    SPAN_KIND_CONSUMER,
+    TRACEPARENT_HEADER,
+    SpanContext,
+    inject_trace_context,
+    start_span,
+)
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(database=connection.alias).inc()
+
+
+@receiver(request_started)
+@task_prerun.connect
+def count_reused_connections(**kwargs):
+    """Counts persistent connections kept open since the previous request/task of the process"""
+
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            DB_CONNECTIONS_REUSED.labels(database=connection.alias).inc()
+
+
+@before_task_publish.connect
+def inject_trace_context_header(headers=None, **kwargs):
+    """Propagates the trace of the publishing request/task in the message headers"""
+
+    if headers is not None:
+        inject_trace_context(headers)
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    """Starts the span of the task execution continuing the trace of the message"""
+
+    request = task.request
+    traceparent = getattr(request, TRACEPARENT_HEADER, None) or (request.headers or {}).get(TRACEPARENT_HEADER)
+    span = start_span(
+        f"run {task.name}",
+        SPAN_KIND_CONSUMER,
+        {"celery.task_id": task_id, "celery.retries": request.retries or 0},
+        SpanContext.from_traceparent(traceparent),
+    )
+    request.trace_span = span.__enter__()
+
+
+@task_postrun.connect
+def finish_task_span(task=None, state=None, **kwargs):
+    span = getattr(task.request, "trace_span", None)
+    if span is None:
+        return
+    span.set_attribute("celery.state", state)
+    if state == FAILURE:
+        span.set_error(str(kwargs.get("retval")))
+    span.__exit__(None, None, None)
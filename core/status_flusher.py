@@ -0,0 +1,169 @@
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from redis import RedisError, ResponseError
+
+from core.constants import TERMINAL_STATUSES
+from core.models import TaskMeta, WebhookDelivery
+from core.redis_client import get_redis
+from core.write_behind import STATUS_STREAM_GROUP, STATUS_STREAM_KEY
+
+logger = logging.getLogger(__name__)
+
+# Transitions read but not acknowledged by a flusher for this time (in milliseconds) are taken over by another one
+CLAIM_MIN_IDLE_TIME = 60000
+
+Entry = Tuple[bytes, Dict[bytes, bytes]]
+
+
+class StatusFlusher:
+    """
+    Applies status transitions published by the workers in write-behind mode
+
+    Transitions are read from the Redis stream with a consumer group (unacknowledged ones survive a crash) and
+    replayed per task in the stream order starting from the locked current status, so the transitions not allowed
+    by `TaskMeta.available_statuses_map` (e.g. of a task canceled meanwhile) are skipped as `change_status` does.
+    The resulting states of the batch are written with a single UPDATE ... FROM (VALUES ...) statement.
+
+    Transitions of a task must be applied in order, so a single flusher is expected to run.
+    """
+
+    date_fields = ("started_at", "finished_at", "next_retry_at")
+
+    def __init__(self, consumer: Optional[str] = None):
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.redis = get_redis()
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(STATUS_STREAM_KEY, STATUS_STREAM_GROUP, id="0", mkstream=True)
+        except ResponseError as error:
+            if "BUSYGROUP" not in str(error):
+                raise
+
+    def read_batch(self, batch_size: int, max_staleness: float) -> List[Entry]:
+        """
+        Reads transitions until the batch is full or the oldest one has waited for `max_staleness` seconds
+
+        Transitions left unacknowledged by a crashed flusher are claimed first.
+        """
+
+        _, entries, *_ = self.redis.xautoclaim(
+            STATUS_STREAM_KEY, STATUS_STREAM_GROUP, self.consumer, CLAIM_MIN_IDLE_TIME, count=batch_size
+        )
+        deadline = time.monotonic() + max_staleness
+        while len(entries) < batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            response = self.redis.xreadgroup(
+                STATUS_STREAM_GROUP,
+                self.consumer,
+                {STATUS_STREAM_KEY: ">"},
+                count=batch_size - len(entries),
+                block=max(int(timeout * 1000), 1),
+            )
+            if not response:
+                break
+            entries.extend(response[0][1])
+        return entries
+
+    def parse_state(self, data: bytes) -> dict:
+        state = orjson.loads(data)
+        for field in self.date_fields:
+            if state.get(field) is not None:
+                state[field] = parse_datetime(state[field])
+        return state
+
+    def apply(self, entries: List[Entry]) -> int:
+        """
+        Applies the transitions to the database
+
+        :return: number of updated tasks
+        """
+
+        transitions = defaultdict(list)
+        for _, fields in entries:
+            transitions[fields[b"task"].decode()].append(self.parse_state(fields[b"state"]))
+
+        states, deliveries = {}, []
+        with transaction.atomic():
+            tasks = (
+                TaskMeta.objects.select_for_update()
+                .filter(id__in=transitions)
+                .only("id", "name", "callback_url", *TaskMeta.write_behind_fields)
+            )
+            for task in tasks:
+                for state in transitions[str(task.id)]:
+                    if state["status"] not in task.next_available_statuses:
+                        logger.warning(
+                            f"Transition of the task {task.id} from {task.status} to {state['status']} is skipped."
+                        )
+                        continue
+                    for field, value in state.items():
+                        setattr(task, field, value)
+                    # a transition may write only a part of the fields, the others keep their current values
+                    states[str(task.id)] = {field: getattr(task, field) for field in TaskMeta.write_behind_fields}
+                    if task.callback_url and task.status in TERMINAL_STATUSES:
+                        deliveries.append(WebhookDelivery.for_task(task))
+            self.update_tasks(states)
+            WebhookDelivery.objects.bulk_create(deliveries)
+        return len(states)
+
+    @staticmethod
+    def update_tasks(states: Dict[str, dict]):
+        """Writes the states of the tasks with a single statement"""
+
+        if not states:
+            return
+        fields = TaskMeta.write_behind_fields
+        table = connection.ops.quote_name(TaskMeta._meta.db_table)
+        columns = ", ".join(f"{field} = v.{field}" for field in fields)
+        values = ", ".join(
+            ["(%s::uuid, %s, %s::timestamptz, %s::timestamptz, %s::timestamptz, %s::smallint, %s, %s)"] * len(states)
+        )
+        params = [value for task_id, state in states.items() for value in (task_id, *map(state.get, fields))]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS t SET {columns} FROM (VALUES {values}) AS v (id, {', '.join(fields)}) "
+                "WHERE t.id = v.id",
+                params,
+            )
+
+    def flush(self, batch_size: Optional[int] = None, max_staleness: Optional[float] = None) -> int:
+        """
+        Reads and applies a batch of transitions and removes them from the stream
+
+        :return: number of applied transitions
+        """
+
+        entries = self.read_batch(
+            batch_size or settings.STATUS_FLUSH_BATCH_SIZE, max_staleness or settings.STATUS_FLUSH_MAX_STALENESS
+        )
+        if not entries:
+            return 0
+        self.apply(entries)
+        entry_ids = [entry_id for entry_id, _ in entries]
+        self.redis.pipeline().xack(STATUS_STREAM_KEY, STATUS_STREAM_GROUP, *entry_ids).xdel(
+            STATUS_STREAM_KEY, *entry_ids
+        ).execute()
+        return len(entries)
+
+    def run(self, batch_size: Optional[int] = None, max_staleness: Optional[float] = None):
+        """Applies transitions until interrupted"""
+
+        self.ensure_group()
+        while True:
+            try:
+                self.flush(batch_size, max_staleness)
+            except RedisError as error:
+                logger.warning(f"Failed to read status transitions: {error}")
+                time.sleep(max_staleness or settings.STATUS_FLUSH_MAX_STALENESS)
@@ -1,14 +1,27 @@
-from drf_yasg.openapi import TYPE_INTEGER, TYPE_OBJECT, TYPE_STRING, Response, Schema
+from drf_yasg.openapi import (
+    FORMAT_URI,
+    IN_QUERY,
+    TYPE_BOOLEAN,
+    TYPE_INTEGER,
+    TYPE_OBJECT,
+    TYPE_STRING,
+    Parameter,
+    Response,
+    Schema,
+)
 from rest_framework import status
 
-from core.serializers import TaskCreateSerializer
+from core.constants import DEFAULT_TASK_TYPE, RETRY_POLICY_CHOICES
+from core.serializers import TaskAnalyticsSerializer, TaskCreateSerializer
 
 CREATE_TASK_REQUEST_BODY = Schema(
     type=TYPE_OBJECT,
     properties={
         "name": Schema(type=TYPE_STRING, example="some_task_name"),
+        "type": Schema(type=TYPE_STRING, example=DEFAULT_TASK_TYPE, default=DEFAULT_TASK_TYPE),
         "params": Schema(
             type=TYPE_OBJECT,
+            description="Parameters declared by the task type, e.g. `data` and `rounds` of the checksum type",
             properties={
                 "param1": Schema(type=TYPE_INTEGER, example=60),
                 "param2": Schema(type=TYPE_STRING, example="some param"),
@@ -19,12 +32,35 @@ CREATE_TASK_REQUEST_BODY = Schema(
             properties={
                 "retry": Schema(type=TYPE_INTEGER, example=2),
                 "delay": Schema(type=TYPE_INTEGER, example=3000),
+                "start_delay": Schema(type=TYPE_INTEGER, example=0),
+                "retry_policy": Schema(type=TYPE_STRING, enum=[policy for policy, _ in RETRY_POLICY_CHOICES]),
+                "retry_backoff_max": Schema(type=TYPE_INTEGER, example=3600),
+                "retry_deadline": Schema(type=TYPE_INTEGER, example=86400),
+                "callback_url": Schema(type=TYPE_STRING, format=FORMAT_URI, example="https://example.com/webhooks"),
+                "dedup": Schema(type=TYPE_BOOLEAN, example=False),
+                "memoize": Schema(type=TYPE_BOOLEAN, example=False),
+                "batch": Schema(type=TYPE_BOOLEAN, example=False),
+                "soft_time_limit": Schema(type=TYPE_INTEGER, example=600),
+                "time_limit": Schema(type=TYPE_INTEGER, example=660),
             },
         ),
     },
 )
 
-CREATE_TASK_RESPONSES = {status.HTTP_201_CREATED: Response("Success", TaskCreateSerializer)}
+FIELDS_QUERY_PARAMETER = Parameter(
+    "fields",
+    IN_QUERY,
+    type=TYPE_STRING,
+    description="Comma-separated list of fields to be returned (sparse fieldset), e.g. `uuid,name,status`",
+)
+
+CREATE_TASK_RESPONSES = {
+    status.HTTP_201_CREATED: Response("Success", TaskCreateSerializer),
+    status.HTTP_200_OK: Response(
+        "In dedup mode, an identical task (same name, type, params and user) is in flight and is returned instead",
+        TaskCreateSerializer,
+    ),
+}
 
 CANCEL_TASK_RESPONSES = {
     status.HTTP_200_OK: Response(
@@ -56,3 +92,11 @@ CANCEL_TASK_RESPONSES = {
         },
     ),
 }
+
+TASK_ANALYTICS_RESPONSES = {
+    status.HTTP_200_OK: Response(
+        "Run time and queue wait (mean and percentiles in milliseconds) of the finished tasks per time bucket, name "
+        "and status",
+        TaskAnalyticsSerializer,
+    ),
+}
@@ -1,27 +1,185 @@
+import hashlib
 import logging
+import threading
 import time
 import traceback
 from abc import ABC
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 
 from celery import Task, shared_task
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from celery.worker.request import Request
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
 
-from core.constants import STATUS_COMPLETED, STATUS_FAILED, STATUS_RETRY_PENDING
+from core.analytics import refresh_rollups
+from core.batching import (
+    BATCH_OPTION,
+    BATCHED_TASK_NAME,
+    TaskMessage,
+    pull_task_messages,
+)
+from core.constants import (
+    ATTEMPT_TOKEN_OPTION,
+    DEFAULT_TASK_TYPE,
+    EXECUTION_PROCESSES,
+    EXECUTION_THREADS,
+    RETRY_POLICY_FIXED,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_IN_PROGRESS,
+    STATUS_PENDING,
+    STATUS_RETRY_PENDING,
+    TERMINAL_STATUSES,
+)
 from core.exceptions import TaskException, UnknownTaskException
-from core.models import TaskMeta
+from core.fair_share import dispatch_pending_tasks
+from core.heartbeat import handle_expired_heartbeats, heartbeat_monitor
+from core.models import TaskError, TaskMeta, WebhookDelivery
+from core.profiling import Profile, is_sampled
+from core.progress import clear_progress, store_progress
+from core.registry import task_registry
+from core.result_cache import cache_result, get_cached_result, get_result_cache_key
+from core.retry import acquire_retry, get_retry_delay, record_attempts
+from core.scheduler import release_due_tasks, schedule_task
+from core.tracing import start_span, traced
+from core.utils import get_time_limits
+from core.write_behind import publish_transition
 
 logger = logging.getLogger(__name__)
 
 
+def handle_hard_time_limit(task_name: str, task_id: str, timeout: float):
+    """
+    Fails the task whose worker process has been killed after exceeding the hard time limit
+
+    :param task_name: Celery task name
+    :param task_id: TaskMeta id
+    :param timeout: hard time limit in seconds
+    """
+
+    error = f"Hard time limit ({timeout}s) exceeded."
+    # in write-behind mode the row may lag behind the published transitions, so the failure is published as well
+    # (the flusher skips it if the task isn't in progress), the fields of the attempt unknown here are kept
+    task = TaskMeta(id=task_id, status=STATUS_IN_PROGRESS)
+    task.set_finished(STATUS_FAILED)
+    if task.publish_transition(("status", "finished_at", "result")):
+        task.add_error(error, "")
+    else:
+        with transaction.atomic():
+            task = TaskMeta.objects.select_for_update().filter(id=task_id, status=STATUS_IN_PROGRESS).first()
+            if task is not None:
+                task.add_error(error, "")
+                task.finish(STATUS_FAILED)
+    heartbeat_monitor.stop(task_name, task_id)
+    clear_progress(task_id)
+    logger.error(f"The task {task_id} has been killed after exceeding the hard time limit.")
+
+
+class TimeLimitRequest(Request):
+    """Worker request that keeps TaskMeta consistent when the task is killed by the hard time limit"""
+
+    def on_timeout(self, soft, timeout):
+        super().on_timeout(soft, timeout)
+        if not soft:
+            handle_hard_time_limit(self.task_name, self.id, timeout)
+
+
+class ExecutionAttribute:
+    """
+    Task attribute kept per thread
+
+    Celery shares the task instance between executions, which run concurrently in the threads pool.
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.default
+        return getattr(self.get_state(instance), self.name, self.default)
+
+    def __set__(self, instance, value):
+        setattr(self.get_state(instance), self.name, value)
+
+    @staticmethod
+    def get_state(instance) -> threading.local:
+        return instance.__dict__.setdefault("_execution_state", threading.local())
+
+
 class BaseSampleTask(Task, ABC):
     """Base class for task processing"""
 
-    countdown: int = 60
-    max_retries: int = 0
+    Request = TimeLimitRequest
+
+    task_id = ExecutionAttribute()
+    countdown = ExecutionAttribute(60)
+    max_retries = ExecutionAttribute(0)
+    retry_policy = ExecutionAttribute(RETRY_POLICY_FIXED)
+    retry_backoff_max = ExecutionAttribute(3600)
+    retry_deadline = ExecutionAttribute()
+    retry_delay = ExecutionAttribute()
+    memoize = ExecutionAttribute(False)
 
+    config_attributes = (
+        "countdown",
+        "max_retries",
+        "retry_policy",
+        "retry_backoff_max",
+        "retry_deadline",
+        "retry_delay",
+        "memoize",
+    )
+    # options applied by Celery from the message (not set on the shared task instance)
+    execution_options = ("soft_time_limit", "time_limit", BATCH_OPTION, ATTEMPT_TOKEN_OPTION)
+    progress_flushed_at = ExecutionAttribute()
+    task_meta = ExecutionAttribute()
+    deadline = ExecutionAttribute()
+
+    @property
+    def executed_task_name(self) -> str:
+        """Name of the Celery task whose tasks are executed (results are cached per it)"""
+
+        return self.name
+
+    def before_start(self, task_id, args, kwargs):
+        """Starts sending heartbeats of the task (eager executions have no worker to lose)"""
+
+        if not self.request.is_eager:
+            heartbeat_monitor.start(self.name, task_id)
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        """Stops sending heartbeats of the task"""
+
+        if not self.request.is_eager:
+            heartbeat_monitor.stop(self.name, task_id)
+        clear_progress(task_id)
+
+    @traced("task.get_task_meta")
     def _get_task_meta(self) -> TaskMeta:
-        """Returns associated TaskMeta instance"""
+        """
+        Returns associated TaskMeta instance
+
+        In write-behind mode the row lags behind the published transitions, so it's loaded once per execution
+        and a retry starts from the RETRY_PENDING status published by the previous attempt.
+        """
 
-        return TaskMeta.objects.get(id=self.task_id)
+        if not settings.STATUS_WRITE_BEHIND:
+            return TaskMeta.objects.get(id=self.task_id)
+        if self.task_meta is None:
+            task = TaskMeta.objects.get(id=self.task_id)
+            if self.request.retries and task.status in (STATUS_PENDING, STATUS_IN_PROGRESS):
+                task.status = STATUS_RETRY_PENDING
+            self.task_meta = task
+        return self.task_meta
 
     def _init_config(self, **kwargs):
         """
@@ -32,9 +190,48 @@ class BaseSampleTask(Task, ABC):
         """
 
         self.task_id = self.request.id
-        for attr in ["countdown", "max_retries"]:
-            if attr in kwargs:
-                setattr(self, attr, kwargs.get(attr))
+        self.progress_flushed_at = None
+        self.task_meta = None
+        self.deadline = time.monotonic() + kwargs.get("soft_time_limit", settings.TASK_MAX_SOFT_TIME_LIMIT)
+        for attr in self.config_attributes:
+            # the task instance is shared between executions, so missing options are reset to the class defaults
+            setattr(self, attr, kwargs.get(attr, getattr(BaseSampleTask, attr)))
+
+    def check_deadline(self):
+        """
+        Raises SoftTimeLimitExceeded once the soft time limit of the execution has passed
+
+        Only the prefork pool interrupts the tasks exceeding their limits, so the tasks check them on every progress
+        report (and the sample task on every second of sleep) to be stopped in the threads and inline pools too.
+        """
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SoftTimeLimitExceeded()
+
+    def set_progress(self, percent: int, message: str = ""):
+        """
+        Reports progress of the task (the time limit is checked first)
+
+        The latest value is stored in Redis on every call, while the database is updated at most once per
+        PROGRESS_FLUSH_INTERVAL seconds (in write-behind mode the update is published after the start transition, so
+        the status flusher applies them in order).
+
+        :param percent: progress percent (0 - 100)
+        :param message: progress message
+        """
+
+        self.check_deadline()
+        percent = max(0, min(100, int(percent)))
+        message = message[: TaskMeta._meta.get_field("progress_message").max_length]
+        store_progress(self.task_id, percent, message)
+
+        if self.progress_flushed_at is None or time.monotonic() - self.progress_flushed_at >= (
+            settings.PROGRESS_FLUSH_INTERVAL
+        ):
+            state = {"status": STATUS_IN_PROGRESS, "progress": percent, "progress_message": message}
+            if not (settings.STATUS_WRITE_BEHIND and publish_transition(self.task_id, state)):
+                TaskMeta.objects.filter(id=self.task_id).update(progress=percent, progress_message=message)
+            self.progress_flushed_at = time.monotonic()
 
     def _log_attempt_number(self):
         """Creates a log about attempt number"""
@@ -42,29 +239,111 @@ class BaseSampleTask(Task, ABC):
         attempt_message = f"Attempt {self.request.retries + 1} of {self.max_retries + 1}..."
         logger.warning(attempt_message) if self.request.retries else logger.info(attempt_message)
 
-    def _perform_task(self, param1: int, param2: str):
+    def _get_result_cache_key(self, kwargs: Optional[dict] = None) -> str:
+        """
+        Returns the result cache key of the task type with the task parameters (options are not included)
+
+        :param kwargs: named parameters of the task (of the current request by default)
+        """
+
+        options = self.config_attributes + self.execution_options
+        kwargs = self.request.kwargs if kwargs is None else kwargs
+        params = {name: value for name, value in kwargs.items() if name not in options}
+        return get_result_cache_key(self.executed_task_name, params)
+
+    def _perform_memoized(self, perform, *args) -> str:
+        """
+        Completes the task with the cached result of an identical task or performs it and caches the result
+
+        :param perform: method performing the task and returning the result
+        :param args: positional parameters of the method
+        :return: task result
+        """
+
+        if not self.memoize:
+            return perform(*args)
+
+        key = self._get_result_cache_key()
+        result = get_cached_result(key)
+        if result is not None:
+            task = self._get_task_meta()
+            task.start(self.request.kwargs.get(ATTEMPT_TOKEN_OPTION))
+            task.finish(STATUS_COMPLETED, result)
+            logger.info(f"The task {self.task_id} has been completed with the cached result.")
+            return result
+
+        result = perform(*args)
+        cache_result(key, result)
+        return result
+
+    def _perform_task(self, *args) -> str:
         """
         Makes some actions with task
 
-        :param param1: sleeping time in seconds
-        :param param2: string parameter
+        :param args: task parameters passed to `_execute`
+        :return: task result
         """
 
         task = self._get_task_meta()
 
-        task.start()
+        with start_span("task.start"):
+            task.start(self.request.kwargs.get(ATTEMPT_TOKEN_OPTION))
+        with start_span("task.execute"):
+            result = self._execute(*args)
+        with start_span("task.finish"):
+            task.finish(STATUS_COMPLETED, result)
+        logger.info(f"The task {self.task_id} has been successfully completed.")
+        return task.result
+
+    def _execute(self, param1: int, param2: str) -> Optional[str]:
+        """
+        Makes the actions of the started task (the sample task, other task types override it)
+
+        :param param1: sleeping time in seconds
+        :param param2: string parameter
+        :return: task result (default one if not provided)
+        """
 
         if param2 == "raise exception before":
             raise Exception("Manual exception before execution.")
 
-        time.sleep(param1)
+        for second in range(param1):
+            self.check_deadline()
+            time.sleep(1)
+            self.set_progress((second + 1) * 100 // param1, f"{second + 1} of {param1} seconds passed")
 
         if param2 == "raise exception after":
             raise Exception("Manual exception after execution.")
 
-        task.finish(STATUS_COMPLETED)
-        logger.info(f"The task {self.task_id} has been successfully completed.")
+    def _get_retry_countdown(self, retries: Optional[int] = None) -> float:
+        """
+        Returns delay in seconds before the next retry according to the retry policy
+
+        :param retries: number of retries already made (of the current request by default)
+        """
+
+        retries = self.request.retries if retries is None else retries
+        return get_retry_delay(self.retry_policy, self.countdown, self.retry_backoff_max, retries, self.retry_delay)
+
+    def _within_retry_deadline(self, task: TaskMeta, countdown: float) -> bool:
+        """Checks that the next retry starts within the retry deadline (in seconds since the task creation)"""
 
+        if self.retry_deadline is None:
+            return True
+        return task.created_at + timedelta(seconds=self.retry_deadline) >= now() + timedelta(seconds=countdown)
+
+    def _can_retry(self, task: TaskMeta, countdown: float) -> bool:
+        """Checks the retry deadline of the task and takes a retry from the budget of the task name"""
+
+        if not self._within_retry_deadline(task, countdown):
+            logger.warning(f"Retry deadline of the task {self.task_id} has passed.")
+            return False
+        if not acquire_retry(self.executed_task_name):
+            logger.warning(f"Retry budget of {self.executed_task_name} has been exhausted, task {self.task_id} fails.")
+            return False
+        return True
+
+    @traced("task.handle_retry")
     def _handle_retry(self, error: str):
         """
         Handles retrying logic
@@ -72,12 +351,24 @@ class BaseSampleTask(Task, ABC):
         :param error: error message string
         """
 
-        logger.warning("Sending for retry ...")
         task = self._get_task_meta()
         task.add_error(error, traceback.format_exc())
-        task.finish(STATUS_RETRY_PENDING)
-        raise self.retry(exc=UnknownTaskException(f"{error}"), max_retries=self.max_retries, countdown=self.countdown)
+        countdown = self._get_retry_countdown()
+        if not self._can_retry(task, countdown):
+            return self._handle_failure()
 
+        logger.warning("Sending for retry ...")
+        task.wait_for_retry(countdown)
+        exc = UnknownTaskException(f"{error}")
+        kwargs = {**self.request.kwargs, "retry_delay": countdown}
+        if self.request.is_eager or countdown < settings.SCHEDULER_MIN_DELAY:
+            raise self.retry(kwargs=kwargs, exc=exc, max_retries=self.max_retries, countdown=countdown)
+
+        # Long delays are kept in the ScheduledTask table instead of an ETA message held by the worker
+        schedule_task(self, self.task_id, kwargs, countdown, retries=self.request.retries + 1)
+        raise Retry(exc=exc, when=countdown)
+
+    @traced("task.handle_failure")
     def _handle_failure(self):
         """Handles failure logic"""
 
@@ -85,11 +376,61 @@ class BaseSampleTask(Task, ABC):
         task.finish(STATUS_FAILED)
         logger.error(f"Failed to complete the task {self.task_id}.")
 
+    @staticmethod
+    def _get_time_limit_error(kwargs: dict) -> str:
+        """Returns error message of the execution exceeding its soft time limit"""
+
+        return f"Soft time limit ({kwargs.get('soft_time_limit', settings.TASK_MAX_SOFT_TIME_LIMIT)}s) exceeded."
+
+    def _get_profile(self):
+        """Returns profile of the execution sampled with TASK_PROFILING_SAMPLE_RATE (see core.profiling)"""
 
+        if not is_sampled(settings.TASK_PROFILING_SAMPLE_RATE):
+            return nullcontext()
+        return Profile(
+            f"{self.name} {self.task_id}",
+            {"task_name": self.name, "task_id": self.task_id, "attempt": self.request.retries + 1},
+        )
+
+    def _process(self, params: dict, **kwargs):
+        """
+        Processes task
+
+        :param params: task parameters passed to `_execute`
+        :param kwargs: named parameters for task configuration
+        """
+
+        self._init_config(**kwargs)
+        params_repr = ", ".join(f"{name}: {value}" for name, value in params.items())
+        logger.info(f"Starting task execution [id: {self.task_id}; {params_repr}] ...")
+        self._log_attempt_number()
+        record_attempts(self.executed_task_name)
+        with self._get_profile():
+            try:
+                self._perform_memoized(self._perform_task, *params.values())
+            except TaskMeta.DoesNotExist:
+                logger.warning(f"Task {self.task_id} not found")
+            except TaskException as known_error:
+                logger.warning(str(known_error))
+            except SoftTimeLimitExceeded:
+                error = self._get_time_limit_error(kwargs)
+                if self.request.retries < self.max_retries:
+                    self._handle_retry(error)
+                else:
+                    self._get_task_meta().add_error(error, traceback.format_exc())
+                    self._handle_failure()
+            except Exception as error:
+                if self.request.retries < self.max_retries:
+                    self._handle_retry(str(error))
+                else:
+                    self._handle_failure()
+
+
+@task_registry.register(DEFAULT_TASK_TYPE, "core.serializers.TaskParametersSerializer", EXECUTION_THREADS)
 @shared_task(bind=True, base=BaseSampleTask)
 def sample_task(self, param1: int, param2: str, **kwargs):
     """
-    Processes task
+    Processes sample task (I/O-bound: it mostly sleeps)
 
     :param self: task instance (provided by Celery)
     :param param1: sleeping time in seconds
@@ -97,17 +438,290 @@ def sample_task(self, param1: int, param2: str, **kwargs):
     :param kwargs: named parameters for task configuration
     """
 
-    self._init_config(**kwargs)
-    logger.info(f"Starting task execution [id: {self.task_id}; param1: {param1}, param2: {param2}] ...")
-    self._log_attempt_number()
-    try:
-        self._perform_task(param1, param2)
-    except TaskMeta.DoesNotExist:
-        logger.warning(f"Task {self.task_id} not found")
-    except TaskException as known_error:
-        logger.warning(str(known_error))
-    except Exception as error:
-        if self.request.retries < self.max_retries:
-            self._handle_retry(str(error))
+    self._process({"param1": param1, "param2": param2}, **kwargs)
+
+
+class ChecksumTask(BaseSampleTask):
+    """Task computing iterated SHA-256 checksum of the data (CPU-bound)"""
+
+    def _execute(self, data: str, rounds: int) -> str:
+        """
+        Hashes the data the given number of times
+
+        :param data: data to be hashed
+        :param rounds: number of SHA-256 rounds
+        :return: hex digest
+        """
+
+        digest = data.encode()
+        step = max(rounds // 100, 1)
+        for done in range(1, rounds + 1):
+            digest = hashlib.sha256(digest).digest()
+            if done % step == 0:
+                self.set_progress(done * 100 // rounds, f"{done} of {rounds} rounds")
+        return digest.hex()
+
+
+@task_registry.register("checksum", "core.serializers.ChecksumParametersSerializer", EXECUTION_PROCESSES)
+@shared_task(bind=True, base=ChecksumTask)
+def checksum_task(self, data: str, rounds: int, **kwargs):
+    """
+    Processes checksum task
+
+    :param self: task instance (provided by Celery)
+    :param data: data to be hashed
+    :param rounds: number of SHA-256 rounds
+    :param kwargs: named parameters for task configuration
+    """
+
+    self._process({"data": data, "rounds": rounds}, **kwargs)
+
+
+class BatchSampleTask(BaseSampleTask):
+    """
+    Base class for batched processing of short sample tasks
+
+    TaskMeta rows of the whole batch are started with one locking query and one UPDATE, their results, errors and
+    webhooks are written with bulk queries, while retries, errors and cancellation work as in the per-message mode.
+    """
+
+    @property
+    def executed_task_name(self) -> str:
+        return BATCHED_TASK_NAME
+
+    def before_start(self, task_id, args, kwargs):
+        """Heartbeats are sent for the tasks of the batch instead"""
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        """Heartbeats and progress of the tasks of the batch are removed by `run_batch`"""
+
+    @staticmethod
+    def _get_params(param1: int, param2: str, **kwargs) -> Tuple[int, str]:
+        return param1, param2
+
+    def run_messages(self, task_messages: List[TaskMessage]):
+        """
+        Runs the tasks of the pulled messages and acknowledges the messages
+
+        Messages which are not due yet (retries with a countdown) are published back to the sample tasks queue,
+        where the worker holds them until their ETA.
+        """
+
+        due_messages = [task_message for task_message in task_messages if task_message.is_due]
+        for task_message in task_messages:
+            if not task_message.is_due:
+                self.app.send_task(
+                    sample_task.name,
+                    args=task_message.args,
+                    kwargs=task_message.kwargs,
+                    task_id=task_message.task_id,
+                    eta=task_message.eta,
+                    retries=task_message.retries,
+                    queue=task_registry.get_by_task_name(sample_task.name).queue,
+                    **get_time_limits(task_message.kwargs),
+                )
+                task_message.message.ack()
+
+        if due_messages:
+            self.run_batch(
+                [
+                    (task_message.task_id, task_message.args, task_message.kwargs, task_message.retries)
+                    for task_message in due_messages
+                ]
+            )
+        for task_message in due_messages:
+            task_message.message.ack()
+
+    def run_batch(self, items: List[Tuple[str, list, dict, int]]) -> int:
+        """
+        Runs the tasks of the batch
+
+        :param items: (task id, positional parameters, named parameters, number of retries already made) of the tasks
+        :return: number of executed tasks
+        """
+
+        items = {str(task_id): (args, kwargs, retries) for task_id, args, kwargs, retries in items}
+        tasks = self._start_batch(items)
+        for task_id in items.keys() - {str(task.id) for task in tasks}:
+            logger.warning(f"Task {task_id} is not waiting for execution, it's skipped.")
+        if not tasks:
+            return 0
+
+        task_ids = [str(task.id) for task in tasks]
+        heartbeat_monitor.start(sample_task.name, *task_ids)
+        logger.info(f"Starting execution of a batch of {len(tasks)} tasks ...")
+        record_attempts(self.executed_task_name, len(tasks))
+        try:
+            errors, retries, finished = [], [], 0
+            try:
+                for task in tasks:
+                    args, kwargs, retried = items[str(task.id)]
+                    error, countdown = self._run_batch_task(task, args, kwargs, retried)
+                    if error is not None:
+                        errors.append(error)
+                    if countdown is not None:
+                        retries.append((task, {**kwargs, "retry_delay": countdown}, countdown, retried + 1))
+                    finished += 1
+                self._finish_batch(tasks, errors, retries)
+            except Exception as exception:
+                logger.exception(f"Execution of the batch has been interrupted after {finished} tasks.")
+                self._interrupt_batch(tasks, errors, retries, exception)
+        except BaseException:
+            # tasks left IN_PROGRESS are requeued or failed by the heartbeat reaper once their heartbeats expire
+            heartbeat_monitor.abandon(sample_task.name, *task_ids)
+            raise
         else:
-            self._handle_failure()
+            heartbeat_monitor.stop(sample_task.name, *task_ids)
+        finally:
+            clear_progress(*task_ids)
+        return len(tasks)
+
+    @staticmethod
+    def _start_batch(items: Dict[str, tuple]) -> List[TaskMeta]:
+        """
+        Starts PENDING and RETRY_PENDING tasks of the batch
+
+        Canceled, running and finished tasks are skipped as well as the messages superseded by a requeue.
+
+        :param items: (positional parameters, named parameters, number of retries) of the tasks by task id
+        """
+
+        with transaction.atomic():
+            tasks = [
+                task
+                for task in TaskMeta.objects.select_for_update(skip_locked=True).filter(
+                    id__in=items.keys(), status__in=(STATUS_PENDING, STATUS_RETRY_PENDING)
+                )
+                if task.attempt_token is None
+                or str(task.attempt_token) == items[str(task.id)][1].get(ATTEMPT_TOKEN_OPTION)
+            ]
+            started_at = now()
+            TaskMeta.objects.filter(id__in=[task.id for task in tasks]).update(
+                status=STATUS_IN_PROGRESS, started_at=started_at, next_retry_at=None, progress=0, progress_message=""
+            )
+        for task in tasks:
+            task.status, task.started_at, task.next_retry_at = STATUS_IN_PROGRESS, started_at, None
+            task.progress, task.progress_message = 0, ""
+        return tasks
+
+    def _run_batch_task(
+        self, task: TaskMeta, args: list, kwargs: dict, retries: int
+    ) -> Tuple[Optional[TaskError], Optional[float]]:
+        """
+        Runs the task of the batch and finishes its attempt without saving
+
+        :return: error to be stored and countdown of the retry to be scheduled (if any)
+        """
+
+        self._init_config(**kwargs)
+        self.task_id = str(task.id)
+        try:
+            param1, param2 = self._get_params(*args, **kwargs)
+            key = self._get_result_cache_key(kwargs) if self.memoize else None
+            result = get_cached_result(key) if key else None
+            if result is None:
+                task.set_finished(STATUS_COMPLETED, self._execute(param1, param2))
+                if key:
+                    cache_result(key, task.result)
+            else:
+                task.set_finished(STATUS_COMPLETED, result)
+            return None, None
+        except Exception as exception:
+            # the soft time limit of the task is checked by `_execute` (see check_deadline) since the deadline is
+            # started by `_init_config` for every task of the batch
+            timed_out = isinstance(exception, SoftTimeLimitExceeded)
+            if timed_out and time.monotonic() < self.deadline:
+                # the soft time limit of the whole batch has been exceeded before the limit of the task
+                raise
+            message = self._get_time_limit_error(kwargs) if timed_out else str(exception)
+            error = TaskError(task=task, message=message, traceback=traceback.format_exc())
+            if retries >= self.max_retries:
+                task.set_finished(STATUS_FAILED)
+                return error if timed_out else None, None
+
+            countdown = self._get_retry_countdown(retries)
+            if not self._can_retry(task, countdown):
+                task.set_finished(STATUS_FAILED)
+                return error, None
+            task.next_retry_at = now() + timedelta(seconds=countdown)
+            task.set_finished(STATUS_RETRY_PENDING)
+            return error, countdown
+
+    def _interrupt_batch(self, tasks: List[TaskMeta], errors: List[TaskError], retries: List[tuple], exception):
+        """Fails the tasks of the interrupted batch which haven't been finished and saves the finished ones"""
+
+        message = f"Execution of the batch has been interrupted: {exception!r}"
+        message = message[: TaskError._meta.get_field("message").max_length]
+        for task in tasks:
+            if task.status == STATUS_IN_PROGRESS:
+                task.set_finished(STATUS_FAILED)
+                errors.append(TaskError(task=task, message=message, traceback=traceback.format_exc()))
+        self._finish_batch(tasks, errors, retries)
+
+    @staticmethod
+    def _finish_batch(tasks: List[TaskMeta], errors: List[TaskError], retries: List[tuple]):
+        """Saves the finished attempts of the tasks which haven't been canceled meanwhile and schedules retries"""
+
+        with transaction.atomic():
+            running_ids = set(
+                TaskMeta.objects.select_for_update()
+                .filter(id__in=[task.id for task in tasks], status=STATUS_IN_PROGRESS)
+                .values_list("id", flat=True)
+            )
+            tasks = [task for task in tasks if task.id in running_ids]
+            TaskMeta.objects.bulk_update(tasks, ["status", "finished_at", "next_retry_at", "result"])
+            TaskError.objects.bulk_create(error for error in errors if error.task_id in running_ids)
+            WebhookDelivery.objects.bulk_create(
+                WebhookDelivery.for_task(task)
+                for task in tasks
+                if task.callback_url and task.status in TERMINAL_STATUSES
+            )
+            for task, kwargs, countdown, retried in retries:
+                if task.id in running_ids:
+                    transaction.on_commit(partial(schedule_task, sample_task, str(task.id), kwargs, countdown, retried))
+        logger.info(f"Batch of {len(tasks)} tasks has been finished.")
+
+
+@shared_task(bind=True, base=BatchSampleTask)
+def run_task_batches(self):
+    """
+    Executes the tasks submitted with the `batch` option in batches (runs periodically by Celery beat)
+
+    The batch queue is drained until it's empty or the next run is due.
+    """
+
+    started_at = time.monotonic()
+    with self.app.connection_for_read() as connection:
+        while time.monotonic() - started_at < settings.TASK_BATCH_INTERVAL:
+            task_messages = pull_task_messages(connection, settings.TASK_BATCH_SIZE)
+            if not task_messages:
+                break
+            self.run_messages(task_messages)
+
+
+@shared_task
+def release_scheduled_tasks():
+    """Publishes due scheduled tasks to the broker (runs periodically by Celery beat)"""
+
+    return release_due_tasks()
+
+
+@shared_task
+def reap_stalled_tasks():
+    """Requeues or fails IN_PROGRESS tasks without heartbeats (runs periodically by Celery beat)"""
+
+    return handle_expired_heartbeats()
+
+
+@shared_task
+def dispatch_fair_share_tasks():
+    """Publishes the tasks of the per-user queues to the free worker slots (runs periodically by Celery beat)"""
+
+    return dispatch_pending_tasks()
+
+
+@shared_task
+def refresh_task_rollups():
+    """Aggregates the recently finished tasks into the duration rollups (runs periodically by Celery beat)"""
+
+    return refresh_rollups()
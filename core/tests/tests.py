@@ -1,26 +1,145 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import pstats
+import shutil
+import socket
+import tempfile
+import threading
+import time
 import traceback
-from unittest.mock import MagicMock, PropertyMock, patch
-
-from django.test import TestCase, override_settings
+import uuid
+from decimal import Decimal
+from functools import partial
+from typing import List, Tuple
+from unittest.mock import MagicMock, PropertyMock, call, patch
+
+import orjson
+from celery import current_app
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from celery.signals import task_prerun, worker_process_shutdown
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.timezone import now
 from freezegun import freeze_time
+from kombu import Connection
+from prometheus_client import REGISTRY
+from redis import RedisError
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APITestCase
 
 from authentication.tests.factories import UserFactory
+from core.admin import EstimatedCountPaginator
+from core.analytics import (
+    HISTOGRAM_GAMMA,
+    get_histogram_index,
+    get_percentile,
+    merge_histograms,
+    refresh_rollups,
+)
+from core.autoscaling import (
+    BacklogAutoscaler,
+    BacklogMonitor,
+    QueueSample,
+    recommend_concurrency,
+)
+from core.batching import pull_task_messages, route_task
+from core.bulk_import import ImportResult, TaskImporter
 from core.constants import (
+    ATTEMPT_TOKEN_OPTION,
+    EXECUTION_INLINE,
+    EXECUTION_PROCESSES,
+    EXECUTION_THREADS,
+    RETRY_POLICY_DECORRELATED_JITTER,
+    RETRY_POLICY_EXPONENTIAL,
+    RETRY_POLICY_FIXED,
+    RETRY_POLICY_FULL_JITTER,
+    ROLLUP_GRANULARITY_DAY,
+    STALLED_TASKS_POLICY_FAIL,
+    STALLED_TASKS_POLICY_REQUEUE,
     STATUS_CANCELED,
+    STATUS_CHOICES,
     STATUS_COMPLETED,
     STATUS_FAILED,
     STATUS_IN_PROGRESS,
     STATUS_PENDING,
     STATUS_RETRY_PENDING,
 )
-from core.exceptions import TaskException
-from core.models import TaskError, TaskMeta
-from core.tasks import BaseSampleTask, sample_task
+from core.db_router import (
+    ReplicaLagMonitor,
+    ReplicaRouter,
+    is_pinned_to_primary,
+    replica_reads,
+)
+from core.exceptions import TaskException, UnsafeURLException
+from core.fair_share import DeficitRoundRobin, dispatch_pending_tasks
+from core.heartbeat import (
+    HEARTBEATS_KEY,
+    STALLED_TASK_ERROR,
+    HeartbeatMonitor,
+    handle_expired_heartbeats,
+)
+from core.middleware import CompressionMiddleware
+from core.models import (
+    FairShareQueue,
+    ImportCheckpoint,
+    PendingDispatch,
+    ScheduledTask,
+    TaskError,
+    TaskMeta,
+    TaskRollup,
+    WebhookDelivery,
+)
+from core.parsers import ORJSONParser
+from core.progress import get_progress_map
+from core.registry import TaskRegistry
+from core.registry import route_task as route_task_type
+from core.registry import task_registry
+from core.renderers import ORJSONRenderer
+from core.result_cache import cache_result, get_cached_result, get_result_cache_key
+from core.retry import acquire_retry, get_retry_delay, record_attempts
+from core.scheduler import release_due_tasks, schedule_task
+from core.schema import (
+    generate_schema,
+    get_code_fingerprint,
+    get_rendered_schema,
+    get_schema,
+    get_source_files,
+)
+from core.serializers import TaskOptionsSerializer
+from core.status_flusher import StatusFlusher
+from core.tasks import (
+    BaseSampleTask,
+    TimeLimitRequest,
+    checksum_task,
+    handle_hard_time_limit,
+    run_task_batches,
+    sample_task,
+)
 from core.tests.factories import TaskErrorFactory, TaskMetaFactory
+from core.tests.webhook_receiver import WebhookReceiver
+from core.tracing import (
+    STATUS_CODE_ERROR,
+    SpanContext,
+    current_span,
+    get_exporter,
+    start_span,
+)
+from core.utils import uuid7
+from core.views import TaskViewSet
+from core.webhooks import WebhookSender, resolve_callback_url
+from core.write_behind import STATUS_STREAM_GROUP, STATUS_STREAM_KEY
 
 
 class TaskMetaTest(TestCase):
@@ -63,6 +182,19 @@ class TaskMetaTest(TestCase):
         self.assertEqual(task.status, STATUS_COMPLETED)
         self.assertEqual(task.result, "Some task's result might be here")
 
+    @freeze_time("2023-04-26 18:17:16")
+    def test_wait_for_retry(self):
+        """Tests the wait_for_retry method"""
+
+        task = TaskMetaFactory(status=STATUS_IN_PROGRESS)
+        task.wait_for_retry(90)
+        self.assertEqual(task.status, STATUS_RETRY_PENDING)
+        self.assertEqual(task.finished_at, timezone.now())
+        self.assertEqual(task.next_retry_at, timezone.now() + timezone.timedelta(seconds=90))
+
+        task.start()
+        self.assertIsNone(task.next_retry_at)
+
     def test_add_error(self):
         """Tests the add_error method"""
 
@@ -110,6 +242,22 @@ class TaskMetaTest(TestCase):
         self.task.status = STATUS_CANCELED
         self.assertTupleEqual(self.task.next_available_statuses, ())
 
+    def test_set_requeued(self):
+        """Tests that only failed tasks are requeued and every requeue gets a new attempt token"""
+
+        self.task.status = STATUS_COMPLETED
+        with self.assertRaises(TaskException):
+            self.task.set_requeued()
+
+        self.task.status = STATUS_FAILED
+        self.task.set_requeued()
+        self.assertEqual(self.task.status, STATUS_RETRY_PENDING)
+        token = self.task.attempt_token
+        self.assertIsNotNone(token)
+        self.task.status = STATUS_FAILED
+        self.task.set_requeued()
+        self.assertNotEqual(self.task.attempt_token, token)
+
 
 @override_settings(CELERY_ALWAYS_EAGER=True)
 class TaskViewSetTest(APITestCase):
@@ -146,12 +294,17 @@ class TaskViewSetTest(APITestCase):
         expected_data = dict(
             uuid=str(task.id),
             name=task.name,
+            type=task.type,
             created_at=task.created_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
             status=task.status,
             user=task.user.username,
         )
         if task.status in (STATUS_COMPLETED, STATUS_FAILED, STATUS_RETRY_PENDING, STATUS_CANCELED):
             expected_data["finished_at"] = task.finished_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        if task.status == STATUS_IN_PROGRESS:
+            expected_data["progress"] = {"percent": task.progress, "message": task.progress_message}
+        if task.status == STATUS_RETRY_PENDING:
+            expected_data["next_retry_at"] = task.next_retry_at and task.next_retry_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
         if task.status == STATUS_COMPLETED:
             expected_data["result"] = task.result
         if task.status in (STATUS_FAILED, STATUS_RETRY_PENDING):
@@ -172,14 +325,42 @@ class TaskViewSetTest(APITestCase):
         task = TaskMeta.objects.filter(user=self.user, name=self.data["name"]).first()
         self.assertIsNotNone(task)
 
+        expected_kwargs = dict(
+            param1=self.data["params"]["param1"],
+            param2=self.data["params"]["param2"],
+            countdown=self.data["options"]["delay"],
+            max_retries=self.data["options"]["retry"],
+            soft_time_limit=settings.TASK_MAX_SOFT_TIME_LIMIT,
+            time_limit=settings.TASK_MAX_TIME_LIMIT,
+        )
         mock_task_apply_async.assert_called_once_with(
-            kwargs=dict(
+            kwargs=expected_kwargs,
+            task_id=str(task.id),
+            soft_time_limit=settings.TASK_MAX_SOFT_TIME_LIMIT,
+            time_limit=settings.TASK_MAX_TIME_LIMIT,
+        )
+        self.assertDictEqual(task.kwargs, expected_kwargs)
+
+    @patch("core.tasks.sample_task.apply_async")
+    def test_create_task_start_delay(self, mock_task_apply_async):
+        """Tests the create method with a delayed start"""
+
+        data = {**self.data, "options": {**self.data["options"], "start_delay": 3600}}
+        response = self.client_user.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        task = TaskMeta.objects.get(id=response.data["uuid"])
+        mock_task_apply_async.assert_not_called()
+        self.assertEqual(
+            task.schedule.kwargs,
+            dict(
                 param1=self.data["params"]["param1"],
                 param2=self.data["params"]["param2"],
                 countdown=self.data["options"]["delay"],
                 max_retries=self.data["options"]["retry"],
+                soft_time_limit=settings.TASK_MAX_SOFT_TIME_LIMIT,
+                time_limit=settings.TASK_MAX_TIME_LIMIT,
             ),
-            task_id=str(task.id),
         )
 
     def test_retrieve_task(self):
@@ -190,7 +371,9 @@ class TaskViewSetTest(APITestCase):
         in_progress_task = TaskMetaFactory(status=STATUS_IN_PROGRESS, **task_meta_common_kwargs)
         completed_task = TaskMetaFactory(status=STATUS_COMPLETED, **task_meta_common_kwargs)
         failed_task = TaskMetaFactory(status=STATUS_FAILED, **task_meta_common_kwargs)
-        retry_pending_task = TaskMetaFactory(status=STATUS_RETRY_PENDING, **task_meta_common_kwargs)
+        retry_pending_task = TaskMetaFactory(
+            status=STATUS_RETRY_PENDING, next_retry_at=now(), **task_meta_common_kwargs
+        )
         cancelled_task = TaskMetaFactory(status=STATUS_CANCELED, **task_meta_common_kwargs)
         TaskErrorFactory(task=failed_task)
         TaskErrorFactory(task=retry_pending_task)
@@ -241,6 +424,52 @@ class TaskViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_tasks_representation(self):
+        """Tests that the list method keeps the status-dependent representation of the retrieve method"""
+
+        task_meta_common_kwargs = dict(user=self.user, finished_at=now(), result="result")
+        tasks = [TaskMetaFactory(status=task_status, **task_meta_common_kwargs) for task_status, _ in STATUS_CHOICES]
+        for task in tasks:
+            TaskErrorFactory(task=task)
+
+        response = self.client_user.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tasks.sort(key=lambda task: task.name)
+        self.assertListEqual(response.data, [self.get_expected_data(task) for task in tasks])
+
+    def test_list_tasks_sparse_fields(self):
+        """Tests the list and retrieve methods with the fields query parameter"""
+
+        completed_task = TaskMetaFactory(
+            user=self.user, name="completed", status=STATUS_COMPLETED, finished_at=now(), result="result"
+        )
+        failed_task = TaskMetaFactory(user=self.user, name="failed", status=STATUS_FAILED, finished_at=now())
+        TaskErrorFactory(task=failed_task)
+
+        with self.subTest("List with sparse fieldset"):
+            response = self.client_user.get(self.url, {"fields": "uuid,result,errors"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertListEqual(
+                response.data,
+                [
+                    {"uuid": str(completed_task.id), "result": "result"},
+                    {
+                        "uuid": str(failed_task.id),
+                        "errors": self.get_expected_data(failed_task)["errors"],
+                    },
+                ],
+            )
+
+        with self.subTest("Retrieve with sparse fieldset"):
+            response = self.client_user.get(f"{self.url}{completed_task.id}/", {"fields": "name,status"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertDictEqual(response.data, {"name": completed_task.name, "status": STATUS_COMPLETED})
+
+        with self.subTest("Unknown field"):
+            response = self.client_user.get(self.url, {"fields": "uuid,unknown"})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     @patch("core.views.AsyncResult")
     def test_cancel_task(self, mock_async_result):
         """Tests the cancel method"""
@@ -267,6 +496,15 @@ class TaskViewSetTest(APITestCase):
             mock_async_result.assert_called_once_with(task.id)
             mock_async_result.return_value.revoke.assert_called_once()
 
+        with self.subTest("Removes scheduled execution"):
+            mock_async_result.reset_mock()
+            task = TaskMetaFactory(user=self.user)
+            ScheduledTask.objects.create(task=task, name=sample_task.name, due_at=now())
+
+            response = self.client_user.post(f"{self.url}{task.id}/cancel/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(ScheduledTask.objects.filter(task=task).exists())
+
         with self.subTest("Checks admin has access"):
             mock_async_result.reset_mock()
             task = TaskMetaFactory(user=self.user)
@@ -318,6 +556,70 @@ class BaseSampleTaskTest(TestCase):
         self.assertEqual(self.sample_task.max_retries, 3)
         self.assertEqual(self.sample_task.task_id, self.task_meta.id)
 
+    @patch("celery.app.task.Task.request", new_callable=PropertyMock)
+    def test_init_config_defaults(self, request_property_mock):
+        """Tests that options of the previous execution are not kept by the shared task instance"""
+
+        self.sample_task._init_config(countdown=120, retry_policy=RETRY_POLICY_FULL_JITTER, retry_deadline=600)
+        self.sample_task._init_config()
+
+        self.assertEqual(self.sample_task.countdown, BaseSampleTask.countdown)
+        self.assertEqual(self.sample_task.retry_policy, RETRY_POLICY_FIXED)
+        self.assertIsNone(self.sample_task.retry_deadline)
+
+    @freeze_time("2023-04-26 18:17:16")
+    def test_within_retry_deadline(self):
+        """Tests the _within_retry_deadline method"""
+
+        task = TaskMetaFactory()
+        TaskMeta.objects.filter(id=task.id).update(created_at=now() - timezone.timedelta(seconds=100))
+        task.refresh_from_db()
+
+        self.assertTrue(self.sample_task._within_retry_deadline(task, 10**6))
+        self.sample_task.retry_deadline = 160
+        self.assertTrue(self.sample_task._within_retry_deadline(task, 60))
+        self.assertFalse(self.sample_task._within_retry_deadline(task, 61))
+
+    @patch("core.tasks.acquire_retry")
+    @patch("core.tasks.BaseSampleTask._handle_failure")
+    @patch("core.tasks.BaseSampleTask._get_task_meta")
+    @patch("core.tasks.logger")
+    @patch("celery.app.task.Task.request", new_callable=PropertyMock)
+    def test_handle_retry_deadline_passed(
+        self, request_property_mock, mock_logger, get_task_meta_mock, handle_failure_mock, acquire_retry_mock
+    ):
+        """Tests that the task fails without taking the retry budget when the next retry is past the deadline"""
+
+        get_task_meta_mock.return_value = self.task_meta
+        self.sample_task.retry_deadline = 0
+
+        self.sample_task._handle_retry("Test error")
+
+        handle_failure_mock.assert_called_once()
+        acquire_retry_mock.assert_not_called()
+        self.assertEqual(self.task_meta.errors.count(), 1)
+        mock_logger.warning.assert_called_once_with(f"Retry deadline of the task {self.task_meta.id} has passed.")
+
+    @patch("core.tasks.acquire_retry", return_value=False)
+    @patch("core.tasks.BaseSampleTask._handle_failure")
+    @patch("core.tasks.BaseSampleTask._get_task_meta")
+    @patch("core.tasks.logger")
+    @patch("celery.app.task.Task.request", new_callable=PropertyMock)
+    def test_handle_retry_budget_exhausted(
+        self, request_property_mock, mock_logger, get_task_meta_mock, handle_failure_mock, acquire_retry_mock
+    ):
+        """Tests that the task fails when the retry budget of the task name is exhausted"""
+
+        get_task_meta_mock.return_value = self.task_meta
+
+        self.sample_task._handle_retry("Test error")
+
+        acquire_retry_mock.assert_called_once_with(self.sample_task.name)
+        handle_failure_mock.assert_called_once()
+        mock_logger.warning.assert_called_once_with(
+            f"Retry budget of {self.sample_task.name} has been exhausted, task {self.task_meta.id} fails."
+        )
+
     @patch("core.tasks.logger")
     @patch("celery.app.task.Task.request", new_callable=PropertyMock)
     def test_log_attempt_number(self, request_property_mock, mock_logger):
@@ -371,7 +673,7 @@ class BaseSampleTaskTest(TestCase):
 
         task_instance_mock.start.assert_called_once()
         sleep_mock.assert_called_once_with(1)
-        task_instance_mock.finish.assert_called_once_with(STATUS_COMPLETED)
+        task_instance_mock.finish.assert_called_once_with(STATUS_COMPLETED, None)
         mock_logger.info.assert_called_once_with(f"The task {self.task_meta.id} has been successfully completed.")
 
     @patch("core.tasks.BaseSampleTask._get_task_meta")
@@ -532,3 +834,2686 @@ class TestSampleTask(TestCase):
 
             mock_handle_retry.assert_called_once_with(error_message)
             mock_handle_failure.assert_not_called()
+
+
+class ORJSONRendererTest(TestCase):
+    """Test cases for the ORJSONRenderer and ORJSONParser classes"""
+
+    def test_render(self):
+        """Tests that output matches JSONRenderer and that UUID and datetime values are rendered natively"""
+
+        task = TaskMetaFactory()
+        data = {"uuid": str(task.id), "name": task.name, "errors": [{"message": "  error"}], "params": None}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+        created_at = timezone.datetime(2023, 4, 26, 18, 17, 16, 123456, tzinfo=timezone.utc)
+        self.assertEqual(
+            ORJSONRenderer().render({"uuid": task.id, "created_at": created_at, "amount": Decimal("1.5")}),
+            f'{{"uuid":"{task.id}","created_at":"2023-04-26T18:17:16.123456Z","amount":1.5}}'.encode(),
+        )
+
+    def test_render_indent(self):
+        """Tests the render method with indent requested"""
+
+        content = ORJSONRenderer().render({"name": "task"}, "application/json; indent=4")
+        self.assertEqual(content, b'{\n  "name": "task"\n}')
+
+    def test_parse(self):
+        """Tests the ORJSONParser parse method"""
+
+        data = {"name": "task", "params": {"param1": 10}}
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(ORJSONRenderer().render(data))), data)
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b"{not json"))
+
+
+class CompressionMiddlewareTest(TestCase):
+    """Test cases for the CompressionMiddleware class"""
+
+    def setUp(self):
+        self.request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+    @override_settings(COMPRESSION_MIN_LENGTH=1024)
+    def test_process_response(self):
+        """Tests that only large enough responses are compressed"""
+
+        with self.subTest("Large response"):
+            response = CompressionMiddleware(lambda request: None).process_response(
+                self.request, HttpResponse(b"a" * 1024)
+            )
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(response.content), b"a" * 1024)
+
+        with self.subTest("Small response"):
+            response = CompressionMiddleware(lambda request: None).process_response(
+                self.request, HttpResponse(b"a" * 1023)
+            )
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+        with self.subTest("Client does not accept gzip"):
+            request = RequestFactory().get("/")
+            response = CompressionMiddleware(lambda request: None).process_response(request, HttpResponse(b"a" * 1024))
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class UUID7Test(TestCase):
+    """Test cases for the uuid7 function"""
+
+    def test_uuid7(self):
+        """Tests version, variant and ordering of the generated values"""
+
+        values = [uuid7() for _ in range(1000)]
+        for value in values:
+            self.assertEqual(value.version, 7)
+            self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertEqual(len(set(values)), len(values))
+
+        with freeze_time("2023-04-26 18:17:16"):
+            earlier_value = uuid7()
+        with freeze_time("2023-04-26 18:17:17"):
+            later_value = uuid7()
+        self.assertLess(earlier_value, later_value)
+        self.assertEqual(earlier_value.int >> 80, 1682533036000)
+
+    def test_task_meta_default_id(self):
+        """Tests that new tasks get time-ordered ids"""
+
+        self.assertEqual(TaskMetaFactory().id.version, 7)
+
+
+@override_settings(SCHEDULER_MIN_DELAY=30)
+class SchedulerTest(TestCase):
+    """Test cases for the delayed tasks scheduler"""
+
+    def setUp(self):
+        self.task_meta = TaskMetaFactory()
+        self.kwargs = {"param1": 10, "param2": "param2", "countdown": 100, "max_retries": 2}
+
+    @patch("core.tasks.sample_task.apply_async")
+    def test_schedule_task_short_delay(self, mock_task_apply_async):
+        """Tests that short delays are left to the broker"""
+
+        schedule_task(sample_task, str(self.task_meta.id), self.kwargs, 29)
+
+        mock_task_apply_async.assert_called_once_with(
+            kwargs=self.kwargs, task_id=str(self.task_meta.id), countdown=29, retries=0
+        )
+        self.assertFalse(ScheduledTask.objects.exists())
+
+    @freeze_time("2023-04-26 18:17:16")
+    @patch("core.tasks.sample_task.apply_async")
+    def test_schedule_task_long_delay(self, mock_task_apply_async):
+        """Tests that long delays are stored in the ScheduledTask table"""
+
+        schedule_task(sample_task, str(self.task_meta.id), self.kwargs, 30, retries=1)
+
+        mock_task_apply_async.assert_not_called()
+        scheduled_task = ScheduledTask.objects.get(task=self.task_meta)
+        self.assertEqual(scheduled_task.name, sample_task.name)
+        self.assertEqual(scheduled_task.kwargs, self.kwargs)
+        self.assertEqual(scheduled_task.retries, 1)
+        self.assertEqual(scheduled_task.due_at, now() + timezone.timedelta(seconds=30))
+
+    @patch("core.scheduler.current_app")
+    def test_release_due_tasks(self, mock_current_app):
+        """Tests that only due tasks are published and removed"""
+
+        due_tasks = [
+            ScheduledTask.objects.create(
+                task=TaskMetaFactory(), name=sample_task.name, kwargs=self.kwargs, retries=1, due_at=now()
+            )
+            for _ in range(3)
+        ]
+        not_due_task = ScheduledTask.objects.create(
+            task=self.task_meta, name=sample_task.name, due_at=now() + timezone.timedelta(minutes=1)
+        )
+
+        self.assertEqual(release_due_tasks(batch_size=2), 3)
+
+        self.assertEqual(mock_current_app.send_task.call_count, 3)
+        for scheduled_task in due_tasks:
+            mock_current_app.send_task.assert_any_call(
+                sample_task.name, kwargs=self.kwargs, task_id=str(scheduled_task.task_id), retries=1
+            )
+        self.assertListEqual(list(ScheduledTask.objects.all()), [not_due_task])
+
+    @patch("core.tasks.schedule_task")
+    @patch("core.tasks.BaseSampleTask._get_task_meta")
+    @patch("core.tasks.logger")
+    @patch("celery.app.task.Task.request", new_callable=PropertyMock)
+    def test_handle_retry_long_countdown(
+        self, request_property_mock, mock_logger, get_task_meta_mock, schedule_task_mock
+    ):
+        """Tests that retries with long countdown are scheduled instead of sent with ETA"""
+
+        request_property_mock.return_value = MagicMock(is_eager=False, retries=0, kwargs=self.kwargs)
+        base_task = BaseSampleTask()
+        base_task.task_id = self.task_meta.id
+        base_task.countdown = 100
+
+        with self.assertRaises(Retry):
+            base_task._handle_retry("Test error")
+
+        get_task_meta_mock.return_value.wait_for_retry.assert_called_once_with(100)
+        schedule_task_mock.assert_called_once_with(
+            base_task, self.task_meta.id, {**self.kwargs, "retry_delay": 100}, 100, retries=1
+        )
+
+
+class RetryPolicyTest(TestCase):
+    """Test cases for the get_retry_delay function"""
+
+    def test_fixed(self):
+        for retries in range(5):
+            self.assertEqual(get_retry_delay(RETRY_POLICY_FIXED, 60, 100, retries), 60)
+
+    def test_exponential(self):
+        delays = [get_retry_delay(RETRY_POLICY_EXPONENTIAL, 10, 100, retries) for retries in range(6)]
+        self.assertListEqual(delays, [10, 20, 40, 80, 100, 100])
+
+    def test_full_jitter(self):
+        for retries in range(6):
+            for _ in range(100):
+                self.assertTrue(
+                    0 <= get_retry_delay(RETRY_POLICY_FULL_JITTER, 10, 100, retries) <= min(100, 10 * 2**retries)
+                )
+
+    def test_decorrelated_jitter(self):
+        for previous_delay in (None, 10, 20, 50):
+            for _ in range(100):
+                delay = get_retry_delay(RETRY_POLICY_DECORRELATED_JITTER, 10, 100, 1, previous_delay)
+                self.assertTrue(10 <= delay <= min(100, (previous_delay or 10) * 3))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            get_retry_delay("unknown", 10, 100, 1)
+
+
+@override_settings(RETRY_BUDGET_WINDOW=60, RETRY_BUDGET_RATIO=0.2, RETRY_BUDGET_MIN=10)
+@freeze_time("2023-04-26 18:17:16")
+@patch("core.retry.get_redis")
+class RetryBudgetTest(TestCase):
+    """Test cases for the retry budget shared by the tasks with the same name"""
+
+    def setUp(self):
+        self.window = int(timezone.now().timestamp() // 60)
+        self.key = f"retry_budget:task:{self.window}"
+
+    @staticmethod
+    def get_pipeline_mock(get_redis_mock):
+        pipeline_mock = get_redis_mock.return_value.pipeline.return_value
+        for method in ("hincrby", "expire", "hmget"):
+            getattr(pipeline_mock, method).return_value = pipeline_mock
+        return pipeline_mock
+
+    def test_record_attempts(self, get_redis_mock):
+        """Tests that the attempts are counted in the current window"""
+
+        pipeline_mock = self.get_pipeline_mock(get_redis_mock)
+
+        record_attempts("task", 5)
+
+        pipeline_mock.hincrby.assert_called_once_with(self.key, "attempts", 5)
+        pipeline_mock.expire.assert_called_once_with(self.key, 120)
+
+    def test_acquire_retry(self, get_redis_mock):
+        """Tests that retries of the current and the previous windows are limited by the ratio of the attempts"""
+
+        pipeline_mock = self.get_pipeline_mock(get_redis_mock)
+        # 10 + 0.2 * (40 + 10) = 20 retries are allowed
+        pipeline_mock.execute.return_value = [15, True, [b"40"], [b"10", b"5"]]
+        self.assertTrue(acquire_retry("task"))
+        pipeline_mock.hincrby.assert_called_once_with(self.key, "retries", 1)
+        pipeline_mock.hmget.assert_any_call(f"retry_budget:task:{self.window - 1}", "attempts", "retries")
+        get_redis_mock.return_value.hincrby.assert_not_called()
+
+        pipeline_mock.execute.return_value = [16, True, [b"40"], [b"10", b"5"]]
+        self.assertFalse(acquire_retry("task"))
+        get_redis_mock.return_value.hincrby.assert_called_once_with(self.key, "retries", -1)
+
+        pipeline_mock.execute.return_value = [10, True, [None], [None, None]]
+        self.assertTrue(acquire_retry("task"))
+
+    def test_acquire_retry_redis_error(self, get_redis_mock):
+        """Tests that retries are allowed when Redis is not available"""
+
+        self.get_pipeline_mock(get_redis_mock).execute.side_effect = RedisError
+
+        self.assertTrue(acquire_retry("task"))
+
+
+@patch("core.heartbeat.get_redis")
+class HeartbeatTest(TestCase):
+    """Test cases for the task heartbeats"""
+
+    @patch("core.heartbeat.HeartbeatMonitor._ensure_thread")
+    @freeze_time("2023-04-26 18:17:16")
+    def test_heartbeat_monitor(self, ensure_thread_mock, get_redis_mock):
+        """Tests that heartbeats of all running tasks are sent with a single command"""
+
+        redis_mock = get_redis_mock.return_value
+        monitor = HeartbeatMonitor()
+        timestamp = timezone.now().timestamp()
+
+        monitor.start(sample_task.name, "task-1")
+        redis_mock.zadd.assert_called_once_with(HEARTBEATS_KEY, {f"{sample_task.name}|task-1": timestamp})
+        ensure_thread_mock.assert_called_once()
+
+        monitor.start(sample_task.name, "task-2")
+        redis_mock.zadd.reset_mock()
+        monitor.beat()
+        redis_mock.zadd.assert_called_once_with(
+            HEARTBEATS_KEY, {f"{sample_task.name}|task-1": timestamp, f"{sample_task.name}|task-2": timestamp}
+        )
+
+        monitor.stop(sample_task.name, "task-1")
+        redis_mock.zrem.assert_called_once_with(HEARTBEATS_KEY, f"{sample_task.name}|task-1")
+        redis_mock.zadd.reset_mock()
+        monitor.beat()
+        redis_mock.zadd.assert_called_once_with(HEARTBEATS_KEY, {f"{sample_task.name}|task-2": timestamp})
+
+        # the heartbeat of the abandoned task is kept to expire
+        monitor.abandon(sample_task.name, "task-2")
+        redis_mock.zadd.reset_mock()
+        monitor.beat()
+        redis_mock.zadd.assert_not_called()
+        redis_mock.zrem.assert_called_once()
+
+    @patch("core.heartbeat.HeartbeatMonitor._ensure_thread")
+    @patch("core.heartbeat.logger")
+    def test_heartbeat_monitor_redis_error(self, mock_logger, ensure_thread_mock, get_redis_mock):
+        """Tests that Redis errors don't break task execution"""
+
+        get_redis_mock.return_value.zadd.side_effect = RedisError("Connection refused")
+        HeartbeatMonitor().start(sample_task.name, "task-1")
+        mock_logger.warning.assert_called_once_with("Failed to send heartbeats: Connection refused")
+
+    @patch("core.heartbeat.current_app")
+    @patch("core.heartbeat.logger")
+    @override_settings(STALLED_TASKS_POLICY=STALLED_TASKS_POLICY_REQUEUE, STALLED_TASKS_MAX_REQUEUES=1)
+    def test_handle_expired_heartbeats_requeue(self, mock_logger, mock_current_app, get_redis_mock):
+        """Tests that stalled tasks are requeued once and then failed"""
+
+        task = TaskMetaFactory(status=STATUS_IN_PROGRESS, kwargs={"param1": 10})
+        completed_task = TaskMetaFactory(status=STATUS_COMPLETED)
+        members = [f"{sample_task.name}|{task.id}", f"{sample_task.name}|{completed_task.id}"]
+        redis_mock = get_redis_mock.return_value
+        redis_mock.zrangebyscore.return_value = [member.encode() for member in members]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(handle_expired_heartbeats(), 1)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_RETRY_PENDING)
+        self.assertEqual(task.errors.get().message, STALLED_TASK_ERROR)
+        mock_current_app.send_task.assert_called_once_with(
+            sample_task.name, kwargs={"param1": 10, ATTEMPT_TOKEN_OPTION: str(task.attempt_token)}, task_id=str(task.id)
+        )
+        redis_mock.zrem.assert_called_once_with(HEARTBEATS_KEY, *members)
+        completed_task.refresh_from_db()
+        self.assertEqual(completed_task.status, STATUS_COMPLETED)
+
+        with self.subTest("Requeues limit is reached"):
+            mock_current_app.reset_mock()
+            task.start(str(task.attempt_token))
+            with self.captureOnCommitCallbacks(execute=True):
+                handle_expired_heartbeats()
+
+            task.refresh_from_db()
+            self.assertEqual(task.status, STATUS_FAILED)
+            mock_current_app.send_task.assert_not_called()
+
+    @patch("core.heartbeat.current_app")
+    @patch("core.heartbeat.logger")
+    @override_settings(STALLED_TASKS_POLICY=STALLED_TASKS_POLICY_FAIL)
+    def test_handle_expired_heartbeats_fail(self, mock_logger, mock_current_app, get_redis_mock):
+        """Tests that stalled tasks are failed with the fail policy"""
+
+        task = TaskMetaFactory(status=STATUS_IN_PROGRESS)
+        get_redis_mock.return_value.zrangebyscore.return_value = [f"{sample_task.name}|{task.id}".encode()]
+
+        handle_expired_heartbeats()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_FAILED)
+        mock_current_app.send_task.assert_not_called()
+
+    @patch("core.heartbeat.current_app")
+    @patch("core.heartbeat.logger")
+    def test_handle_expired_heartbeats_locked(self, mock_logger, mock_current_app, get_redis_mock):
+        """Tests that heartbeats of the tasks locked by another transaction are kept to be checked again"""
+
+        stalled_task = TaskMetaFactory(status=STATUS_IN_PROGRESS)
+        locked_task = TaskMetaFactory(status=STATUS_IN_PROGRESS)
+        members = [f"{sample_task.name}|{stalled_task.id}", f"{sample_task.name}|{locked_task.id}"]
+        redis_mock = get_redis_mock.return_value
+        redis_mock.zrangebyscore.return_value = [member.encode() for member in members]
+
+        # rows locked by another transaction are skipped by `select_for_update(skip_locked=True)`
+        with patch.object(
+            TaskMeta.objects, "select_for_update", return_value=TaskMeta.objects.exclude(id=locked_task.id)
+        ):
+            self.assertEqual(handle_expired_heartbeats(), 1)
+
+        redis_mock.zrem.assert_called_once_with(HEARTBEATS_KEY, members[0])
+        locked_task.refresh_from_db()
+        self.assertEqual(locked_task.status, STATUS_IN_PROGRESS)
+
+    @patch("core.heartbeat.current_app")
+    @patch("core.heartbeat.logger")
+    @override_settings(STALLED_TASKS_POLICY=STALLED_TASKS_POLICY_REQUEUE)
+    def test_requeued_task_started_once(self, mock_logger, mock_current_app, get_redis_mock):
+        """Tests that the stale message redelivered by the broker doesn't start the requeued task"""
+
+        task = TaskMetaFactory(status=STATUS_IN_PROGRESS, kwargs={"param1": 0, "param2": "a"})
+        get_redis_mock.return_value.zrangebyscore.return_value = [f"{sample_task.name}|{task.id}".encode()]
+        with self.captureOnCommitCallbacks(execute=True):
+            handle_expired_heartbeats()
+        requeued_kwargs = mock_current_app.send_task.call_args.kwargs["kwargs"]
+
+        sample_task.apply(kwargs=task.kwargs, task_id=str(task.id)).get()
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_RETRY_PENDING)
+
+        sample_task.apply(kwargs=requeued_kwargs, task_id=str(task.id)).get()
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_COMPLETED)
+
+    def test_handle_expired_heartbeats_nothing_expired(self, get_redis_mock):
+        get_redis_mock.return_value.zrangebyscore.return_value = []
+        self.assertEqual(handle_expired_heartbeats(), 0)
+        get_redis_mock.return_value.zrem.assert_not_called()
+
+
+class TaskProgressTest(TestCase):
+    """Test cases for the task progress reporting"""
+
+    def setUp(self):
+        self.task_meta = TaskMetaFactory(status=STATUS_IN_PROGRESS, user=UserFactory())
+        self.sample_task = BaseSampleTask()
+        self.sample_task.task_id = self.task_meta.id
+
+    @override_settings(PROGRESS_FLUSH_INTERVAL=10)
+    @patch("core.tasks.store_progress")
+    def test_set_progress(self, store_progress_mock):
+        """Tests that every update is stored in Redis while the database is updated once per interval"""
+
+        with freeze_time("2023-04-26 18:17:16") as frozen_time:
+            self.sample_task.set_progress(10, "first")
+            frozen_time.tick(5)
+            self.sample_task.set_progress(50, "second")
+            self.task_meta.refresh_from_db()
+            self.assertEqual((self.task_meta.progress, self.task_meta.progress_message), (10, "first"))
+
+            frozen_time.tick(5)
+            self.sample_task.set_progress(150, "third")
+            self.task_meta.refresh_from_db()
+            self.assertEqual((self.task_meta.progress, self.task_meta.progress_message), (100, "third"))
+
+        self.assertListEqual(
+            store_progress_mock.call_args_list,
+            [
+                call(self.task_meta.id, 10, "first"),
+                call(self.task_meta.id, 50, "second"),
+                call(self.task_meta.id, 100, "third"),
+            ],
+        )
+
+    @patch("core.progress.get_redis")
+    def test_get_progress_map(self, get_redis_mock):
+        """Tests that progress of all tasks is read with a single pipeline"""
+
+        pipeline_mock = get_redis_mock.return_value.pipeline.return_value
+        pipeline_mock.execute.return_value = [{b"percent": b"40", b"message": b"almost"}, {}]
+
+        progress_map = get_progress_map(["task-1", "task-2"])
+
+        self.assertDictEqual(progress_map, {"task-1": {"percent": 40, "message": "almost"}})
+        self.assertListEqual(
+            pipeline_mock.hgetall.call_args_list, [call("task_progress:task-1"), call("task_progress:task-2")]
+        )
+        pipeline_mock.execute.assert_called_once()
+
+    @patch("core.serializers.get_progress_map")
+    def test_task_representation(self, get_progress_map_mock):
+        """Tests that IN_PROGRESS tasks expose the latest progress from Redis"""
+
+        get_progress_map_mock.return_value = {str(self.task_meta.id): {"percent": 40, "message": "almost"}}
+        client = APIClient()
+        client.force_authenticate(user=self.task_meta.user)
+
+        response = client.get(f"/api/tasks/{self.task_meta.id}/")
+        self.assertEqual(response.data["progress"], {"percent": 40, "message": "almost"})
+
+        response = client.get("/api/tasks/", {"fields": "uuid,progress"})
+        self.assertListEqual(
+            response.data, [{"uuid": str(self.task_meta.id), "progress": {"percent": 40, "message": "almost"}}]
+        )
+
+
+class TaskMetaAdminTest(TestCase):
+    """Test cases for the TaskMeta and TaskError admin views"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory(is_staff=True, is_superuser=True)
+        cls.url = "/admin/core/taskmeta/"
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_changelist(self):
+        """Tests that the changelist pages work with the index-backed filters and search"""
+
+        task = TaskMetaFactory(status=STATUS_FAILED)
+        TaskErrorFactory(task=task)
+        for params in (
+            {},
+            {"status__exact": STATUS_FAILED},
+            {"created_at__gte": "2023-04-26 00:00:00+00:00", "created_at__lt": "2023-04-27 00:00:00+00:00"},
+            {"username": task.user.username},
+            {"q": str(task.id)},
+            {"q": "not uuid"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, {"q": str(task.id)})
+        self.assertListEqual(list(response.context["cl"].result_list), [task])
+        response = self.client.get(self.url, {"username": "unknown"})
+        self.assertListEqual(list(response.context["cl"].result_list), [])
+
+        response = self.client.get("/admin/core/taskerror/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_estimated_count_paginator(self):
+        """Tests that the paginator uses statistics estimates for large tables"""
+
+        TaskMetaFactory.create_batch(3)
+        with override_settings(ADMIN_EXACT_COUNT_THRESHOLD=0), patch(
+            "core.admin.EstimatedCountPaginator.get_estimate", return_value=1000
+        ):
+            self.assertEqual(EstimatedCountPaginator(TaskMeta.objects.all(), 100).count, 1000)
+        with override_settings(ADMIN_EXACT_COUNT_THRESHOLD=10**6):
+            self.assertEqual(EstimatedCountPaginator(TaskMeta.objects.all(), 100).count, 3)
+
+        paginator = EstimatedCountPaginator(TaskMeta.objects.filter(status=STATUS_PENDING), 100)
+        self.assertIsInstance(paginator.get_estimate(), int)
+
+    @patch("core.admin.current_app")
+    def test_cancel_tasks(self, mock_current_app):
+        """Tests the cancel_tasks action"""
+
+        pending_task = TaskMetaFactory(status=STATUS_PENDING, callback_url="https://example.com/hook")
+        ScheduledTask.objects.create(task=pending_task, name=sample_task.name, due_at=now())
+        # waiting for the fair-share dispatcher
+        queued_task = TaskMetaFactory(status=STATUS_PENDING)
+        PendingDispatch.objects.create(task=queued_task, user=queued_task.user, name=sample_task.name)
+        completed_task = TaskMetaFactory(status=STATUS_COMPLETED)
+
+        response = self.client.post(
+            self.url,
+            {"action": "cancel_tasks", "_selected_action": [pending_task.id, queued_task.id, completed_task.id]},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        pending_task.refresh_from_db()
+        completed_task.refresh_from_db()
+        self.assertEqual(pending_task.status, STATUS_CANCELED)
+        self.assertIsNotNone(pending_task.finished_at)
+        self.assertEqual(completed_task.status, STATUS_COMPLETED)
+        self.assertFalse(ScheduledTask.objects.exists())
+        self.assertFalse(PendingDispatch.objects.exists())
+        queued_task.refresh_from_db()
+        self.assertEqual(queued_task.status, STATUS_CANCELED)
+        self.assertCountEqual(
+            mock_current_app.control.revoke.call_args.args[0], [str(pending_task.id), str(queued_task.id)]
+        )
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.task, pending_task)
+        self.assertEqual(delivery.payload["task"]["status"], STATUS_CANCELED)
+
+    @patch("core.tasks.sample_task.apply_async")
+    def test_requeue_tasks(self, mock_task_apply_async):
+        """Tests the requeue_tasks action"""
+
+        failed_task = TaskMetaFactory(status=STATUS_FAILED, kwargs={"param1": 1})
+        completed_task = TaskMetaFactory(status=STATUS_COMPLETED)
+        # a retry message of the task may still be in the broker
+        retry_pending_task = TaskMetaFactory(status=STATUS_RETRY_PENDING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {
+                    "action": "requeue_tasks",
+                    "_selected_action": [failed_task.id, completed_task.id, retry_pending_task.id],
+                },
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        failed_task.refresh_from_db()
+        self.assertEqual(failed_task.status, STATUS_RETRY_PENDING)
+        self.assertIsNotNone(failed_task.attempt_token)
+        mock_task_apply_async.assert_called_once()
+        self.assertEqual(
+            mock_task_apply_async.call_args.kwargs["kwargs"],
+            {"param1": 1, ATTEMPT_TOKEN_OPTION: str(failed_task.attempt_token)},
+        )
+        self.assertEqual(mock_task_apply_async.call_args.kwargs["task_id"], str(failed_task.id))
+        retry_pending_task.refresh_from_db()
+        self.assertIsNone(retry_pending_task.attempt_token)
+
+    @patch("core.tasks.sample_task.apply_async")
+    def test_requeue_tasks_in_flight_duplicate(self, mock_task_apply_async):
+        """Tests that failed tasks whose duplicate is in flight are skipped instead of violating the dedup key"""
+
+        failed_task = TaskMetaFactory(status=STATUS_FAILED, dedup_key="a" * 64)
+        TaskMetaFactory(status=STATUS_PENDING, dedup_key="a" * 64)
+        failed_twins = TaskMetaFactory.create_batch(2, status=STATUS_FAILED, dedup_key="b" * 64)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {"action": "requeue_tasks", "_selected_action": [failed_task.id, *(task.id for task in failed_twins)]},
+                follow=True,
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "1 tasks have been requeued.")
+        self.assertContains(response, "2 tasks have been skipped, since their duplicates are in flight.")
+        failed_task.refresh_from_db()
+        self.assertEqual(failed_task.status, STATUS_FAILED)
+        self.assertEqual(TaskMeta.objects.filter(dedup_key="b" * 64, status=STATUS_RETRY_PENDING).count(), 1)
+        mock_task_apply_async.assert_called_once()
+
+
+class ReplicaRouterTest(APITestCase):
+    """Test cases for the read-replica routing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.router = ReplicaRouter()
+
+    @patch("core.db_router.replica_lag_monitor.get_available_replicas", return_value=["replica_0"])
+    def test_db_for_read(self, _):
+        """Tests that only reads with enabled replica_reads go to the replicas"""
+
+        self.assertEqual(self.router.db_for_read(TaskMeta), "default")
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(TaskMeta), "replica_0")
+            self.assertEqual(self.router.db_for_write(TaskMeta), "default")
+        finally:
+            replica_reads.reset(token)
+        self.assertTrue(self.router.allow_migrate("default", "core"))
+        self.assertFalse(self.router.allow_migrate("replica_0", "core"))
+
+    def test_db_for_read_no_replicas(self):
+        """Tests that reads go to the primary when no replica is available"""
+
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(TaskMeta), "default")
+        finally:
+            replica_reads.reset(token)
+
+    @override_settings(REPLICA_MAX_LAG=5, REPLICA_LAG_CHECK_INTERVAL=60)
+    @patch("core.db_router.ReplicaLagMonitor.get_replicas", return_value=["replica_0", "replica_1"])
+    def test_replica_lag_monitor(self, _):
+        """Tests that lagging replicas are excluded and lag is measured once per interval in the background"""
+
+        monitor = ReplicaLagMonitor()
+        with patch.object(monitor, "measure", side_effect=lambda alias: {"replica_0": 1, "replica_1": 10}[alias]):
+            self.assertListEqual(monitor.get_available_replicas(), [])
+            with monitor.lock:
+                self.assertListEqual(monitor.get_available_replicas(), ["replica_0"])
+            self.assertListEqual(monitor.get_available_replicas(), ["replica_0"])
+            self.assertEqual(monitor.measure.call_count, 2)
+
+    @override_settings(REPLICA_MAX_LAG=5, REPLICA_LAG_CHECK_INTERVAL=60)
+    @patch("core.db_router.ReplicaLagMonitor.get_replicas", return_value=["replica_0"])
+    def test_replica_lag_monitor_stale(self, _):
+        """Tests that requests don't wait for a hanging measurement and use the primary once the lag is stale"""
+
+        monitor = ReplicaLagMonitor()
+        monitor.lags = {"replica_0": 1}
+        monitor.measured_at = time.monotonic() - 90
+        measured = threading.Event()
+        with patch.object(monitor, "measure", side_effect=lambda alias: measured.wait(5) and 1):
+            self.assertListEqual(monitor.get_available_replicas(), ["replica_0"])
+            monitor.measured_at -= 60
+            self.assertListEqual(monitor.get_available_replicas(), [])
+            measured.set()
+            with monitor.lock:
+                self.assertListEqual(monitor.get_available_replicas(), ["replica_0"])
+            self.assertEqual(monitor.measure.call_count, 1)
+
+    @patch("core.db_router.ReplicaLagMonitor.get_replicas", return_value=["replica_0"])
+    def test_replica_lag_monitor_failed(self, _):
+        """Tests that the primary is used when the measurement fails"""
+
+        monitor = ReplicaLagMonitor()
+        with patch.object(monitor, "measure", side_effect=RuntimeError):
+            monitor.get_available_replicas()
+            with monitor.lock:
+                self.assertListEqual(monitor.get_available_replicas(), [])
+        self.assertIsNone(monitor.measured_at)
+
+    @patch("core.views.is_pinned_to_primary")
+    @patch("core.views.pin_to_primary")
+    def test_read_your_writes(self, mock_pin_to_primary, mock_is_pinned_to_primary):
+        """Tests that writes pin the user to the primary and reads use the replicas otherwise"""
+
+        used_replicas = []
+        get_queryset = TaskViewSet.get_queryset
+
+        def record_replica_reads(view):
+            used_replicas.append(replica_reads.get())
+            return get_queryset(view)
+
+        with patch.object(TaskViewSet, "get_queryset", record_replica_reads):
+            mock_is_pinned_to_primary.return_value = False
+            self.client.get("/api/tasks/")
+            mock_is_pinned_to_primary.return_value = True
+            self.client.get("/api/tasks/")
+
+        self.assertListEqual(used_replicas, [True, False])
+        self.assertFalse(replica_reads.get())
+        mock_pin_to_primary.assert_not_called()
+
+        with patch("core.tasks.sample_task.apply_async"):
+            self.client.post("/api/tasks/", {"name": "task", "options": {}, "params": {}}, format="json")
+        mock_pin_to_primary.assert_called_once_with(self.user.id)
+
+    @patch("core.db_router.get_redis")
+    def test_is_pinned_to_primary_redis_error(self, mock_get_redis):
+        """Tests that the primary is used when the pin can't be checked"""
+
+        mock_get_redis.return_value.exists.side_effect = RedisError
+        self.assertTrue(is_pinned_to_primary(self.user.id))
+
+    def test_metrics(self):
+        """Tests that the metrics are exposed to the staff only"""
+
+        self.assertEqual(self.client.get("/metrics/").status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=UserFactory(is_staff=True))
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class DBConnectionsTest(TestCase):
+    """Test cases for the persistent database connections metrics and cleanup"""
+
+    @staticmethod
+    def get_metric(name: str) -> float:
+        return REGISTRY.get_sample_value(name, {"database": "default"}) or 0
+
+    def test_reused_connections_metric(self):
+        """Tests that requests/tasks started with an open connection are counted"""
+
+        TaskMeta.objects.exists()
+        reused = self.get_metric("task_management_db_connections_reused_total")
+        task_prerun.send(sender=sample_task, task_id="task_id", task=sample_task)
+        self.assertEqual(self.get_metric("task_management_db_connections_reused_total"), reused + 1)
+
+    def test_opened_connections_metric(self):
+        """Tests that opened connections are counted"""
+
+        opened = self.get_metric("task_management_db_connections_opened_total")
+        connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual(self.get_metric("task_management_db_connections_opened_total"), opened + 1)
+
+    @patch("django.db.connections.close_all")
+    def test_worker_process_shutdown(self, mock_close_all):
+        """Tests that the pool process closes its connections on exit"""
+
+        worker_process_shutdown.send(sender=None, pid=1, exitcode=0)
+        mock_close_all.assert_called_once()
+
+
+@override_settings(WEBHOOK_SECRET="webhook-secret", WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True)
+class WebhookTest(TestCase):
+    """Test cases for the completion webhooks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.sender = WebhookSender(concurrency=4, timeout=5)
+
+    def tearDown(self):
+        self.sender.close()
+
+    getaddrinfo = staticmethod(socket.getaddrinfo)
+
+    @staticmethod
+    def resolve(host, *args, **kwargs):
+        """Stub of socket.getaddrinfo (IP addresses resolve to themselves)"""
+
+        hosts = {
+            "example.com": ["93.184.216.34"],
+            "db": ["172.18.0.2"],
+            "localhost": ["127.0.0.1", "::1"],
+            "mixed.example.com": ["93.184.216.34", "10.0.0.1"],
+        }
+        if host == "unknown.invalid":
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0)) for address in hosts.get(host, [host])]
+
+    @patch("core.webhooks.socket.getaddrinfo")
+    @patch("core.tasks.sample_task.apply_async")
+    def test_create_task_callback_url(self, _, mock_getaddrinfo):
+        """Tests that the callback URL option is stored on the task instead of passing it to Celery"""
+
+        mock_getaddrinfo.side_effect = self.resolve
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        data = {"name": "task", "options": {"callback_url": "https://example.com/hook"}, "params": {"param1": 1}}
+        response = client.post("/api/tasks/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = TaskMeta.objects.get(id=response.data["uuid"])
+        self.assertEqual(task.callback_url, "https://example.com/hook")
+        self.assertNotIn("callback_url", task.kwargs)
+
+        data["options"]["callback_url"] = "not url"
+        response = client.post("/api/tasks/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finish_enqueues_delivery(self):
+        """Tests that only terminal transitions of tasks with a callback URL enqueue deliveries"""
+
+        task = TaskMetaFactory(status=STATUS_IN_PROGRESS, callback_url="https://example.com/hook")
+        task.wait_for_retry(10)
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+        task.start()
+        task.finish(STATUS_COMPLETED)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.url, task.callback_url)
+        self.assertDictEqual(
+            delivery.payload,
+            {
+                "event": "task.finished",
+                "task": {
+                    "uuid": str(task.id),
+                    "name": task.name,
+                    "status": STATUS_COMPLETED,
+                    "finished_at": task.finished_at.isoformat(),
+                    "result": task.result,
+                },
+            },
+        )
+
+        TaskMetaFactory(status=STATUS_IN_PROGRESS).finish(STATUS_FAILED)
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+
+    def test_send_batch(self):
+        """Tests that webhooks are signed, delivered concurrently and deleted once accepted"""
+
+        with WebhookReceiver() as receiver:
+            for _ in range(5):
+                TaskMetaFactory(status=STATUS_PENDING, callback_url=receiver.url).finish(STATUS_CANCELED)
+            self.assertEqual(self.sender.send_batch(), 5)
+
+        self.assertFalse(WebhookDelivery.objects.exists())
+        self.assertEqual(len(receiver.requests), 5)
+        self.assertTrue(all(request["signature_valid"] for request in receiver.requests))
+        self.assertSetEqual({request["payload"]["task"]["status"] for request in receiver.requests}, {STATUS_CANCELED})
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_RETRY_DELAY=10)
+    def test_send_batch_retries(self):
+        """Tests that failed deliveries are retried with backoff and given up after the maximum attempts"""
+
+        with WebhookReceiver(statuses=[500]) as receiver:
+            task = TaskMetaFactory(status=STATUS_PENDING, callback_url=receiver.url)
+            task.finish(STATUS_CANCELED)
+            self.assertEqual(self.sender.send_batch(), 1)
+
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual(delivery.attempts, 1)
+            self.assertEqual(delivery.last_error, "HTTP 500")
+            self.assertIsNone(delivery.failed_at)
+            self.assertLessEqual(delivery.next_attempt_at, now() + timezone.timedelta(seconds=10))
+            self.assertEqual(self.sender.send_batch(), 0)
+
+            WebhookDelivery.objects.update(next_attempt_at=now())
+            self.assertEqual(self.sender.send_batch(), 1)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.attempts, 2)
+        self.assertIsNotNone(delivery.failed_at)
+        self.assertEqual(self.sender.send_batch(), 0)
+        self.assertEqual(len(receiver.requests), 2)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    @patch("core.webhooks.socket.getaddrinfo")
+    def test_unsafe_callback_urls(self, mock_getaddrinfo):
+        """Tests that only http(s) URLs of the hosts resolving to public addresses are accepted"""
+
+        mock_getaddrinfo.side_effect = self.resolve
+        for url in ("https://example.com/hook", "http://93.184.216.34:8080/hook"):
+            with self.subTest(url=url):
+                self.assertTrue(TaskOptionsSerializer(data={"callback_url": url}).is_valid())
+
+        for url in (
+            "ftp://example.com/hook",
+            "file:///etc/passwd",
+            "http://127.0.0.1/hook",
+            "http://localhost:8000/hook",
+            "http://db:5432/",
+            "http://10.0.0.5/hook",
+            "http://192.168.1.1/hook",
+            "http://100.64.0.1/hook",
+            "http://169.254.169.254/latest/meta-data/",
+            "http://0.0.0.0/hook",
+            "http://240.0.0.1/hook",
+            "http://224.0.0.1/hook",
+            "http://[::1]/hook",
+            "http://[::ffff:127.0.0.1]/hook",
+            "http://[fe80::1]/hook",
+            "http://mixed.example.com/hook",
+            "http://unknown.invalid/hook",
+        ):
+            with self.subTest(url=url):
+                with self.assertRaises(UnsafeURLException):
+                    resolve_callback_url(url)
+                serializer = TaskOptionsSerializer(data={"callback_url": url})
+                self.assertFalse(serializer.is_valid())
+                self.assertIn("callback_url", serializer.errors)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    def test_send_to_private_address(self):
+        """Tests that the webhook isn't sent if the host resolves to a private address at the time of the delivery"""
+
+        with WebhookReceiver() as receiver:
+            TaskMetaFactory(status=STATUS_PENDING, callback_url=receiver.url).finish(STATUS_CANCELED)
+            self.assertEqual(self.sender.send_batch(), 1)
+
+        self.assertEqual(receiver.requests, [])
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.last_error, "Host 127.0.0.1 resolves to a non-public address.")
+
+    @patch("core.webhooks.socket.getaddrinfo")
+    def test_send_to_checked_address(self, mock_getaddrinfo):
+        """Tests that the webhook is sent to the checked address of the host (it isn't resolved again)"""
+
+        mock_getaddrinfo.side_effect = lambda host, *args, **kwargs: self.getaddrinfo(
+            "127.0.0.1" if host == "hooks.example.com" else host, *args, **kwargs
+        )
+        with WebhookReceiver() as receiver:
+            url = receiver.url.replace("127.0.0.1", "hooks.example.com")
+            TaskMetaFactory(status=STATUS_PENDING, callback_url=url).finish(STATUS_CANCELED)
+            self.assertEqual(self.sender.send_batch(), 1)
+
+        # the connection is opened to the IP address
+        self.assertEqual([call.args[0] for call in mock_getaddrinfo.call_args_list], ["hooks.example.com", "127.0.0.1"])
+        [request] = receiver.requests
+        self.assertEqual(request["headers"]["Host"], f"hooks.example.com:{receiver.server.server_address[1]}")
+        self.assertTrue(request["signature_valid"])
+
+    @override_settings(WEBHOOK_SECRET="")
+    def test_sender_without_secret(self):
+        """Tests that webhooks aren't sent without a dedicated secret"""
+
+        with self.assertRaises(ImproperlyConfigured):
+            WebhookSender()
+        with self.assertRaisesMessage(CommandError, "WEBHOOK_SECRET must be set"):
+            call_command("send_webhooks", once=True)
+
+    @override_settings(WEBHOOK_DNS_TIMEOUT=2)
+    @freeze_time("2023-04-26 18:17:16")
+    def test_claim_batch_lease(self):
+        """Tests that the claimed deliveries are postponed until the whole batch can be sent"""
+
+        for _ in range(5):
+            TaskMetaFactory(status=STATUS_PENDING, callback_url="https://example.com/hook").finish(STATUS_CANCELED)
+
+        self.assertEqual(len(self.sender.claim_batch(10)), 5)
+        # 2 rounds of 4 concurrent deliveries taking up to 2 + 5 seconds and the 5 seconds margin
+        self.assertSetEqual(
+            set(WebhookDelivery.objects.values_list("next_attempt_at", flat=True)),
+            {now() + timezone.timedelta(seconds=19)},
+        )
+        self.assertListEqual(self.sender.claim_batch(10), [])
+
+    @override_settings(WEBHOOK_DNS_TIMEOUT=0.1)
+    @patch("core.webhooks.socket.getaddrinfo")
+    def test_resolve_timeout(self, mock_getaddrinfo):
+        """Tests that a host whose resolution doesn't finish within the DNS timeout is rejected"""
+
+        resolved = threading.Event()
+        mock_getaddrinfo.side_effect = lambda *args, **kwargs: resolved.wait(5) and []
+        with self.assertRaisesMessage(UnsafeURLException, "Host example.com can't be resolved."):
+            resolve_callback_url("https://example.com/hook")
+        resolved.set()
+
+    def test_send_batch_connection_error(self):
+        """Tests that unreachable receivers are recorded as failed attempts"""
+
+        with WebhookReceiver() as receiver:
+            url = receiver.url
+        TaskMetaFactory(status=STATUS_PENDING, callback_url=url).finish(STATUS_CANCELED)
+
+        self.assertEqual(self.sender.send_batch(), 1)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.attempts, 1)
+        self.assertIn("Error", delivery.last_error)
+
+
+class WorkerStartupTest(TestCase):
+    """Test cases for the lean settings profile of Celery workers"""
+
+    def test_worker_startup(self):
+        """Tests that workers load the tasks without the web modules (fails if the worker startup regresses)"""
+
+        stdout = io.StringIO()
+        call_command("benchmark_worker_startup", repeat=1, stdout=stdout)
+        self.assertIn("Worker startup takes", stdout.getvalue())
+
+
+class OpenAPISchemaTest(APITestCase):
+    """Test cases for the precomputed OpenAPI schema"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.schema_file = os.path.join(tempfile.mkdtemp(), "openapi.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.schema_file))
+        get_schema.cache_clear()
+        get_rendered_schema.cache_clear()
+        self.addCleanup(get_schema.cache_clear)
+        self.addCleanup(get_rendered_schema.cache_clear)
+
+    def test_schema_generated_once(self):
+        """Tests that the schema is generated on the first request only and served with ETag"""
+
+        with override_settings(OPENAPI_SCHEMA_FILE=self.schema_file), patch(
+            "core.schema.generate_schema", wraps=generate_schema
+        ) as mock_generate_schema:
+            response = self.client.get("/swagger/", {"format": "openapi"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("/api/tasks/", json.loads(response.content)["paths"])
+            etag = response["ETag"]
+
+            response = self.client.get("/swagger/", {"format": "openapi"}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.client.get("/swagger/", {"format": ".yaml"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+            response = self.client.get("/swagger/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        mock_generate_schema.assert_called_once()
+
+    def test_schema_file(self):
+        """Tests that the precomputed schema file is used only while the code is not changed"""
+
+        with override_settings(OPENAPI_SCHEMA_FILE=self.schema_file):
+            call_command("generate_openapi_schema", stdout=io.StringIO())
+            with patch("core.schema.generate_schema") as mock_generate_schema:
+                response = self.client.get("/swagger/", {"format": "openapi"})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                mock_generate_schema.assert_not_called()
+
+            get_schema.cache_clear()
+            get_rendered_schema.cache_clear()
+            with patch("core.schema.get_code_fingerprint", return_value="changed"), patch(
+                "core.schema.generate_schema", return_value=b"{}"
+            ) as mock_generate_schema:
+                response = self.client.get("/swagger/", {"format": "openapi"})
+                self.assertEqual(response.content, b"{}")
+                mock_generate_schema.assert_called_once()
+
+    def test_code_fingerprint(self):
+        """Tests that only the API sources are hashed unless the code version is set"""
+
+        get_code_fingerprint.cache_clear()
+        self.addCleanup(get_code_fingerprint.cache_clear)
+        paths = [str(path.relative_to(settings.BASE_DIR)) for path in get_source_files()]
+        self.assertIn(os.path.join("core", "serializers.py"), paths)
+        self.assertIn(os.path.join("task_management", "urls.py"), paths)
+        self.assertFalse(any(part in path for path in paths for part in ("tests", "migrations", "venv")))
+
+        with override_settings(OPENAPI_SCHEMA_VERSION="abc123"), patch("core.schema.get_source_files") as mock_files:
+            fingerprint = get_code_fingerprint()
+            get_code_fingerprint.cache_clear()
+            with override_settings(OPENAPI_SCHEMA_VERSION="def456"):
+                self.assertNotEqual(get_code_fingerprint(), fingerprint)
+        mock_files.assert_not_called()
+
+    def test_schema_unauthenticated(self):
+        """Tests that the schema is served to authenticated users only"""
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get("/swagger/", {"format": "openapi"})
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+@patch("core.tasks.sample_task.apply_async")
+class TaskDedupTest(APITestCase):
+    """Test cases for the in-flight task deduplication"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.data = {"name": "task", "options": {"dedup": True}, "params": {"param1": 10, "param2": "a"}}
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_dedup(self, mock_task_apply_async):
+        """Tests that identical in-flight submissions are attached to the existing task"""
+
+        response = self.client.post("/api/tasks/", self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = TaskMeta.objects.get(id=response.data["uuid"])
+        self.assertNotIn("dedup", task.kwargs)
+
+        data = {**self.data, "params": {"param2": "a", "param1": 10}}
+        response = self.client.post("/api/tasks/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["uuid"], str(task.id))
+        mock_task_apply_async.assert_called_once()
+
+        for other_data in (
+            {**self.data, "params": {"param1": 11, "param2": "a"}},
+            {**self.data, "name": "other task"},
+            {**self.data, "options": {}},
+        ):
+            with self.subTest(data=other_data):
+                response = self.client.post("/api/tasks/", other_data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=UserFactory())
+        response = self.client.post("/api/tasks/", self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_dedup_finished_task(self, mock_task_apply_async):
+        """Tests that finished tasks are not reused"""
+
+        response = self.client.post("/api/tasks/", self.data, format="json")
+        task = TaskMeta.objects.get(id=response.data["uuid"])
+        task.status = STATUS_COMPLETED
+        task.save()
+
+        response = self.client.post("/api/tasks/", self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response.data["uuid"], str(task.id))
+
+
+@patch("core.tasks.sample_task.apply_async")
+class TaskDedupConcurrencyTest(TransactionTestCase):
+    """Test cases for the in-flight task deduplication under concurrent submissions"""
+
+    def test_concurrent_submissions(self, mock_task_apply_async):
+        """Tests that concurrent identical submissions create a single task"""
+
+        user = UserFactory()
+        data = {"name": "task", "options": {"dedup": True}, "params": {"param1": 10}}
+        barrier = threading.Barrier(5)
+        responses = []
+
+        def submit():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                responses.append(client.post("/api/tasks/", data, format="json"))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(TaskMeta.objects.count(), 1)
+        task = TaskMeta.objects.get()
+        self.assertEqual(sorted(response.status_code for response in responses), [200] * 4 + [201])
+        self.assertSetEqual({response.data["uuid"] for response in responses}, {str(task.id)})
+        mock_task_apply_async.assert_called_once()
+
+
+class ResultCacheTest(TestCase):
+    """Test cases for the memoized task results"""
+
+    def setUp(self):
+        self.task_meta = TaskMetaFactory(status=STATUS_PENDING, user=UserFactory())
+        self.sample_task = BaseSampleTask()
+        self.sample_task.name = "core.tasks.sample_task"
+        self.sample_task.task_id = self.task_meta.id
+        self.sample_task.memoize = True
+        self.request_kwargs = {"param1": 1, "param2": "a", "memoize": True, "max_retries": 2}
+
+    @staticmethod
+    def get_requests_count(result: str) -> float:
+        return REGISTRY.get_sample_value("task_management_result_cache_requests_total", {"result": result}) or 0
+
+    def test_result_cache_key(self):
+        """Tests that the key depends on the task type and parameters only"""
+
+        with patch.object(BaseSampleTask, "request", new_callable=PropertyMock) as request_mock:
+            request_mock.return_value.kwargs = self.request_kwargs
+            key = self.sample_task._get_result_cache_key()
+            request_mock.return_value.kwargs = {"param2": "a", "param1": 1, "countdown": 5}
+            self.assertEqual(self.sample_task._get_result_cache_key(), key)
+            request_mock.return_value.kwargs = {"param1": 2, "param2": "a"}
+            self.assertNotEqual(self.sample_task._get_result_cache_key(), key)
+
+        self.assertNotEqual(get_result_cache_key("other_task", {"param1": 1, "param2": "a"}), key)
+
+    @patch("core.tasks.cache_result")
+    @patch("core.tasks.get_cached_result", return_value="cached result")
+    @patch.object(BaseSampleTask, "request", new_callable=PropertyMock)
+    def test_cache_hit(self, request_mock, get_cached_result_mock, cache_result_mock):
+        """Tests that the task is completed with the cached result without performing it"""
+
+        request_mock.return_value.kwargs = self.request_kwargs
+        perform_mock = MagicMock()
+
+        self.assertEqual(self.sample_task._perform_memoized(perform_mock, 1, "a"), "cached result")
+
+        perform_mock.assert_not_called()
+        cache_result_mock.assert_not_called()
+        self.task_meta.refresh_from_db()
+        self.assertEqual((self.task_meta.status, self.task_meta.result), (STATUS_COMPLETED, "cached result"))
+
+    @patch("core.tasks.cache_result")
+    @patch("core.tasks.get_cached_result", return_value=None)
+    @patch.object(BaseSampleTask, "request", new_callable=PropertyMock)
+    def test_cache_miss(self, request_mock, get_cached_result_mock, cache_result_mock):
+        """Tests that the result is cached after performing the task"""
+
+        request_mock.return_value.kwargs = self.request_kwargs
+        perform_mock = MagicMock(return_value="result")
+
+        self.assertEqual(self.sample_task._perform_memoized(perform_mock, 1, "a"), "result")
+
+        perform_mock.assert_called_once_with(1, "a")
+        cache_result_mock.assert_called_once_with(get_cached_result_mock.call_args.args[0], "result")
+
+        self.sample_task.memoize = False
+        get_cached_result_mock.reset_mock()
+        self.sample_task._perform_memoized(perform_mock, 1, "a")
+        get_cached_result_mock.assert_not_called()
+
+    @override_settings(RESULT_CACHE_TTL=60)
+    @freeze_time("2023-04-26 18:17:16")
+    @patch("core.result_cache.get_redis")
+    def test_get_cached_result(self, get_redis_mock):
+        """Tests the lookups (only hits extend the expiration in the LRU index) and the hit/miss metrics"""
+
+        redis_mock = get_redis_mock.return_value
+        hits, misses = self.get_requests_count("hit"), self.get_requests_count("miss")
+
+        redis_mock.getex.return_value = b"result"
+        self.assertEqual(get_cached_result("key"), "result")
+        redis_mock.getex.assert_called_once_with("result_cache:key", ex=60)
+        redis_mock.zadd.assert_called_once_with("result_cache_lru", {"key": timezone.now().timestamp() + 60})
+
+        redis_mock.reset_mock()
+        redis_mock.getex.return_value = None
+        self.assertIsNone(get_cached_result("key"))
+        redis_mock.zadd.assert_not_called()
+        redis_mock.getex.side_effect = RedisError
+        self.assertIsNone(get_cached_result("key"))
+
+        self.assertEqual(self.get_requests_count("hit"), hits + 1)
+        self.assertEqual(self.get_requests_count("miss"), misses + 2)
+
+    @override_settings(RESULT_CACHE_TTL=60, RESULT_CACHE_MAX_SIZE=2)
+    @freeze_time("2023-04-26 18:17:16")
+    @patch("core.result_cache.get_redis")
+    def test_cache_result_eviction(self, get_redis_mock):
+        """Tests that the expired results are pruned and the least recently used ones over the maximum size evicted"""
+
+        redis_mock = get_redis_mock.return_value
+        pipeline_mock = redis_mock.pipeline.return_value
+        for method in ("set", "zremrangebyscore", "zadd", "zcard"):
+            getattr(pipeline_mock, method).return_value = pipeline_mock
+        pipeline_mock.execute.return_value = [True, 1, 1, 3]
+        redis_mock.zpopmin.return_value = [(b"old", 1.0)]
+        timestamp = timezone.now().timestamp()
+
+        cache_result("key", "result")
+
+        pipeline_mock.set.assert_called_once_with("result_cache:key", "result", ex=60)
+        pipeline_mock.zremrangebyscore.assert_called_once_with("result_cache_lru", "-inf", timestamp)
+        pipeline_mock.zadd.assert_called_once_with("result_cache_lru", {"key": timestamp + 60})
+        redis_mock.zpopmin.assert_called_once_with("result_cache_lru", 1)
+        redis_mock.delete.assert_called_once_with("result_cache:old")
+
+        redis_mock.reset_mock()
+        pipeline_mock.execute.return_value = [True, 0, 1, 2]
+        cache_result("key", "result")
+        redis_mock.zpopmin.assert_not_called()
+
+
+class TimeLimitTest(TestCase):
+    """Test cases for the per-task soft and hard time limits"""
+
+    def setUp(self):
+        self.task_meta = TaskMetaFactory(status=STATUS_IN_PROGRESS, user=UserFactory())
+
+    @override_settings(TASK_MAX_SOFT_TIME_LIMIT=60, TASK_MAX_TIME_LIMIT=90)
+    def test_options_time_limits(self):
+        """Tests the server-side maximums and defaults of the time limits"""
+
+        serializer = TaskOptionsSerializer(data={})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            (serializer.validated_data["soft_time_limit"], serializer.validated_data["time_limit"]), (60, 90)
+        )
+
+        serializer = TaskOptionsSerializer(data={"time_limit": 30})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["soft_time_limit"], 30)
+
+        for options, field in (
+            ({"soft_time_limit": 61}, "soft_time_limit"),
+            ({"time_limit": 91}, "time_limit"),
+            ({"time_limit": 0}, "time_limit"),
+            ({"soft_time_limit": 20, "time_limit": 10}, "soft_time_limit"),
+        ):
+            with self.subTest(options=options):
+                serializer = TaskOptionsSerializer(data=options)
+                self.assertFalse(serializer.is_valid())
+                self.assertIn(field, serializer.errors)
+
+    @override_settings(TASK_MAX_SOFT_TIME_LIMIT=60, TASK_MAX_TIME_LIMIT=90, TASK_BATCH_MAX_RUN_TIME=5)
+    def test_batch_options_time_limits(self):
+        """Tests that only short tasks are accepted in the batch mode"""
+
+        serializer = TaskOptionsSerializer(data={"batch": True})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["soft_time_limit"], 5)
+        self.assertTrue(TaskOptionsSerializer(data={"batch": True, "soft_time_limit": 5}).is_valid())
+
+        serializer = TaskOptionsSerializer(data={"batch": True, "soft_time_limit": 6})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors["soft_time_limit"], ["Ensure this value is less than or equal to 5 for batched tasks."]
+        )
+
+    @patch("core.tasks.sample_task._perform_task", side_effect=SoftTimeLimitExceeded)
+    def test_soft_time_limit_failure(self, mock_perform_task):
+        """Tests that the exceeded soft time limit is recorded as an error of the failed task"""
+
+        sample_task.apply(
+            args=(1, "a"), kwargs={"soft_time_limit": 5, "time_limit": 10}, task_id=str(self.task_meta.id)
+        )
+
+        self.task_meta.refresh_from_db()
+        self.assertEqual(self.task_meta.status, STATUS_FAILED)
+        self.assertEqual(
+            list(self.task_meta.errors.values_list("message", flat=True)), ["Soft time limit (5s) exceeded."]
+        )
+
+    def test_cooperative_time_limit(self):
+        """Tests that the default task (run by the threads pool, which doesn't interrupt it) fails on its deadline"""
+
+        task = TaskMetaFactory(user=self.task_meta.user)
+        clock = [0.0]
+
+        with patch("core.tasks.time") as mock_time:
+            mock_time.monotonic.side_effect = lambda: clock[0]
+            mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+            sample_task.apply(
+                kwargs={"param1": 86400, "param2": "a", "soft_time_limit": 5, "time_limit": 10}, task_id=str(task.id)
+            )
+
+        task.refresh_from_db()
+        self.assertEqual(task_registry.get_by_task_name(sample_task.name).execution, EXECUTION_THREADS)
+        self.assertEqual(mock_time.sleep.call_count, 5)
+        self.assertEqual(task.status, STATUS_FAILED)
+        self.assertEqual(list(task.errors.values_list("message", flat=True)), ["Soft time limit (5s) exceeded."])
+
+    @patch("core.tasks.sample_task._handle_retry")
+    @patch("core.tasks.sample_task._perform_task", side_effect=SoftTimeLimitExceeded)
+    def test_soft_time_limit_retry(self, mock_perform_task, mock_handle_retry):
+        """Tests that the task exceeding the soft time limit is retried while it has retries left"""
+
+        sample_task.apply(
+            args=(1, "a"), kwargs={"max_retries": 1, "soft_time_limit": 5}, task_id=str(self.task_meta.id)
+        )
+
+        mock_handle_retry.assert_called_once_with("Soft time limit (5s) exceeded.")
+
+    @patch("core.tasks.clear_progress")
+    @patch("core.tasks.heartbeat_monitor")
+    def test_hard_time_limit(self, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the killed task is failed and its heartbeat and progress are removed"""
+
+        request = TimeLimitRequest.__new__(TimeLimitRequest)
+        with patch("celery.worker.request.Request.on_timeout") as mock_on_timeout, patch.multiple(
+            TimeLimitRequest, task_name=sample_task.name, id=str(self.task_meta.id)
+        ):
+            request.on_timeout(True, 5)
+            self.task_meta.refresh_from_db()
+            self.assertEqual(self.task_meta.status, STATUS_IN_PROGRESS)
+
+            request.on_timeout(False, 10)
+            self.assertEqual(mock_on_timeout.call_count, 2)
+
+        self.task_meta.refresh_from_db()
+        self.assertEqual(self.task_meta.status, STATUS_FAILED)
+        self.assertEqual(
+            list(self.task_meta.errors.values_list("message", flat=True)), ["Hard time limit (10s) exceeded."]
+        )
+        mock_heartbeat_monitor.stop.assert_called_once_with(sample_task.name, str(self.task_meta.id))
+        mock_clear_progress.assert_called_once_with(str(self.task_meta.id))
+
+    @patch("core.scheduler.current_app")
+    def test_time_limits_published(self, mock_current_app):
+        """Tests that the time limits of the task are sent with the released task message"""
+
+        kwargs = {"param1": 1, "soft_time_limit": 5, "time_limit": 10}
+        ScheduledTask.objects.create(task=self.task_meta, name=sample_task.name, kwargs=kwargs, due_at=now())
+
+        release_due_tasks()
+
+        mock_current_app.send_task.assert_called_once_with(
+            sample_task.name, kwargs=kwargs, task_id=str(self.task_meta.id), retries=0, soft_time_limit=5, time_limit=10
+        )
+
+
+@patch("core.tasks.clear_progress")
+@patch("core.tasks.heartbeat_monitor")
+class TaskBatchTest(TestCase):
+    """Test cases for the batched execution mode"""
+
+    def setUp(self):
+        self.user = UserFactory()
+
+    def create_tasks(self, count: int, **kwargs) -> list:
+        return [
+            TaskMetaFactory(user=self.user, status=STATUS_PENDING, kwargs={"param1": 0, "param2": "a", **kwargs})
+            for _ in range(count)
+        ]
+
+    @staticmethod
+    def get_items(tasks) -> list:
+        return [(task.id, [], task.kwargs, 0) for task in tasks]
+
+    def test_route_task(self, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that only sample tasks submitted with the batch option are routed to the batch queue"""
+
+        self.assertEqual(route_task(sample_task.name, [], {"batch": True}, {}), {"queue": settings.TASK_BATCH_QUEUE})
+        self.assertIsNone(route_task(sample_task.name, [], {"batch": False}, {}))
+        self.assertIsNone(route_task("core.tasks.reap_stalled_tasks", [], {"batch": True}, {}))
+
+    @patch("core.tasks.schedule_task")
+    def test_run_batch(self, mock_schedule_task, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the tasks keep per-task retries, errors and cancellation"""
+
+        completed_task = TaskMetaFactory(
+            user=self.user, kwargs={"param1": 0, "param2": "a"}, callback_url="https://example.com/hook"
+        )
+        retried_task = TaskMetaFactory(
+            user=self.user, kwargs={"param1": 0, "param2": "raise exception before", "max_retries": 1}
+        )
+        failed_task = TaskMetaFactory(user=self.user, kwargs={"param1": 0, "param2": "raise exception after"})
+        canceled_task = TaskMetaFactory(user=self.user, status=STATUS_CANCELED)
+        tasks = (completed_task, retried_task, failed_task, canceled_task)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_task_batches.run_batch(self.get_items(tasks)), 3)
+
+        for task, expected_status in zip(
+            tasks, (STATUS_COMPLETED, STATUS_RETRY_PENDING, STATUS_FAILED, STATUS_CANCELED)
+        ):
+            task.refresh_from_db()
+            self.assertEqual(task.status, expected_status)
+        self.assertEqual(
+            list(TaskError.objects.values_list("task_id", "message")),
+            [(retried_task.id, "Manual exception before execution.")],
+        )
+        self.assertEqual(list(WebhookDelivery.objects.values_list("task_id", flat=True)), [completed_task.id])
+        mock_schedule_task.assert_called_once_with(
+            sample_task,
+            str(retried_task.id),
+            {**retried_task.kwargs, "retry_delay": 60},
+            60,
+            1,
+        )
+        task_ids = [str(task.id) for task in tasks[:3]]
+        mock_heartbeat_monitor.start.assert_called_once_with(sample_task.name, *task_ids)
+        mock_heartbeat_monitor.stop.assert_called_once_with(sample_task.name, *task_ids)
+        mock_clear_progress.assert_called_once_with(*task_ids)
+
+    @patch("core.tasks.time.sleep")
+    @patch("core.tasks.schedule_task")
+    def test_run_batch_time_limits(self, mock_schedule_task, mock_sleep, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that every task of the batch is stopped at its own soft time limit"""
+
+        retried_task = self.create_tasks(1, param1=2, soft_time_limit=0, max_retries=1)[0]
+        failed_task = self.create_tasks(1, param1=2, soft_time_limit=0)[0]
+        completed_task = self.create_tasks(1, param1=2)[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_task_batches.run_batch(self.get_items([retried_task, failed_task, completed_task]))
+
+        for task, expected_status in (
+            (retried_task, STATUS_RETRY_PENDING),
+            (failed_task, STATUS_FAILED),
+            (completed_task, STATUS_COMPLETED),
+        ):
+            task.refresh_from_db()
+            self.assertEqual(task.status, expected_status)
+        self.assertEqual(
+            list(TaskError.objects.order_by("task_id").values_list("task_id", "message")),
+            sorted(
+                [
+                    (retried_task.id, "Soft time limit (0s) exceeded."),
+                    (failed_task.id, "Soft time limit (0s) exceeded."),
+                ]
+            ),
+        )
+        self.assertEqual(mock_schedule_task.call_args.args[1], str(retried_task.id))
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch("core.tasks.time.sleep", side_effect=SoftTimeLimitExceeded)
+    def test_run_batch_interrupted(self, mock_sleep, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the tasks left unfinished by the soft time limit of the whole batch are failed"""
+
+        completed_task = self.create_tasks(1)[0]
+        # the limit of the batch fires while the task sleeps within its own limit
+        interrupted_task, skipped_task = self.create_tasks(2, param1=1)
+
+        self.assertEqual(
+            run_task_batches.run_batch(self.get_items([completed_task, interrupted_task, skipped_task])), 3
+        )
+
+        for task, expected_status in (
+            (completed_task, STATUS_COMPLETED),
+            (interrupted_task, STATUS_FAILED),
+            (skipped_task, STATUS_FAILED),
+        ):
+            task.refresh_from_db()
+            self.assertEqual(task.status, expected_status)
+        self.assertCountEqual(
+            TaskError.objects.values_list("task_id", "message"),
+            [
+                (task.id, "Execution of the batch has been interrupted: SoftTimeLimitExceeded()")
+                for task in (interrupted_task, skipped_task)
+            ],
+        )
+        mock_sleep.assert_called_once()
+        task_ids = [str(task.id) for task in (completed_task, interrupted_task, skipped_task)]
+        mock_heartbeat_monitor.stop.assert_called_once_with(sample_task.name, *task_ids)
+        mock_heartbeat_monitor.abandon.assert_not_called()
+
+    @patch("core.tasks.BatchSampleTask._finish_batch", side_effect=DatabaseError)
+    def test_run_batch_not_saved(self, mock_finish_batch, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the heartbeats of the tasks are left to expire if the batch can't be saved"""
+
+        tasks = self.create_tasks(2)
+
+        with self.assertRaises(DatabaseError):
+            run_task_batches.run_batch(self.get_items(tasks))
+
+        self.assertEqual(mock_finish_batch.call_count, 2)
+        task_ids = [str(task.id) for task in tasks]
+        mock_heartbeat_monitor.abandon.assert_called_once_with(sample_task.name, *task_ids)
+        mock_heartbeat_monitor.stop.assert_not_called()
+        self.assertEqual(TaskMeta.objects.filter(id__in=task_ids, status=STATUS_IN_PROGRESS).count(), 2)
+
+    def test_run_batch_queries(self, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the number of queries doesn't depend on the batch size"""
+
+        queries = []
+        for count in (2, 10):
+            tasks = self.create_tasks(count)
+            with CaptureQueriesContext(connection) as context:
+                run_task_batches.run_batch(self.get_items(tasks))
+            queries.append(len(context.captured_queries))
+            self.assertEqual(
+                TaskMeta.objects.filter(id__in=[task.id for task in tasks], status=STATUS_COMPLETED).count(), count
+            )
+
+        self.assertEqual(queries[0], queries[1])
+
+    def test_run_batch_canceled_while_running(self, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the task canceled during the batch execution keeps the CANCELED status"""
+
+        task = self.create_tasks(1)[0]
+
+        def cancel(param1, param2):
+            TaskMeta.objects.filter(id=task.id).update(status=STATUS_CANCELED)
+
+        with patch.object(run_task_batches, "_execute", side_effect=cancel):
+            run_task_batches.run_batch(self.get_items([task]))
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_CANCELED)
+
+    def test_run_messages(self, mock_heartbeat_monitor, mock_clear_progress):
+        """Tests that the due messages of the batch queue are executed and acknowledged and ETA ones sent back"""
+
+        due_tasks = self.create_tasks(3, batch=True)
+        retried_task = self.create_tasks(1, batch=True)[0]
+        other_task = self.create_tasks(1)[0]
+
+        with Connection("memory://") as broker_connection:
+            for task in due_tasks + [other_task]:
+                sample_task.apply_async(
+                    kwargs=task.kwargs, task_id=str(task.id), connection=broker_connection, ignore_result=True
+                )
+            sample_task.apply_async(
+                kwargs=retried_task.kwargs,
+                task_id=str(retried_task.id),
+                countdown=60,
+                retries=1,
+                connection=broker_connection,
+                ignore_result=True,
+            )
+
+            task_messages = pull_task_messages(broker_connection, 10)
+            self.assertEqual(len(task_messages), 4)
+            with patch.object(run_task_batches.app, "send_task") as mock_send_task:
+                run_task_batches.run_messages(task_messages)
+            self.assertEqual(pull_task_messages(broker_connection, 10), [])
+
+        for task in due_tasks:
+            task.refresh_from_db()
+            self.assertEqual(task.status, STATUS_COMPLETED)
+        for task in (retried_task, other_task):
+            task.refresh_from_db()
+            self.assertEqual(task.status, STATUS_PENDING)
+        mock_send_task.assert_called_once()
+        self.assertEqual(mock_send_task.call_args.kwargs["task_id"], str(retried_task.id))
+        self.assertEqual(mock_send_task.call_args.kwargs["retries"], 1)
+        self.assertEqual(mock_send_task.call_args.kwargs["queue"], EXECUTION_THREADS)
+
+
+class TaskTypeRegistryTest(APITestCase):
+    """Test cases for the task type registry"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+
+    @patch("core.tasks.checksum_task.apply_async")
+    def test_create_task_of_type(self, mock_apply_async):
+        """Tests that the parameters are validated by the serializer of the type and the type's task is published"""
+
+        data = {"name": "checksum", "type": "checksum", "options": {}, "params": {"data": "abc", "rounds": 3}}
+        response = self.client.post("/api/tasks/", data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["type"], "checksum")
+        task = TaskMeta.objects.get(id=response.data["uuid"])
+        self.assertEqual(task.type, "checksum")
+        mock_apply_async.assert_called_once()
+        self.assertEqual(mock_apply_async.call_args.kwargs["task_id"], str(task.id))
+        self.assertEqual(mock_apply_async.call_args.kwargs["kwargs"]["rounds"], 3)
+
+    def test_create_task_validation(self):
+        """Tests that unknown types and parameters not matching the type are rejected"""
+
+        for data, field in (
+            ({"name": "task", "type": "unknown", "options": {}, "params": {"param1": 1}}, "type"),
+            ({"name": "task", "type": "checksum", "options": {}, "params": {"param1": 1}}, "params"),
+            ({"name": "task", "type": "checksum", "options": {}, "params": {"data": "abc", "rounds": 0}}, "params"),
+        ):
+            with self.subTest(data=data):
+                response = self.client.post("/api/tasks/", data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(field, response.data)
+        self.assertFalse(TaskMeta.objects.exists())
+
+    def test_route_task(self):
+        """Tests that the tasks are routed to the queue of their execution style (batch option takes precedence)"""
+
+        self.assertEqual(route_task_type(sample_task.name, [], {}, {}), {"queue": EXECUTION_THREADS})
+        self.assertEqual(route_task_type(checksum_task.name, [], {}, {}), {"queue": EXECUTION_PROCESSES})
+        self.assertIsNone(route_task_type("core.tasks.reap_stalled_tasks", [], {}, {}))
+
+        router = sample_task.app.amqp.router
+        self.assertEqual(router.route({}, checksum_task.name, (), {})["queue"].name, EXECUTION_PROCESSES)
+        self.assertEqual(router.route({}, sample_task.name, (), {})["queue"].name, EXECUTION_THREADS)
+        self.assertEqual(
+            router.route({}, sample_task.name, (), {"batch": True})["queue"].name, settings.TASK_BATCH_QUEUE
+        )
+
+    def test_register(self):
+        """Tests that task types are registered once with a known execution style"""
+
+        registry = TaskRegistry()
+        registry.register("inline", "core.serializers.TaskParametersSerializer", EXECUTION_INLINE)(sample_task)
+        self.assertEqual(registry.get("inline").queue, EXECUTION_INLINE)
+        self.assertEqual(registry.get_by_task_name(sample_task.name).name, "inline")
+        with self.assertRaises(ValueError):
+            registry.register("inline", "core.serializers.TaskParametersSerializer", EXECUTION_INLINE)(checksum_task)
+        with self.assertRaises(ValueError):
+            registry.register("other", "core.serializers.TaskParametersSerializer", "gevent")
+
+    @patch("core.tasks.store_progress")
+    def test_checksum_task(self, mock_store_progress):
+        """Tests that the checksum task completes with the iterated digest as the result"""
+
+        task = TaskMetaFactory(user=self.user, type="checksum", status=STATUS_PENDING)
+
+        checksum_task.apply(kwargs={"data": "abc", "rounds": 3}, task_id=str(task.id))
+
+        digest = b"abc"
+        for _ in range(3):
+            digest = hashlib.sha256(digest).digest()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.result), (STATUS_COMPLETED, digest.hex()))
+        mock_store_progress.assert_called_with(str(task.id), 100, "3 of 3 rounds")
+
+    def test_execution_attributes_per_thread(self):
+        """Tests that the configuration of an execution isn't visible to executions in other threads"""
+
+        sample_task.countdown, sample_task.task_id = 5, "main"
+        seen = []
+
+        def execute():
+            seen.append((sample_task.countdown, sample_task.task_id))
+            sample_task.countdown, sample_task.task_id = 10, "thread"
+
+        thread = threading.Thread(target=execute)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(seen, [(BaseSampleTask.countdown, None)])
+        self.assertEqual((sample_task.countdown, sample_task.task_id), (5, "main"))
+
+
+@override_settings(STATUS_WRITE_BEHIND=True)
+@patch("core.tasks.clear_progress")
+@patch("core.write_behind.get_redis")
+class StatusWriteBehindTest(TestCase):
+    """Test cases for the write-behind status updates"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.entries = []
+
+    def collect_entries(self, mock_get_redis):
+        """Makes the mocked stream collect the published transitions"""
+
+        def xadd(key, fields):
+            self.entries.append((f"{len(self.entries)}-0".encode(), {k.encode(): v for k, v in fields.items()}))
+            self.entries[-1][1][b"task"] = fields["task"].encode()
+
+        mock_get_redis.return_value.xadd.side_effect = xadd
+
+    def test_publish(self, mock_get_redis, mock_clear_progress):
+        """Tests that transitions are published instead of saved and saved directly without Redis"""
+
+        self.collect_entries(mock_get_redis)
+        task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+
+        task.start()
+        task.finish(STATUS_COMPLETED, "done")
+
+        self.assertEqual(len(self.entries), 2)
+        self.assertEqual(orjson.loads(self.entries[1][1][b"state"])["status"], STATUS_COMPLETED)
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_PENDING)
+
+        mock_get_redis.return_value.xadd.side_effect = RedisError
+        task.start()
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_IN_PROGRESS)
+
+    @patch("core.tasks.store_progress")
+    def test_progress(self, mock_store_progress, mock_get_redis, mock_clear_progress):
+        """Tests that the progress is published after the start, so the start transition doesn't reset it"""
+
+        self.collect_entries(mock_get_redis)
+        task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        task.start()
+        sample_task.task_id, sample_task.progress_flushed_at, sample_task.deadline = str(task.id), None, None
+
+        sample_task.set_progress(40, "half")
+
+        self.assertEqual(StatusFlusher().apply(self.entries), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.progress, task.progress_message), (STATUS_IN_PROGRESS, 40, "half"))
+
+    def test_apply(self, mock_get_redis, mock_clear_progress):
+        """Tests that transitions are replayed in order, skipping the ones not allowed from the current status"""
+
+        self.collect_entries(mock_get_redis)
+        completed_task = TaskMetaFactory(user=self.user, status=STATUS_PENDING, callback_url="https://example.com/h")
+        retried_task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        canceled_task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        for task in (completed_task, retried_task, canceled_task):
+            task.start()
+        completed_task.finish(STATUS_COMPLETED, "done")
+        retried_task.wait_for_retry(60)
+        retried_task.start()
+        canceled_task.finish(STATUS_COMPLETED)
+        TaskMeta.objects.filter(id=canceled_task.id).update(status=STATUS_CANCELED)
+
+        with CaptureQueriesContext(connection) as context, self.assertLogs("core.status_flusher", "WARNING"):
+            self.assertEqual(StatusFlusher().apply(self.entries), 2)
+
+        # lock, update and webhooks insert regardless of the number of transitions
+        queries = [query["sql"] for query in context.captured_queries if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(len(queries), 3)
+        for task, expected_status in (
+            (completed_task, STATUS_COMPLETED),
+            (retried_task, STATUS_IN_PROGRESS),
+            (canceled_task, STATUS_CANCELED),
+        ):
+            task.refresh_from_db()
+            self.assertEqual(task.status, expected_status)
+        self.assertEqual(completed_task.result, "done")
+        self.assertIsNotNone(completed_task.finished_at)
+        self.assertIsNone(retried_task.next_retry_at)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.task_id, delivery.payload["task"]["status"]), (completed_task.id, STATUS_COMPLETED))
+
+    @patch("core.status_flusher.get_redis")
+    def test_flush(self, mock_flusher_redis, mock_get_redis, mock_clear_progress):
+        """Tests that a batch is read until it's full, applied and removed from the stream"""
+
+        self.collect_entries(mock_get_redis)
+        task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        task.start()
+        task.finish(STATUS_COMPLETED)
+        redis = mock_flusher_redis.return_value
+        redis.xautoclaim.return_value = [b"0-0", self.entries[:1], []]
+        redis.xreadgroup.return_value = [[STATUS_STREAM_KEY.encode(), self.entries[1:]]]
+
+        self.assertEqual(StatusFlusher().flush(batch_size=2, max_staleness=1), 2)
+
+        redis.xreadgroup.assert_called_once()
+        self.assertEqual(redis.xreadgroup.call_args.kwargs["count"], 1)
+        redis.pipeline.return_value.xack.assert_called_once_with(STATUS_STREAM_KEY, STATUS_STREAM_GROUP, b"0-0", b"1-0")
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_COMPLETED)
+
+    def test_task_execution(self, mock_get_redis, mock_clear_progress):
+        """Tests that the task keeps its own transitions while the database lags behind"""
+
+        self.collect_entries(mock_get_redis)
+        task = TaskMetaFactory(user=self.user, status=STATUS_PENDING, kwargs={"param1": 0, "param2": "a"})
+
+        with patch("core.tasks.TaskMeta.objects.get", wraps=TaskMeta.objects.get) as mock_get:
+            sample_task.apply(kwargs=task.kwargs, task_id=str(task.id), ignore_result=True)
+
+        mock_get.assert_called_once()
+        self.assertEqual(
+            [orjson.loads(state[b"state"])["status"] for _, state in self.entries],
+            [STATUS_IN_PROGRESS, STATUS_COMPLETED],
+        )
+        StatusFlusher().apply(self.entries)
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_COMPLETED)
+
+    @patch("core.tasks.heartbeat_monitor")
+    def test_hard_time_limit(self, mock_heartbeat_monitor, mock_get_redis, mock_clear_progress):
+        """Tests that the failure of the killed task is published"""
+
+        self.collect_entries(mock_get_redis)
+        task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        running_task = TaskMetaFactory(user=self.user, status=STATUS_PENDING)
+        running_task.start()
+        StatusFlusher().apply(self.entries)
+        self.entries.clear()
+
+        handle_hard_time_limit(sample_task.name, str(task.id), 10)
+        handle_hard_time_limit(sample_task.name, str(running_task.id), 10)
+
+        self.assertEqual(list(task.errors.values_list("message", flat=True)), ["Hard time limit (10s) exceeded."])
+        with self.assertLogs("core.status_flusher", "WARNING"):
+            StatusFlusher().apply(self.entries)
+        task.refresh_from_db()
+        self.assertEqual(task.status, STATUS_PENDING)
+        started_at = running_task.started_at
+        running_task.refresh_from_db()
+        self.assertEqual(running_task.status, STATUS_FAILED)
+        # the fields unknown to the handler keep the values of the attempt
+        self.assertEqual(running_task.started_at, started_at)
+        self.assertIsNotNone(running_task.finished_at)
+
+
+class TaskAnalyticsTest(APITestCase):
+    """Test cases for the task duration rollups"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_admin = UserFactory(is_staff=True)
+
+    def create_finished_task(self, name: str, status: str, finished_at, queue_wait: float, run_time: float):
+        task = TaskMetaFactory(user=self.user, name=name, status=status)
+        started_at = finished_at - timezone.timedelta(seconds=run_time)
+        TaskMeta.objects.filter(id=task.id).update(
+            created_at=started_at - timezone.timedelta(seconds=queue_wait),
+            started_at=started_at,
+            finished_at=finished_at,
+        )
+        return task
+
+    def test_histograms(self):
+        """Tests that percentiles of the merged histograms are within the relative error of the exact ones"""
+
+        values = [float(value) for value in range(1, 2001)]
+        first, second = {}, {}
+        for i, value in enumerate(values):
+            histogram = first if i % 2 else second
+            index = str(get_histogram_index(value))
+            histogram[index] = histogram.get(index, 0) + 1
+
+        merged = merge_histograms(first, second)
+        self.assertEqual(merged, merge_histograms(second, first))
+        self.assertEqual(sum(merged.values()), len(values))
+        for percent, exact in ((50, 1000), (95, 1900)):
+            self.assertAlmostEqual(get_percentile(merged, percent) / exact, 1, delta=HISTOGRAM_GAMMA - 1)
+        self.assertIsNone(get_percentile({}, 50))
+
+    def test_refresh_rollups(self):
+        """Tests that the rollups are refreshed incrementally from the watermark"""
+
+        finished_at = timezone.datetime(2026, 10, 19, 10, 30, 15, tzinfo=timezone.utc)
+        for run_time in (1, 2, 3):
+            self.create_finished_task("report", STATUS_COMPLETED, finished_at, 0.5, run_time)
+        self.create_finished_task("report", STATUS_FAILED, finished_at, 0.5, 10)
+        self.create_finished_task("report", STATUS_COMPLETED, finished_at + timezone.timedelta(hours=1), 0.5, 1)
+        TaskMetaFactory(user=self.user, name="report", status=STATUS_IN_PROGRESS)
+
+        self.assertEqual(refresh_rollups(finished_at + timezone.timedelta(minutes=1)), 6)
+
+        rollup = TaskRollup.objects.get(granularity="minute", status=STATUS_COMPLETED)
+        self.assertEqual((rollup.bucket, rollup.count), (finished_at.replace(second=0), 3))
+        self.assertAlmostEqual(rollup.run_time_sum, 6000)
+        self.assertEqual(
+            rollup.run_time_histogram, {str(get_histogram_index(value)): 1 for value in (1000, 2000, 3000)}
+        )
+        self.assertEqual(rollup.queue_wait_histogram, {str(get_histogram_index(500)): 3})
+        self.assertEqual(
+            TaskRollup.objects.get(granularity="day", status=STATUS_FAILED).bucket,
+            finished_at.replace(hour=0, minute=0, second=0),
+        )
+
+        # only the tasks finished since the watermark are added
+        self.assertEqual(refresh_rollups(finished_at + timezone.timedelta(hours=2)), 3)
+        self.assertEqual(refresh_rollups(finished_at + timezone.timedelta(hours=2)), 0)
+        day_rollup = TaskRollup.objects.get(granularity="day", status=STATUS_COMPLETED)
+        self.assertEqual(day_rollup.count, 4)
+        self.assertEqual(TaskRollup.objects.filter(granularity="hour", status=STATUS_COMPLETED).count(), 2)
+
+    def test_analytics(self):
+        """Tests that the rollups of the range and their totals are returned to the admins"""
+
+        finished_at = timezone.datetime(2026, 10, 19, 10, 30, tzinfo=timezone.utc)
+        self.create_finished_task("report", STATUS_COMPLETED, finished_at, 1, 1)
+        self.create_finished_task("report", STATUS_COMPLETED, finished_at + timezone.timedelta(hours=1), 1, 3)
+        self.create_finished_task("export", STATUS_COMPLETED, finished_at, 1, 1)
+        refresh_rollups(finished_at + timezone.timedelta(hours=2))
+        query = {"name": "report", "since": "2026-10-19T00:00:00Z", "until": "2026-10-20T00:00:00Z"}
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/tasks/analytics/", query)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get("/api/tasks/analytics/", query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["granularity"], "hour")
+        self.assertEqual([bucket["count"] for bucket in response.data["buckets"]], [1, 1])
+        (total,) = response.data["totals"]
+        self.assertEqual((total["name"], total["count"], total["bucket"]), ("report", 2, None))
+        self.assertAlmostEqual(total["run_time"]["avg"], 2000)
+        self.assertAlmostEqual(total["run_time"]["p95"] / 3000, 1, delta=HISTOGRAM_GAMMA - 1)
+
+        response = self.client.get(
+            "/api/tasks/analytics/", {**query, "granularity": "minute", "until": "2026-10-21T00:00:00Z"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("since", response.data)
+
+
+class TaskImportTest(TestCase):
+    """Test cases for the bulk import of historical tasks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_input(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def get_record(self, **fields) -> dict:
+        return {
+            "username": self.user.username,
+            "name": "imported",
+            "status": STATUS_COMPLETED,
+            "created_at": "2024-01-02T03:04:05Z",
+            "finished_at": "2024-01-02T03:05:05Z",
+            **fields,
+        }
+
+    def write_ndjson(self, records) -> str:
+        return self.write_input("tasks.ndjson", "\n".join(json.dumps(record) for record in records) + "\n")
+
+    def test_import_ndjson(self):
+        """Tests that tasks and their errors are loaded with the given values"""
+
+        task_id = str(uuid.uuid4())
+        path = self.write_ndjson(
+            [
+                self.get_record(
+                    id=task_id,
+                    status=STATUS_FAILED,
+                    created_at="2024-01-02T03:04:05",
+                    finished_at="2024-01-02T03:05:05+00:00",
+                    kwargs={"param1": 1},
+                    errors=[{"message": "x" * 300, "traceback": "line 1\n\tline 2\\"}],
+                ),
+                self.get_record(type="checksum", result="done"),
+            ]
+        )
+        stdout = io.StringIO()
+
+        with CaptureQueriesContext(connection) as context:
+            call_command("import_tasks", path, stdout=stdout)
+
+        self.assertIn("Records: 2, tasks: 2, errors: 1, skipped: 0", stdout.getvalue())
+        copy_queries = [query for query in context.captured_queries if query["sql"].startswith("COPY")]
+        self.assertEqual(len(copy_queries), 2)
+        task = TaskMeta.objects.get(id=task_id)
+        self.assertEqual(
+            (task.user, task.status, task.type, task.kwargs), (self.user, STATUS_FAILED, "sample", {"param1": 1})
+        )
+        self.assertEqual(task.created_at, timezone.datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(task.finished_at, timezone.datetime(2024, 1, 2, 3, 5, 5, tzinfo=timezone.utc))
+        error = task.errors.get()
+        self.assertEqual((error.message, error.traceback), ("x" * 255, "line 1\n\tline 2\\"))
+        self.assertEqual(error.created_at, task.created_at)
+        self.assertEqual(TaskMeta.objects.get(type="checksum").result, "done")
+
+    def test_import_csv(self):
+        """Tests that CSV records with JSON kwargs and errors are loaded"""
+
+        path = self.write_input(
+            "tasks.csv",
+            "username,name,status,created_at,finished_at,kwargs,errors\n"
+            f'{self.user.username},first,COMPLETED,2024-01-02T03:04:05Z,2024-01-02T03:05:05Z,"{{""param1"": 2}}",\n'
+            f"{self.user.username},second,FAILED,2024-01-02T03:04:05Z,2024-01-02T03:05:05Z,,"
+            '"[{""message"": ""boom""}]"\n',
+        )
+
+        call_command("import_tasks", path, stdout=io.StringIO())
+
+        self.assertEqual(TaskMeta.objects.get(name="first").kwargs, {"param1": 2})
+        self.assertEqual(TaskError.objects.get().task.name, "second")
+
+    def test_resume(self):
+        """Tests that the import stops at an invalid record and the rerun continues after the loaded chunks"""
+
+        records = [self.get_record(name=f"task-{i}") for i in range(5)]
+        records[3]["status"] = "DONE"
+        path = self.write_ndjson(records)
+
+        with self.assertRaisesMessage(
+            CommandError, "Record 4: Invalid status 'DONE', only finished tasks can be imported."
+        ):
+            call_command("import_tasks", path, chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(list(TaskMeta.objects.order_by("name").values_list("name", flat=True)), ["task-0", "task-1"])
+        self.assertEqual(ImportCheckpoint.objects.get(source=path).records, 2)
+
+        records[3]["status"] = STATUS_COMPLETED
+        self.write_ndjson(records)
+        stdout = io.StringIO()
+        call_command("import_tasks", path, chunk_size=2, stdout=stdout)
+
+        self.assertIn("Resuming after 2 loaded records.", stdout.getvalue())
+        self.assertEqual(TaskMeta.objects.filter(name__startswith="task-").count(), 5)
+        self.assertEqual(ImportCheckpoint.objects.get(source=path).records, 5)
+
+    def test_skip_invalid(self):
+        """Tests that invalid records are skipped with users resolved once per chunk"""
+
+        path = self.write_input(
+            "tasks.ndjson",
+            "\n".join(
+                [
+                    json.dumps(self.get_record()),
+                    "{not json",
+                    json.dumps(self.get_record(username="unknown")),
+                    json.dumps(self.get_record(created_at="yesterday")),
+                    json.dumps(self.get_record(name="n" * 37)),
+                    json.dumps(self.get_record(result=42)),
+                    json.dumps(self.get_record(status=STATUS_FAILED, errors=[{"message": 1}])),
+                    json.dumps(self.get_record(status=STATUS_FAILED, errors=[{"message": "boom", "traceback": []}])),
+                ]
+            ),
+        )
+
+        with CaptureQueriesContext(connection) as context, self.assertLogs("core.bulk_import", "WARNING") as logs:
+            with open(path, encoding="utf-8") as file:
+                result = TaskImporter(source="test", skip_invalid=True).run(file, "ndjson")
+
+        self.assertEqual(result, ImportResult(records=8, tasks=1, errors=0, skipped=7))
+        self.assertEqual(len(logs.output), 7)
+        self.assertIn("Record 6 is skipped: result 42 is not a string.", logs.output[4])
+        user_queries = [query for query in context.captured_queries if "auth_user" in query["sql"]]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_skip_conflicting(self):
+        """Tests that the conflicting records and the in-flight tasks are skipped instead of failing the chunk"""
+
+        existing_id, duplicate_id = TaskMetaFactory(user=self.user).id, uuid.uuid4()
+        path = self.write_ndjson(
+            [
+                self.get_record(id=str(duplicate_id)),
+                self.get_record(id=str(duplicate_id)),
+                self.get_record(id=str(existing_id)),
+                self.get_record(type="unknown"),
+                self.get_record(callback_url="not a url"),
+                self.get_record(callback_url="https://example.com/" + "a" * 2048),
+                self.get_record(callback_url="https://example.com/hook"),
+                self.get_record(status=STATUS_IN_PROGRESS),
+                self.get_record(status=STATUS_RETRY_PENDING),
+            ]
+        )
+
+        with self.assertLogs("core.bulk_import", "WARNING") as logs:
+            with open(path, encoding="utf-8") as file:
+                result = TaskImporter(source="test", skip_invalid=True).run(file, "ndjson")
+
+        self.assertEqual(result, ImportResult(records=9, tasks=2, errors=0, skipped=7))
+        self.assertIn(f"Record 2 is skipped: Task {duplicate_id} already exists.", logs.output[0])
+        self.assertIn(f"Record 3 is skipped: Task {existing_id} already exists.", logs.output[1])
+        self.assertIn("Record 4 is skipped: Unknown type 'unknown'.", logs.output[2])
+        self.assertIn("Record 8 is skipped: Invalid status 'IN_PROGRESS'", logs.output[5])
+        self.assertTrue(TaskMeta.objects.filter(id=duplicate_id).exists())
+        self.assertTrue(TaskMeta.objects.filter(callback_url="https://example.com/hook").exists())
+
+    def test_skip_invalid_durations(self):
+        """Tests that the records without a finish time or finished before the start are skipped"""
+
+        path = self.write_ndjson(
+            [
+                self.get_record(finished_at=None),
+                self.get_record(started_at="2024-01-02T03:06:05Z"),
+                self.get_record(started_at="2024-01-02T03:05:05Z"),
+            ]
+        )
+
+        with self.assertLogs("core.bulk_import", "WARNING") as logs:
+            with open(path, encoding="utf-8") as file:
+                result = TaskImporter(source="test", skip_invalid=True).run(file, "ndjson")
+
+        self.assertEqual(result, ImportResult(records=3, tasks=1, errors=0, skipped=2))
+        self.assertIn("Record 1 is skipped: finished_at is required.", logs.output[0])
+        self.assertIn("Record 2 is skipped: finished_at is earlier than started_at.", logs.output[1])
+
+    def test_import_rollups(self):
+        """Tests that the tasks finished before the rollup watermark are added to the rollups once"""
+
+        TaskMetaFactory(
+            user=self.user,
+            name="imported",
+            status=STATUS_COMPLETED,
+            started_at=timezone.datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            finished_at=timezone.datetime(2024, 1, 2, 3, 5, 35, tzinfo=timezone.utc),
+        )
+        refresh_rollups(until=timezone.datetime(2024, 6, 1, tzinfo=timezone.utc))
+        path = self.write_ndjson(
+            [
+                self.get_record(started_at="2024-01-02T03:04:35Z"),
+                # finished after the watermark, it's left for the next refresh
+                self.get_record(started_at="2024-06-01T00:00:00Z", finished_at="2024-06-01T00:00:30Z"),
+            ]
+        )
+
+        call_command("import_tasks", path, stdout=io.StringIO())
+
+        rollup = TaskRollup.objects.get(granularity=ROLLUP_GRANULARITY_DAY, name="imported")
+        self.assertEqual((rollup.count, rollup.run_time_sum), (2, 120000))
+        refresh_rollups(until=timezone.datetime(2024, 7, 1, tzinfo=timezone.utc))
+        self.assertListEqual(
+            list(
+                TaskRollup.objects.filter(granularity=ROLLUP_GRANULARITY_DAY, name="imported")
+                .order_by("bucket")
+                .values_list("count", "run_time_sum")
+            ),
+            [(2, 120000), (1, 30000)],
+        )
+
+
+class FairShareDispatchTest(APITestCase):
+    """Test cases for the per-user fair-share dispatching"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.heavy_user = UserFactory()
+        cls.light_user = UserFactory()
+
+    def test_allocate(self):
+        """Tests that the slots are shared in proportion to the weights and small queues are drained first"""
+
+        def allocate(pending: dict, weights: dict, capacity: int) -> dict:
+            return DeficitRoundRobin().allocate(pending, weights, capacity)
+
+        self.assertEqual(allocate({"a": 100, "b": 100}, {"a": 3}, 8), {"a": 6, "b": 2})
+        self.assertEqual(allocate({"a": 100, "b": 100}, {"b": 0.5}, 9), {"a": 6, "b": 3})
+        self.assertEqual(allocate({"heavy": 1000, "light": 1}, {}, 4), {"heavy": 3, "light": 1})
+        self.assertEqual(allocate({"a": 2, "b": 1}, {}, 10), {"a": 2, "b": 1})
+        self.assertEqual(allocate({"a": 2}, {}, 0), {"a": 0})
+
+    def test_allocate_by_turns(self):
+        """Tests that the turns and the deficits are continued by the next allocations"""
+
+        scheduler = DeficitRoundRobin()
+        allocations = [scheduler.allocate({"a": 100, "b": 100, "c": 100}, {}, 1) for _ in range(6)]
+        self.assertEqual(
+            [next(q for q, slots in allocation.items() if slots) for allocation in allocations], list("abcabc")
+        )
+
+        scheduler = DeficitRoundRobin()
+        allocations = [scheduler.allocate({"a": 100, "b": 100}, {"b": 0.5}, 1) for _ in range(6)]
+        self.assertEqual(sum(allocation["a"] for allocation in allocations), 4)
+        self.assertEqual(sum(allocation["b"] for allocation in allocations), 2)
+
+        # drained queues are forgotten, a new queue is visited first
+        scheduler.allocate({"a": 1, "b": 100}, {}, 1)
+        self.assertNotIn("a", scheduler.deficits)
+        self.assertEqual(scheduler.allocate({"b": 100, "c": 1}, {}, 1), {"b": 0, "c": 1})
+
+    @override_settings(FAIR_SHARE_DISPATCH=True)
+    @patch("core.fair_share.current_app.send_task")
+    @patch("core.tasks.sample_task.apply_async")
+    def test_dispatch(self, mock_apply_async, mock_send_task):
+        """Tests that created tasks wait in the user queues and are published to the free slots by turns"""
+
+        for user, count in ((self.heavy_user, 5), (self.light_user, 2)):
+            self.client.force_authenticate(user=user)
+            for i in range(count):
+                response = self.client.post(
+                    "/api/tasks/", {"name": f"task-{i}", "params": {"param1": 1}, "options": {}}, format="json"
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_apply_async.assert_not_called()
+        self.assertEqual(PendingDispatch.objects.count(), 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dispatch_pending_tasks(capacity=4), 4)
+
+        dispatched_ids = [call.kwargs["task_id"] for call in mock_send_task.call_args_list]
+        dispatched_users = list(
+            TaskMeta.objects.filter(id__in=dispatched_ids).values_list("user", flat=True).order_by("user")
+        )
+        self.assertEqual(dispatched_users, [self.heavy_user.id] * 2 + [self.light_user.id] * 2)
+        self.assertEqual(mock_send_task.call_args.args, (sample_task.name,))
+        # the dispatched tasks occupy the slots until they are finished
+        self.assertEqual(dispatch_pending_tasks(capacity=4), 0)
+        TaskMeta.objects.filter(id__in=dispatched_ids).update(status=STATUS_COMPLETED)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dispatch_pending_tasks(capacity=4), 3)
+        self.assertFalse(PendingDispatch.objects.exists())
+        self.assertEqual(mock_send_task.call_count, 7)
+
+    @override_settings(FAIR_SHARE_DISPATCH=True)
+    @patch("core.fair_share.current_app.send_task")
+    @patch("core.tasks.sample_task.apply_async")
+    def test_dispatch_by_turns(self, mock_apply_async, mock_send_task):
+        """Tests that the slots freed one by one are given to the users by turns"""
+
+        for user, count in ((self.heavy_user, 3), (self.light_user, 2)):
+            for i in range(count):
+                task = TaskMetaFactory(user=user)
+                PendingDispatch.objects.create(task=task, user=user, name=sample_task.name)
+
+        dispatched_users = []
+        for _ in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(dispatch_pending_tasks(capacity=1), 1)
+            task = TaskMeta.objects.get(id=mock_send_task.call_args.kwargs["task_id"])
+            dispatched_users.append(task.user_id)
+            TaskMeta.objects.filter(id=task.id).update(status=STATUS_COMPLETED)
+
+        self.assertEqual(dispatched_users, [self.heavy_user.id, self.light_user.id] * 2 + [self.heavy_user.id])
+        self.assertFalse(FairShareQueue.objects.exists())
+
+    @patch("core.fair_share.current_app.send_task")
+    def test_dispatch_on_commit(self, mock_send_task):
+        """Tests that the tasks are published only after the dispatch is committed"""
+
+        task = TaskMetaFactory(user=self.light_user)
+        PendingDispatch.objects.create(task=task, user=self.light_user, name=sample_task.name)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(dispatch_pending_tasks(capacity=1), 1)
+        mock_send_task.assert_not_called()
+
+        callbacks[0]()
+        mock_send_task.assert_called_once_with(sample_task.name, kwargs={}, task_id=str(task.id))
+
+    def test_cancel(self):
+        """Tests that the canceled task is removed from the user queue"""
+
+        task = TaskMetaFactory(user=self.light_user)
+        PendingDispatch.objects.create(task=task, user=self.light_user, name=sample_task.name)
+        self.client.force_authenticate(user=self.light_user)
+
+        with patch("core.views.AsyncResult"):
+            response = self.client.post(f"/api/tasks/{task.id}/cancel/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(PendingDispatch.objects.exists())
+
+    @staticmethod
+    def simulate(fair_share: bool, capacity: int = 10, ticks: int = 600) -> dict:
+        """
+        Simulates workers with `capacity` slots freed one per tick
+
+        Every task takes `capacity` ticks and the workers start busy with the tasks finishing one per tick. A heavy
+        user floods 200 tasks at once, five light users submit a task every 10 ticks.
+
+        :return: waiting times (in ticks) of the tasks per user
+        """
+
+        submissions = [("heavy", 0)] * 200
+        submissions += [(f"light-{user}", tick) for tick in range(0, ticks, 10) for user in range(5)]
+        finishing = list(range(1, capacity + 1))
+        scheduler = DeficitRoundRobin()
+        queues, waits = {}, {}
+        for tick in range(ticks):
+            for user, submitted_at in submissions:
+                if submitted_at == tick:
+                    queues.setdefault(user, []).append(submitted_at)
+            finishing = [finished_at for finished_at in finishing if finished_at > tick]
+            free_slots = capacity - len(finishing)
+            if fair_share:
+                # the round-robin state is kept between the dispatches as dispatch_pending_tasks does
+                allocation = scheduler.allocate({user: len(tasks) for user, tasks in queues.items()}, {}, free_slots)
+            else:
+                # FIFO: the oldest tasks go first whoever has submitted them
+                oldest = sorted((submitted_at, user) for user in queues for submitted_at in queues[user])[:free_slots]
+                allocation = {user: sum(1 for _, owner in oldest if owner == user) for user in queues}
+            for user, slots in allocation.items():
+                started, queues[user] = queues[user][:slots], queues[user][slots:]
+                waits.setdefault(user, []).extend(tick - submitted_at for submitted_at in started)
+                finishing += [tick + capacity] * slots
+        return waits
+
+    def test_simulation(self):
+        """Tests that light users' tail latency stays low under a heavy user's flood"""
+
+        def get_p95(waits: list) -> int:
+            return sorted(waits)[int(len(waits) * 0.95) - 1]
+
+        fifo_waits = self.simulate(fair_share=False)
+        fair_waits = self.simulate(fair_share=True)
+
+        fifo_light = [wait for user, waits in fifo_waits.items() if user != "heavy" for wait in waits]
+        fair_light = [wait for user, waits in fair_waits.items() if user != "heavy" for wait in waits]
+        self.assertGreater(get_p95(fifo_light), 100)
+        self.assertLessEqual(get_p95(fair_light), 5)
+        self.assertEqual(len(fair_light), len(fifo_light))
+        # the heavy user still gets all the capacity left by the light users
+        self.assertEqual(len(fair_waits["heavy"]), len(fifo_waits["heavy"]))
+
+
+class TracingTest(APITestCase):
+    """Test cases for the trace propagation from the API requests to the task executions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.trace_file = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.trace_file))
+        settings_override = override_settings(
+            TRACING_EXPORTER="core.tracing.FileSpanExporter", TRACING_FILE=self.trace_file
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_exporter.cache_clear()
+        self.addCleanup(get_exporter.cache_clear)
+
+    def read_spans(self) -> dict:
+        with open(self.trace_file, "rb") as file:
+            requests = [orjson.loads(line) for line in file]
+        return {
+            span["name"]: span
+            for request in requests
+            for resource_spans in request["resourceSpans"]
+            for scope_spans in resource_spans["scopeSpans"]
+            for span in scope_spans["spans"]
+        }
+
+    @patch("kombu.messaging.Producer.publish")
+    def test_trace_propagation(self, mock_publish):
+        """Tests that the request, publishing, worker pickup and task phases are spans of the same trace"""
+
+        trace_id = "0af7651916cd43dd8448eb211c80319c"
+        with Connection("memory://") as broker_connection, patch(
+            "core.tasks.sample_task.apply_async",
+            side_effect=partial(sample_task.apply_async, connection=broker_connection, ignore_result=True),
+        ):
+            response = self.client.post(
+                "/api/tasks/",
+                {"name": "traced", "params": {"param1": 0, "param2": "a"}, "options": {}},
+                format="json",
+                HTTP_TRACEPARENT=f"00-{trace_id}-b7ad6b7169203331-01",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        headers = mock_publish.call_args.kwargs["headers"]
+
+        sample_task.apply(
+            kwargs={"param1": 0, "param2": "a"}, task_id=response.data["uuid"], headers=headers, ignore_result=True
+        )
+
+        spans = self.read_spans()
+        self.assertEqual({span["traceId"] for span in spans.values()}, {trace_id})
+        for name, parent_name in (
+            ("POST api/tasks/$", None),
+            ("TaskViewSet.create", "POST api/tasks/$"),
+            ("celery.publish", "TaskViewSet.create"),
+            (f"run {sample_task.name}", "celery.publish"),
+            ("task.get_task_meta", f"run {sample_task.name}"),
+            ("task.start", f"run {sample_task.name}"),
+            ("task.execute", f"run {sample_task.name}"),
+            ("task.finish", f"run {sample_task.name}"),
+        ):
+            parent_id = spans[parent_name]["spanId"] if parent_name else "b7ad6b7169203331"
+            self.assertEqual(spans[name]["parentSpanId"], parent_id, name)
+        self.assertEqual(headers["traceparent"], f"00-{trace_id}-{spans['celery.publish']['spanId']}-01")
+        self.assertEqual(TaskMeta.objects.get(id=response.data["uuid"]).status, STATUS_COMPLETED)
+
+    @override_settings(SCHEDULER_MIN_DELAY=10)
+    @patch("kombu.messaging.Producer.publish")
+    def test_deferred_trace_propagation(self, mock_publish):
+        """Tests that the tasks published later by the scheduler or the fair-share dispatcher continue the trace"""
+
+        app = current_app._get_current_object()
+        for options, publish in (
+            ({"start_delay": 10}, partial(release_due_tasks)),
+            ({}, partial(dispatch_pending_tasks, capacity=1)),
+        ):
+            with self.subTest(options=options), override_settings(FAIR_SHARE_DISPATCH=not options):
+                trace_id = uuid.uuid4().hex
+                response = self.client.post(
+                    "/api/tasks/",
+                    {"name": "traced", "params": {"param1": 0, "param2": "a"}, "options": options},
+                    format="json",
+                    HTTP_TRACEPARENT=f"00-{trace_id}-b7ad6b7169203331-01",
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                ScheduledTask.objects.update(due_at=now())
+
+                with Connection("memory://") as broker_connection, patch.object(
+                    app,
+                    "send_task",
+                    side_effect=partial(app.send_task, connection=broker_connection, ignore_result=True),
+                ), self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(publish(), 1)
+
+                publish_span = self.read_spans()["celery.publish"]
+                self.assertEqual(publish_span["traceId"], trace_id)
+                self.assertEqual(
+                    mock_publish.call_args.kwargs["headers"]["traceparent"],
+                    f"00-{trace_id}-{publish_span['spanId']}-01",
+                )
+                TaskMeta.objects.update(status=STATUS_COMPLETED)
+                os.remove(self.trace_file)
+
+    def test_failed_task(self):
+        """Tests that the retry of the failed task is recorded in the span of the execution"""
+
+        task = TaskMetaFactory(user=self.user, kwargs={"param1": 0, "param2": "raise exception before"})
+
+        with patch("core.tasks.sample_task.retry", side_effect=Retry):
+            sample_task.apply(kwargs={**task.kwargs, "max_retries": 1}, task_id=str(task.id), ignore_result=True)
+
+        spans = self.read_spans()
+        run_span = spans[f"run {sample_task.name}"]
+        self.assertEqual(spans["task.handle_retry"]["parentSpanId"], run_span["spanId"])
+        self.assertEqual(spans["task.handle_retry"]["status"]["code"], STATUS_CODE_ERROR)
+        self.assertIn({"key": "celery.state", "value": {"stringValue": "RETRY"}}, run_span["attributes"])
+
+    def test_disabled(self):
+        """Tests that no spans are recorded without the exporter"""
+
+        with override_settings(TRACING_EXPORTER=""):
+            get_exporter.cache_clear()
+            with start_span("noop") as span:
+                span.set_attribute("key", "value")
+            self.assertIsNone(current_span.get())
+        self.assertFalse(os.path.exists(self.trace_file))
+        self.assertIsNone(SpanContext.from_traceparent("00-invalid-01"))
+
+    def test_export_failure(self):
+        """Tests that the failure of the exporter doesn't break the traced request"""
+
+        with patch("core.tracing.FileSpanExporter.export", side_effect=OSError("disk full")), self.assertLogs(
+            "core.tracing", "WARNING"
+        ) as logs:
+            response = self.client.get("/api/tasks/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Failed to export", logs.output[0])
+
+
+class ProfilingTest(APITestCase):
+    """Test cases for the profiling of the API requests and the task executions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        TaskMetaFactory.create_batch(5, user=cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.profiling_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiling_dir)
+        settings_override = override_settings(PROFILING_DIR=self.profiling_dir, PROFILING_TOKEN="secret")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def read_profiles(self) -> List[Tuple[pstats.Stats, dict]]:
+        profiles = []
+        for file_name in sorted(os.listdir(self.profiling_dir)):
+            path, extension = os.path.splitext(os.path.join(self.profiling_dir, file_name))
+            if extension == ".prof":
+                with open(f"{path}.json", "rb") as file:
+                    profiles.append((pstats.Stats(f"{path}.prof"), orjson.loads(file.read())))
+        return profiles
+
+    def test_request_header(self):
+        """Tests that the request with the profiling header is profiled"""
+
+        response = self.client.get("/api/tasks/", HTTP_X_PROFILE="secret")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [(stats, summary)] = self.read_profiles()
+        self.assertTrue(any(function == "list" for _, _, function in stats.stats))
+        self.assertEqual(summary["path"], "/api/tasks/")
+        self.assertEqual(summary["status_code"], status.HTTP_200_OK)
+        self.assertEqual(summary["query_count"], 1)
+        self.assertGreater(summary["serializer_time"], 0)
+        self.assertLess(summary["query_time"] + summary["serializer_time"], 2 * summary["duration"])
+        self.assertIn(f'desc="{summary["query_count"]} queries"', response["Server-Timing"])
+
+    def test_not_profiled_request(self):
+        """Tests that requests with an invalid token or not sampled aren't profiled"""
+
+        response = self.client.get("/api/tasks/", HTTP_X_PROFILE="invalid")
+        with override_settings(PROFILING_TOKEN=""):
+            self.client.get("/api/tasks/", HTTP_X_PROFILE="")
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(os.listdir(self.profiling_dir), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        """Tests that the sampled request is profiled"""
+
+        response = self.client.get(f"/api/tasks/{TaskMeta.objects.first().id}/")
+
+        self.assertIn("Server-Timing", response)
+        self.assertEqual(len(self.read_profiles()), 1)
+
+    @override_settings(TASK_PROFILING_SAMPLE_RATE=1)
+    def test_task_execution(self):
+        """Tests that the sampled task execution is profiled"""
+
+        task = TaskMeta.objects.first()
+
+        sample_task.apply(kwargs={"param1": 0, "param2": "a"}, task_id=str(task.id), ignore_result=True)
+
+        [(stats, summary)] = self.read_profiles()
+        self.assertTrue(any(function == "_execute" for _, _, function in stats.stats))
+        self.assertEqual(summary["task_id"], str(task.id))
+        self.assertGreaterEqual(summary["query_count"], 3)
+        self.assertEqual(summary["serializer_time"], 0)
+
+
+class QueueBacklogMonitorTest(TestCase):
+    """Test cases for the queue backlog monitor and the autoscaler acting on its recommendations"""
+
+    queues = ["threads", "processes"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+
+    def setUp(self):
+        self.broker = Connection("memory://")
+        self.addCleanup(self.broker.release)
+        self.addCleanup(self.delete_queues)
+        self.app = MagicMock()
+        self.app.control.inspect.return_value.active_queues.return_value = {
+            "threads@a": [{"name": "threads"}],
+            "threads@b": [{"name": "threads"}],
+        }
+        self.app.control.inspect.return_value.stats.return_value = {
+            "threads@a": {"pool": {"max-concurrency": 4}},
+            "threads@b": {"pool": {"max-concurrency": 4}},
+        }
+        self.app.control.inspect.return_value.active.return_value = {"threads@a": [{}] * 4, "threads@b": [{}] * 2}
+        self.monitor = BacklogMonitor(self.app, self.queues)
+
+    def delete_queues(self):
+        with self.broker.channel() as channel:
+            for queue in self.queues:
+                channel.queue_delete(queue)
+
+    def publish_messages(self, queue: str, count: int):
+        with self.broker.SimpleQueue(queue) as simple_queue:
+            for _ in range(count):
+                simple_queue.put({})
+
+    def create_autoscaler(self, processes: int, max_concurrency: int = 16) -> BacklogAutoscaler:
+        pool = MagicMock(num_processes=processes)
+        pool.grow.side_effect = lambda n: setattr(pool, "num_processes", pool.num_processes + n)
+        pool.shrink.side_effect = lambda n: setattr(pool, "num_processes", pool.num_processes - n)
+        worker = MagicMock()
+        worker.app.amqp.queues.consume_from = {"threads": MagicMock()}
+        return BacklogAutoscaler(pool, max_concurrency, 1, worker=worker)
+
+    def test_sample(self):
+        """Tests that the sample combines the broker queue depth, the oldest pending task and the busy workers"""
+
+        self.publish_messages("threads", 30)
+        old_tasks = TaskMetaFactory.create_batch(2, user=self.user)
+        TaskMetaFactory(user=self.user)
+        TaskMetaFactory(user=self.user, type="checksum", status=STATUS_COMPLETED, finished_at=now())
+        scheduled_task = TaskMetaFactory(user=self.user)
+        ScheduledTask.objects.create(
+            task=scheduled_task, name="core.tasks.sample_task", due_at=now() + timezone.timedelta(hours=1)
+        )
+        TaskMeta.objects.filter(id__in=[task.id for task in old_tasks]).update(
+            created_at=now() - timezone.timedelta(seconds=120)
+        )
+        TaskMeta.objects.filter(id=scheduled_task.id).update(created_at=now() - timezone.timedelta(hours=1))
+        finished_at = now()
+        TaskMetaFactory.create_batch(
+            3,
+            user=self.user,
+            status=STATUS_COMPLETED,
+            started_at=finished_at - timezone.timedelta(seconds=2),
+            finished_at=finished_at,
+        )
+
+        with self.assertNumQueries(3):
+            threads_sample, processes_sample = self.monitor.sample(self.broker)
+
+        self.assertEqual(threads_sample[:2], ("threads", 30))
+        self.assertAlmostEqual(threads_sample.oldest_pending_age, 120, delta=5)
+        self.assertEqual(threads_sample[3:6], (6, 8, 2))
+        self.assertAlmostEqual(threads_sample.run_time, 2)
+        self.assertEqual(threads_sample.busy_ratio, 0.75)
+        self.assertEqual(processes_sample, QueueSample("processes", 0, None, 0, 0, 0, None))
+
+    def test_recommend_concurrency(self):
+        """Tests the concurrency recommended for the busy workers and the backlog"""
+
+        # 6 / 0.8 slots for the running tasks and 30 * 2 / 30 slots to drain the backlog in time
+        self.assertEqual(recommend_concurrency(QueueSample("threads", 30, 10, 6, 8, 2, 2.0)), 10)
+        # the backlog has waited longer than the target
+        self.assertEqual(recommend_concurrency(QueueSample("threads", 1, 60, 8, 16, 2, 0.1)), 17)
+        # a slot per message until the run time is measured
+        self.assertEqual(recommend_concurrency(QueueSample("threads", 20, None, 0, 1, 1, None)), 20)
+        self.assertEqual(recommend_concurrency(QueueSample("threads", 1000, None, 0, 1, 1, None)), 64)
+        self.assertEqual(recommend_concurrency(QueueSample("threads", 0, None, 0, 8, 1, None)), 1)
+
+    @patch("core.autoscaling.get_redis")
+    def test_autoscaler(self, mock_get_redis):
+        """Tests that the autoscaler resizes the pool to the recommended concurrency of the worker"""
+
+        self.publish_messages("threads", 30)
+        recommendations = self.monitor.publish(self.monitor.sample(self.broker))
+        # 6 / 0.8 slots for the running tasks and a slot per message until the run time is measured
+        self.assertEqual(recommendations, {"threads": 38, "processes": 1})
+        stored = mock_get_redis.return_value.pipeline.return_value.hset.call_args.kwargs["mapping"]
+        self.assertEqual(stored, {"threads": 19, "processes": 1})
+        self.assertEqual(REGISTRY.get_sample_value("task_management_queue_depth", {"queue": "threads"}), 30)
+        self.assertEqual(REGISTRY.get_sample_value("task_management_worker_busy_ratio", {"queue": "threads"}), 0.75)
+
+        mock_get_redis.return_value.hmget.side_effect = lambda key, queues: [stored.get(queue) for queue in queues]
+        autoscaler = self.create_autoscaler(processes=2, max_concurrency=4)
+        autoscaler.maybe_scale()
+        # limited by the max concurrency of the worker
+        self.assertEqual(autoscaler.processes, 4)
+
+        stored["threads"] = 3
+        autoscaler.maybe_scale()
+        # the pool isn't shrunk within the keepalive period after the growth
+        self.assertEqual(autoscaler.processes, 4)
+        autoscaler._last_scale_up -= autoscaler.keepalive
+        autoscaler.maybe_scale()
+        self.assertEqual(autoscaler.processes, 3)
+
+    @patch("core.autoscaling.get_redis")
+    def test_autoscaler_without_recommendation(self, mock_get_redis):
+        """Tests that the pool is resized by the reserved tasks without a recommendation"""
+
+        mock_get_redis.return_value.hmget.side_effect = RedisError("Connection refused")
+        autoscaler = self.create_autoscaler(processes=4)
+
+        with patch("celery.worker.state.reserved_requests", [MagicMock()] * 6):
+            autoscaler.maybe_scale()
+
+        self.assertEqual(autoscaler.processes, 6)
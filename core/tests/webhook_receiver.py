@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import orjson
+
+from core.webhooks import SIGNATURE_HEADER, TIMESTAMP_HEADER, sign_payload
+
+
+class WebhookReceiver:
+    """
+    Local stub receiver of completion webhooks for tests
+
+    Records received webhooks (checking their signatures) and responds with the given statuses in turn
+    (the last one is repeated).
+    """
+
+    def __init__(self, statuses: Optional[List[int]] = None):
+        self.statuses = list(statuses or [200])
+        self.requests: List[dict] = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/webhooks"
+
+    def get_handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                signature = sign_payload(body, int(self.headers[TIMESTAMP_HEADER]))
+                with receiver.lock:
+                    receiver.requests.append(
+                        {
+                            "headers": dict(self.headers),
+                            "payload": orjson.loads(body),
+                            "signature_valid": self.headers[SIGNATURE_HEADER] == signature,
+                        }
+                    )
+                    status = receiver.statuses.pop(0) if len(receiver.statuses) > 1 else receiver.statuses[0]
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "WebhookReceiver":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,307 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from typing import Dict, List, NamedTuple, Optional
+
+import orjson
+import urllib3
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# W3C Trace Context header, it's also passed in the Celery message headers
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_PRODUCER = 4
+SPAN_KIND_CONSUMER = 5
+
+# OTLP status codes
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+class SpanContext(NamedTuple):
+    """Identifiers of the span propagated to its children"""
+
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        match = TRACEPARENT_PATTERN.match(value or "")
+        if match is None:
+            return None
+        return cls(*match.groups())
+
+
+current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    Timed operation of a trace
+
+    Spans are used as context managers, the span is the parent of the spans started inside it. The spans finished in
+    the process are exported together when their local root (the span without a parent in the process) is finished.
+    """
+
+    def __init__(self, name: str, kind: int, attributes: Optional[dict], parent: Optional[SpanContext]):
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.context = SpanContext(parent.trace_id if parent else os.urandom(16).hex(), os.urandom(8).hex())
+        self.status_code = STATUS_CODE_OK
+        self.status_message = ""
+        self.started_at = self.finished_at = None
+        self.local_spans: Optional[List["Span"]] = None
+        self.token = None
+
+    def update_name(self, name: str):
+        self.name = name
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status_code = STATUS_CODE_ERROR
+        self.status_message = message
+
+    def __enter__(self) -> "Span":
+        local_parent = current_span.get()
+        if self.parent is None and local_parent is not None:
+            self.parent = local_parent.context
+            self.context = SpanContext(local_parent.context.trace_id, self.context.span_id)
+        self.local_spans = local_parent.local_spans if local_parent is not None else []
+        self.token = current_span.set(self)
+        self.started_at = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finished_at = time.time_ns()
+        if exc_value is not None:
+            self.set_error(f"{exc_type.__name__}: {exc_value}")
+        current_span.reset(self.token)
+        self.local_spans.append(self)
+        if current_span.get() is None:
+            export_spans(self.local_spans)
+
+    def to_otlp(self) -> dict:
+        """Returns the span in the OTLP JSON encoding"""
+
+        return {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "parentSpanId": self.parent.span_id if self.parent else "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.started_at),
+            "endTimeUnixNano": str(self.finished_at),
+            "attributes": get_otlp_attributes(self.attributes),
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+
+
+class NoopSpan:
+    """Span used while tracing is disabled"""
+
+    context = None
+
+    def update_name(self, name: str):
+        pass
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def get_otlp_attributes(attributes: dict) -> List[dict]:
+    otlp_attributes = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        otlp_attributes.append({"key": key, "value": otlp_value})
+    return otlp_attributes
+
+
+def get_otlp_request(spans: List[Span]) -> dict:
+    """Returns OTLP export request with the spans"""
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": get_otlp_attributes({"service.name": settings.TRACING_SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+            }
+        ]
+    }
+
+
+class SpanExporter(ABC):
+    """Base class of the span exporters (TRACING_EXPORTER)"""
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        """Exports the finished spans of a local root"""
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends spans to TRACING_FILE
+
+    Every line is an OTLP JSON export request, the format read by the OpenTelemetry Collector `otlpjsonfile` receiver.
+    """
+
+    def __init__(self):
+        self.path = settings.TRACING_FILE
+        self.lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        line = orjson.dumps(get_otlp_request(spans)) + b"\n"
+        with self.lock, open(self.path, "ab") as file:
+            file.write(line)
+
+
+class OTLPHTTPSpanExporter(SpanExporter):
+    """
+    Sends spans to the OTLP/HTTP endpoint (TRACING_OTLP_ENDPOINT) of a collector in the JSON encoding
+
+    Spans are sent by a background thread, so the traced requests and tasks don't wait for the collector. If the
+    collector can't keep up, spans exceeding the queue are dropped.
+    """
+
+    queue_size = 1000
+
+    def __init__(self):
+        self.url = f"{settings.TRACING_OTLP_ENDPOINT.rstrip('/')}/v1/traces"
+        self.pool = urllib3.PoolManager(timeout=urllib3.Timeout(total=settings.TRACING_OTLP_TIMEOUT), retries=False)
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def export(self, spans: List[Span]):
+        self.ensure_thread()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning(f"Failed to export {len(spans)} spans: the queue is full.")
+
+    def ensure_thread(self):
+        """Starts the sending thread (again in a forked worker process)"""
+
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.send_queued, name="otlp-exporter", daemon=True)
+                self.thread.start()
+
+    def send_queued(self):
+        while True:
+            spans = self.queue.get()
+            try:
+                self.send(spans)
+            except Exception as error:
+                logger.warning(f"Failed to export {len(spans)} spans: {error}")
+
+    def send(self, spans: List[Span]):
+        response = self.pool.request(
+            "POST", self.url, body=orjson.dumps(get_otlp_request(spans)), headers={"Content-Type": "application/json"}
+        )
+        if response.status >= 300:
+            raise urllib3.exceptions.HTTPError(f"HTTP {response.status}")
+
+
+@lru_cache(maxsize=None)
+def get_exporter() -> Optional[SpanExporter]:
+    """Returns the exporter configured by TRACING_EXPORTER (None if tracing is disabled)"""
+
+    if not settings.TRACING_EXPORTER:
+        return None
+    return import_string(settings.TRACING_EXPORTER)()
+
+
+def export_spans(spans: List[Span]):
+    try:
+        get_exporter().export(spans)
+    except Exception as error:
+        # tracing must not break the traced operations
+        logger.warning(f"Failed to export {len(spans)} spans: {error}")
+
+
+def start_span(
+    name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[dict] = None, parent: Optional[SpanContext] = None
+):
+    """
+    Returns span to be used as a context manager
+
+    :param name: operation name
+    :param kind: one of the SPAN_KIND_ constants
+    :param attributes: span attributes
+    :param parent: remote parent (e.g. from the traceparent header), the current span by default
+    """
+
+    if get_exporter() is None:
+        return NOOP_SPAN
+    return Span(name, kind, attributes, parent)
+
+
+def traced(name: str):
+    """Returns decorator running the function in a span"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_traceparent() -> str:
+    """Returns traceparent of the current span (empty if there is none)"""
+
+    span = current_span.get()
+    return span.context.traceparent if span is not None else ""
+
+
+def inject_trace_context(headers: Dict[str, str]):
+    """Adds the traceparent of the current span to the headers"""
+
+    traceparent = get_traceparent()
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
@@ -0,0 +1,38 @@
+import hashlib
+import os
+import time
+import uuid
+
+import orjson
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generates time-ordered UUID (version 7, RFC 9562)
+
+    The first 48 bits hold Unix timestamp in milliseconds and the next 12 bits hold the sub-millisecond fraction, so
+    the values generated later are sorted later and new rows are appended to the right side of B-tree indexes.
+    """
+
+    milliseconds, nanoseconds = divmod(time.time_ns(), 1_000_000)
+    sub_milliseconds = nanoseconds * 4096 // 1_000_000
+    random_bits = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+
+    value = (milliseconds & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76  # version
+    value |= sub_milliseconds << 64
+    value |= 0b10 << 62  # RFC 4122 variant
+    value |= random_bits
+    return uuid.UUID(int=value)
+
+
+def get_time_limits(task_kwargs: dict) -> dict:
+    """Returns Celery execution options with the time limits stored in the task named parameters"""
+
+    return {option: task_kwargs[option] for option in ("soft_time_limit", "time_limit") if option in task_kwargs}
+
+
+def canonical_hash(data) -> str:
+    """Returns SHA-256 of the JSON-serializable data in canonical form (keys sorted at all levels)"""
+
+    return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
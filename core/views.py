@@ -1,30 +1,59 @@
+import os
+from typing import List, Optional
+
 from celery.result import AsyncResult
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import no_body, swagger_auto_schema
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
 from rest_framework import status
-from rest_framework.decorators import action
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.decorators import (
+    action,
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from core.constants import STATUS_CANCELED
+from core.analytics import get_totals
+from core.constants import DEFAULT_TASK_TYPE, IN_FLIGHT_STATUSES, STATUS_CANCELED
+from core.db_router import is_pinned_to_primary, pin_to_primary, replica_reads
 from core.exceptions import TaskException
-from core.models import TaskMeta
+from core.models import PendingDispatch, ScheduledTask, TaskMeta, TaskRollup
 from core.permissions import TaskBasePermission, TaskCancelPermission
+from core.registry import task_registry
+from core.scheduler import schedule_task
 from core.serializers import (
+    TaskAnalyticsQuerySerializer,
+    TaskAnalyticsSerializer,
     TaskConfigurationSerializer,
     TaskCreateSerializer,
+    TaskProjectionSerializer,
     TaskSerializer,
 )
 from core.swagger_schemas import (
     CANCEL_TASK_RESPONSES,
     CREATE_TASK_REQUEST_BODY,
     CREATE_TASK_RESPONSES,
+    FIELDS_QUERY_PARAMETER,
+    TASK_ANALYTICS_RESPONSES,
 )
-from core.tasks import sample_task
+from core.tracing import SPAN_KIND_PRODUCER, get_traceparent, start_span, traced
+from core.utils import canonical_hash, get_time_limits
 
 
 class TaskViewSet(CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericViewSet):
@@ -34,20 +63,66 @@ class TaskViewSet(CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericV
     queryset = TaskMeta.objects.all()
     permission_classes = [IsAuthenticated, TaskBasePermission]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ["name"]
+    filterset_fields = ["name", "type"]
     search_fields = ["name"]
     ordering_fields = ["name"]
 
+    def dispatch(self, request, *args, **kwargs):
+        token = replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        """Routes reads to the replicas unless the user has written recently (read-your-writes)"""
+
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            pin_to_primary(request.user.id)
+        elif not is_pinned_to_primary(request.user.id):
+            replica_reads.set(True)
+
     def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            # the schema is generated without a request
+            return TaskMeta.objects.none()
         if self.request.user.is_staff:
             return self.queryset
         return TaskMeta.objects.filter(user=self.request.user)
 
-    def perform_create(self, serializer):
-        return serializer.save(user=self.request.user)
+    def get_requested_fields(self) -> Optional[List[str]]:
+        """Returns sparse fieldset requested with the `fields` query parameter"""
+
+        request = getattr(self, "request", None)
+        fields = request.query_params.get("fields") if request is not None else None
+        if not fields:
+            return None
+        requested_fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown_fields = [field for field in requested_fields if field not in TaskSerializer.Meta.fields]
+        if unknown_fields:
+            raise ValidationError({"fields": [f"Unknown fields: {', '.join(unknown_fields)}."]})
+        return requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is TaskSerializer:
+            kwargs.setdefault("fields", self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer, **kwargs):
+        return serializer.save(user=self.request.user, **kwargs)
+
+    @staticmethod
+    def get_in_flight_task(dedup_key: Optional[str]) -> Optional[TaskMeta]:
+        """Returns PENDING, IN_PROGRESS or RETRY_PENDING task with the dedup key"""
+
+        if dedup_key is None:
+            return None
+        return TaskMeta.objects.filter(dedup_key=dedup_key, status__in=IN_FLIGHT_STATUSES).first()
 
     @swagger_auto_schema(request_body=CREATE_TASK_REQUEST_BODY, responses=CREATE_TASK_RESPONSES)
     @transaction.atomic
+    @traced("TaskViewSet.create")
     def create(self, request, *args, **kwargs):
         task_serializer = TaskCreateSerializer(data=request.data)
         task_serializer.is_valid(raise_exception=True)
@@ -57,13 +132,67 @@ class TaskViewSet(CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericV
         options = configuration_serializer.data["options"]
         parameters = configuration_serializer.data["params"]
 
-        task_id = str(self.perform_create(task_serializer).id)
+        task_type = task_registry.get(task_serializer.validated_data.get("type", DEFAULT_TASK_TYPE))
+        start_delay = options.pop("start_delay", 0)
+        callback_url = options.pop("callback_url", "")
+        dedup_key = None
+        if options.pop("dedup", False):
+            dedup_key = canonical_hash(
+                [task_serializer.validated_data["name"], task_type.name, parameters, request.user.id]
+            )
+            in_flight_task = self.get_in_flight_task(dedup_key)
+            if in_flight_task is not None:
+                return Response(TaskCreateSerializer(in_flight_task).data, status=status.HTTP_200_OK)
+        task_kwargs = {**parameters, **options}
 
-        sample_task.apply_async(kwargs={**parameters, **options}, task_id=task_id)
+        try:
+            with transaction.atomic():
+                task = self.perform_create(
+                    task_serializer, kwargs=task_kwargs, callback_url=callback_url, dedup_key=dedup_key
+                )
+        except IntegrityError:
+            # an identical task has been submitted concurrently
+            in_flight_task = self.get_in_flight_task(dedup_key)
+            if in_flight_task is None:
+                raise
+            return Response(TaskCreateSerializer(in_flight_task).data, status=status.HTTP_200_OK)
+        task_id = str(task.id)
+
+        # the task is routed to the queue of the worker pool matching its execution style (see core.registry)
+        if start_delay:
+            schedule_task(task_type.task, task_id, task_kwargs, start_delay)
+        elif settings.FAIR_SHARE_DISPATCH:
+            # published by the fair-share dispatcher (see core.fair_share)
+            PendingDispatch.objects.create(
+                task=task,
+                user=request.user,
+                name=task_type.task.name,
+                kwargs=task_kwargs,
+                traceparent=get_traceparent(),
+            )
+        else:
+            with start_span("celery.publish", SPAN_KIND_PRODUCER, {"celery.task_name": task_type.task.name}):
+                task_type.task.apply_async(kwargs=task_kwargs, task_id=task_id, **get_time_limits(task_kwargs))
 
         headers = self.get_success_headers(task_serializer.data)
         return Response(task_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @swagger_auto_schema(manual_parameters=[FIELDS_QUERY_PARAMETER])
+    def list(self, request, *args, **kwargs):
+        """Lists tasks building the response from values() projection instead of model instances"""
+
+        serializer = TaskProjectionSerializer(fields=self.get_requested_fields())
+        queryset = serializer.project(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset))
+
+    @swagger_auto_schema(manual_parameters=[FIELDS_QUERY_PARAMETER])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @swagger_auto_schema(request_body=no_body, responses=CANCEL_TASK_RESPONSES)
     @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated, TaskCancelPermission])
     def cancel(self, request, *args, **kwargs):
@@ -74,6 +203,50 @@ class TaskViewSet(CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericV
             result = AsyncResult(task.id)
             result.revoke()
             task.finish(STATUS_CANCELED)
+            ScheduledTask.objects.filter(task=task).delete()
+            PendingDispatch.objects.filter(task=task).delete()
             return Response({"message": f"Task {task.id} has been successfully canceled"}, status=status.HTTP_200_OK)
         except TaskException as error:
             return Response({"message": str(error)}, status=status.HTTP_409_CONFLICT)
+
+    @swagger_auto_schema(query_serializer=TaskAnalyticsQuerySerializer, responses=TASK_ANALYTICS_RESPONSES)
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated, IsAdminUser],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def analytics(self, request, *args, **kwargs):
+        """Returns duration rollups of the finished tasks (refreshed periodically by `refresh_task_rollups`)"""
+
+        query_serializer = TaskAnalyticsQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        query = query_serializer.validated_data
+
+        rollups = TaskRollup.objects.filter(
+            granularity=query["granularity"], bucket__gte=query["since"], bucket__lt=query["until"]
+        )
+        for field in ("name", "status"):
+            if field in query:
+                rollups = rollups.filter(**{field: query[field]})
+        rollups = list(rollups.order_by("bucket", "name", "status"))
+
+        serializer = TaskAnalyticsSerializer(
+            {"granularity": query["granularity"], "buckets": rollups, "totals": get_totals(rollups)}
+        )
+        return Response(serializer.data)
+
+
+@swagger_auto_schema(method="get", auto_schema=None)
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, BasicAuthentication])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Exposes the Prometheus metrics (of all the processes sharing PROMETHEUS_MULTIPROC_DIR if it is set)"""
+
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import ipaddress
+import logging
+import math
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
+from typing import List, Optional
+
+import orjson
+import urllib3
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.timezone import now
+
+from core.constants import RETRY_POLICY_FULL_JITTER
+from core.exceptions import UnsafeURLException
+from core.models import WebhookDelivery
+from core.retry import get_retry_delay
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+TIMESTAMP_HEADER = "X-Webhook-Timestamp"
+DELIVERY_ID_HEADER = "X-Webhook-Delivery"
+
+# getaddrinfo has no timeout, so host names are resolved in these threads and waited for WEBHOOK_DNS_TIMEOUT
+resolver = ThreadPoolExecutor(max_workers=settings.WEBHOOK_CONCURRENCY, thread_name_prefix="webhook-resolver")
+
+
+def sign_payload(body: bytes, timestamp: int, secret: Optional[str] = None) -> str:
+    """
+    Returns HMAC-SHA256 signature of the webhook
+
+    The timestamp is signed together with the body, so receivers can reject replayed deliveries.
+    """
+
+    secret = secret or settings.WEBHOOK_SECRET
+    message = str(timestamp).encode() + b"." + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def is_public_address(address: str) -> bool:
+    """Checks that the IP address isn't loopback, private, link-local, reserved or multicast"""
+
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def resolve_callback_url(url: str) -> str:
+    """
+    Returns the IP address the webhooks to the URL are sent to
+
+    Only http(s) URLs whose host resolves to public addresses only are allowed, so webhooks can't reach the services
+    of the internal network, loopback or metadata endpoints (WEBHOOK_ALLOW_PRIVATE_ADDRESSES lifts the address check
+    for local development). The URL is checked when the task is created and again before every delivery, which is
+    sent to the checked address, so the host can't be rebound to an internal one meanwhile.
+
+    :raises UnsafeURLException: if webhooks can't be sent to the URL
+    """
+
+    parsed = urllib3.util.parse_url(url)
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        raise UnsafeURLException("Only http and https URLs are allowed.")
+    host = parsed.host.strip("[]")
+    try:
+        addresses = [
+            info[4][0]
+            for info in resolver.submit(socket.getaddrinfo, host, None, type=socket.SOCK_STREAM).result(
+                timeout=settings.WEBHOOK_DNS_TIMEOUT
+            )
+        ]
+    except (socket.gaierror, UnicodeError, FutureTimeoutError):
+        raise UnsafeURLException(f"Host {host} can't be resolved.")
+    if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES and not all(map(is_public_address, addresses)):
+        raise UnsafeURLException(f"Host {host} resolves to a non-public address.")
+    return addresses[0]
+
+
+class WebhookSender:
+    """
+    Sends completion webhooks queued in the WebhookDelivery table
+
+    Deliveries are claimed in batches with SKIP LOCKED (so several senders can run concurrently) and sent
+    concurrently by a thread pool sharing a keep-alive connection pool. Failed deliveries are retried with
+    exponential backoff and full jitter until WEBHOOK_MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        if not settings.WEBHOOK_SECRET:
+            raise ImproperlyConfigured("WEBHOOK_SECRET must be set to send webhooks.")
+        self.concurrency = concurrency or settings.WEBHOOK_CONCURRENCY
+        self.timeout = timeout or settings.WEBHOOK_TIMEOUT
+        self.http = urllib3.PoolManager(
+            maxsize=self.concurrency, block=True, retries=False, timeout=urllib3.Timeout(total=self.timeout)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="webhook-sender")
+
+    def close(self):
+        self.executor.shutdown()
+        self.http.clear()
+
+    def get_lease(self, count: int) -> float:
+        """
+        Returns time (in seconds) the claimed deliveries are postponed for
+
+        The deliveries are sent in rounds of `concurrency` requests, each taking up to the DNS and the HTTP timeouts,
+        so other senders don't claim them again until the whole batch is over (one more timeout is the margin).
+        """
+
+        return math.ceil(count / self.concurrency) * (settings.WEBHOOK_DNS_TIMEOUT + self.timeout) + self.timeout
+
+    def claim_batch(self, batch_size: int) -> List[WebhookDelivery]:
+        """Locks due deliveries and postpones them for the time of the batch (so a crashed sender loses none)"""
+
+        with transaction.atomic():
+            deliveries = list(
+                WebhookDelivery.objects.select_for_update(skip_locked=True)
+                .filter(failed_at__isnull=True, next_attempt_at__lte=now())
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+                next_attempt_at=now() + timedelta(seconds=self.get_lease(len(deliveries)))
+            )
+        return deliveries
+
+    def deliver(self, delivery: WebhookDelivery) -> Optional[str]:
+        """
+        Sends the webhook
+
+        :return: error message if the delivery has failed
+        """
+
+        body = orjson.dumps(delivery.payload)
+        timestamp = int(time.time())
+        headers = {
+            "Content-Type": "application/json",
+            DELIVERY_ID_HEADER: str(delivery.pk),
+            TIMESTAMP_HEADER: str(timestamp),
+            SIGNATURE_HEADER: sign_payload(body, timestamp),
+        }
+        try:
+            response = self.post(delivery.url, body, headers)
+        except UnsafeURLException as error:
+            return str(error)
+        except urllib3.exceptions.HTTPError as error:
+            return f"{error.__class__.__name__}: {error}"
+        if not 200 <= response.status < 300:
+            return f"HTTP {response.status}"
+        return None
+
+    def post(self, url: str, body: bytes, headers: dict) -> urllib3.HTTPResponse:
+        """Sends the request to the checked address of the URL host (redirects aren't followed)"""
+
+        address = resolve_callback_url(url)
+        parsed = urllib3.util.parse_url(url)
+        pool_kwargs = {}
+        if parsed.scheme == "https":
+            # the certificate is verified against the host name
+            pool_kwargs = {"server_hostname": parsed.host, "assert_hostname": parsed.host}
+        pool = self.http.connection_from_host(address, parsed.port, parsed.scheme, pool_kwargs)
+        return pool.urlopen(
+            "POST",
+            parsed.request_uri,
+            body=body,
+            headers={**headers, "Host": parsed.netloc},
+            redirect=False,
+            preload_content=True,
+        )
+
+    def record_results(self, deliveries: List[WebhookDelivery], errors: List[Optional[str]]):
+        """Deletes delivered webhooks and reschedules (or gives up on) the failed ones"""
+
+        delivered, failed = [], []
+        for delivery, error in zip(deliveries, errors):
+            if error is None:
+                delivered.append(delivery.pk)
+                continue
+            delivery.attempts += 1
+            delivery.last_error = error[: WebhookDelivery._meta.get_field("last_error").max_length]
+            if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.failed_at = now()
+                logger.error(f"Failed to deliver webhook {delivery.pk} to {delivery.url}: {error}")
+            else:
+                delay = get_retry_delay(
+                    RETRY_POLICY_FULL_JITTER,
+                    settings.WEBHOOK_RETRY_DELAY,
+                    settings.WEBHOOK_RETRY_BACKOFF_MAX,
+                    delivery.attempts - 1,
+                )
+                delivery.next_attempt_at = now() + timedelta(seconds=delay)
+                logger.warning(f"Webhook {delivery.pk} to {delivery.url} has failed ({error}), retry in {delay:.0f}s")
+            failed.append(delivery)
+
+        WebhookDelivery.objects.filter(pk__in=delivered).delete()
+        WebhookDelivery.objects.bulk_update(failed, ["attempts", "last_error", "next_attempt_at", "failed_at"])
+
+    def send_batch(self, batch_size: Optional[int] = None) -> int:
+        """
+        Sends a batch of due webhooks
+
+        :param batch_size: maximum number of deliveries in the batch
+        :return: number of attempted deliveries
+        """
+
+        deliveries = self.claim_batch(batch_size or settings.WEBHOOK_BATCH_SIZE)
+        if deliveries:
+            errors = list(self.executor.map(self.deliver, deliveries))
+            self.record_results(deliveries, errors)
+        return len(deliveries)
+
+    def run(self, batch_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        """Sends webhooks until interrupted, polling for new deliveries when the queue is drained"""
+
+        batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+        poll_interval = poll_interval or settings.WEBHOOK_POLL_INTERVAL
+        while True:
+            if self.send_batch(batch_size) < batch_size:
+                time.sleep(poll_interval)
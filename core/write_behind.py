@@ -0,0 +1,28 @@
+import logging
+
+import orjson
+from redis import RedisError
+
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATUS_STREAM_KEY = "task_status_updates"
+STATUS_STREAM_GROUP = "status-flusher"
+
+
+def publish_transition(task_id, state: dict) -> bool:
+    """
+    Publishes the status transition of the task to the stream applied by the status flusher
+
+    :param task_id: TaskMeta id
+    :param state: values of the fields written by the transition
+    :return: False if Redis is not available (the transition is to be saved directly)
+    """
+
+    try:
+        get_redis().xadd(STATUS_STREAM_KEY, {"task": str(task_id), "state": orjson.dumps(state)})
+    except RedisError as error:
+        logger.warning(f"Failed to publish status transition of the task {task_id}: {error}")
+        return False
+    return True
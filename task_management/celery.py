@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_management.settings")
 
@@ -9,3 +10,20 @@ app = Celery("task_management")
 app.config_from_object("task_management.celeryconfig")
 
 app.autodiscover_tasks()
+
+
+@worker_process_shutdown.connect
+def close_db_connections(**kwargs):
+    """
+    Closes persistent database connections of the exiting pool process
+
+    Connections inherited on fork are dropped by the Celery Django fixup (worker_process_init) and obsolete
+    or unusable ones are closed around every task according to CONN_MAX_AGE and CONN_HEALTH_CHECKS.
+    """
+
+    from django.db import connections
+    from prometheus_client import multiprocess
+
+    connections.close_all()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
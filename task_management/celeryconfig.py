@@ -1,11 +1,48 @@
 from task_management.settings import (
+    ANALYTICS_REFRESH_INTERVAL,
+    FAIR_SHARE_INTERVAL,
+    HEARTBEAT_REAPER_INTERVAL,
     RABBITMQ_DEFAULT_PASS,
     RABBITMQ_DEFAULT_USER,
     RABBITMQ_HOST,
     REDIS_HOST,
+    SCHEDULER_RELEASE_INTERVAL,
+    TASK_BATCH_INTERVAL,
+    TASK_MAX_SOFT_TIME_LIMIT,
+    TASK_MAX_TIME_LIMIT,
+    WORKER_AUTOSCALER,
 )
 
 broker_url = f"amqp://{RABBITMQ_DEFAULT_USER}:{RABBITMQ_DEFAULT_PASS}@{RABBITMQ_HOST}//"
 result_backend = f"redis://{REDIS_HOST}/0"
 task_acks_late = True
 task_track_started = True
+# Bound the tasks published without time limits (the API always sets them)
+task_soft_time_limit = TASK_MAX_SOFT_TIME_LIMIT
+task_time_limit = TASK_MAX_TIME_LIMIT
+task_routes = ("core.batching.route_task", "core.registry.route_task")
+# Used by the workers started with --autoscale
+worker_autoscaler = WORKER_AUTOSCALER
+
+beat_schedule = {
+    "release-scheduled-tasks": {
+        "task": "core.tasks.release_scheduled_tasks",
+        "schedule": SCHEDULER_RELEASE_INTERVAL,
+    },
+    "reap-stalled-tasks": {
+        "task": "core.tasks.reap_stalled_tasks",
+        "schedule": HEARTBEAT_REAPER_INTERVAL,
+    },
+    "run-task-batches": {
+        "task": "core.tasks.run_task_batches",
+        "schedule": TASK_BATCH_INTERVAL,
+    },
+    "dispatch-fair-share-tasks": {
+        "task": "core.tasks.dispatch_fair_share_tasks",
+        "schedule": FAIR_SHARE_INTERVAL,
+    },
+    "refresh-task-rollups": {
+        "task": "core.tasks.refresh_task_rollups",
+        "schedule": ANALYTICS_REFRESH_INTERVAL,
+    },
+}
@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.TracingMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -88,9 +91,33 @@ DATABASES = {
         "PASSWORD": env("POSTGRES_PASSWORD"),
         "HOST": env("POSTGRES_HOST"),
         "PORT": env("POSTGRES_PORT"),
+        # Lifetime (in seconds) of persistent connections, 0 closes the connection after every request/task
+        "CONN_MAX_AGE": env.int("POSTGRES_CONN_MAX_AGE", default=600),
+        # Persistent connections are checked before they are reused by a new request/task
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas (comma-separated hosts), TaskViewSet reads are routed to them by core.db_router.ReplicaRouter
+POSTGRES_REPLICA_HOSTS = env.list("POSTGRES_REPLICA_HOSTS", default=[])
+for index, replica_host in enumerate(POSTGRES_REPLICA_HOSTS):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        # Unreachable replicas fail fast (their lag becomes infinite and reads go to the primary)
+        "OPTIONS": {"connect_timeout": env.int("REPLICA_CONNECT_TIMEOUT", default=2)},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+
+# Replicas lagging behind the primary more than this (in seconds) are not used
+REPLICA_MAX_LAG = env.float("REPLICA_MAX_LAG", default=5)
+# How often (in seconds) replication lag is measured
+REPLICA_LAG_CHECK_INTERVAL = env.int("REPLICA_LAG_CHECK_INTERVAL", default=5)
+# How long (in seconds) reads of a user go to the primary after the user's write
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=10)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -133,7 +160,22 @@ STATIC_URL = "/static/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 
+# Precomputed OpenAPI schema (`generate_openapi_schema` command), otherwise it's generated on the first request
+OPENAPI_SCHEMA_FILE = env("OPENAPI_SCHEMA_FILE", default=os.path.join(BASE_DIR, "openapi.json"))
+# Version of the code (e.g. the commit set at build time) the schema file must be generated from, the API sources are
+# hashed instead if it's empty
+OPENAPI_SCHEMA_VERSION = env("OPENAPI_SCHEMA_VERSION", default="")
+
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAdminUser",
@@ -149,11 +191,138 @@ REST_FRAMEWORK = {
 
 TOKEN_EXPIRATION_TIME = int(env("TOKEN_EXPIRATION_TIME"))
 
+# Admin lists of tables with fewer (estimated) rows than this show exact COUNT(*)
+ADMIN_EXACT_COUNT_THRESHOLD = env.int("ADMIN_EXACT_COUNT_THRESHOLD", default=100000)
+
+# Responses shorter than this size (in bytes) are not compressed
+COMPRESSION_MIN_LENGTH = env.int("COMPRESSION_MIN_LENGTH", default=1024)
+
 RABBITMQ_DEFAULT_USER = env("RABBITMQ_DEFAULT_USER")
 RABBITMQ_DEFAULT_PASS = env("RABBITMQ_DEFAULT_PASS")
 RABBITMQ_HOST = env("RABBITMQ_HOST")
 
 REDIS_HOST = os.environ.get("REDIS_HOST")
+REDIS_URL = env("REDIS_URL", default=f"redis://{REDIS_HOST}/1")
+
+# Delays (in seconds) starting from this value are stored in the ScheduledTask table instead of broker ETA messages
+SCHEDULER_MIN_DELAY = env.int("SCHEDULER_MIN_DELAY", default=30)
+# How often (in seconds) due scheduled tasks are published to the broker
+SCHEDULER_RELEASE_INTERVAL = env.int("SCHEDULER_RELEASE_INTERVAL", default=5)
+# Maximum number of scheduled tasks published in one transaction
+SCHEDULER_BATCH_SIZE = env.int("SCHEDULER_BATCH_SIZE", default=1000)
+
+# How often (in seconds) workers send heartbeats of the running tasks
+HEARTBEAT_INTERVAL = env.int("HEARTBEAT_INTERVAL", default=10)
+# IN_PROGRESS tasks without heartbeats for this time (in seconds) are considered stalled
+HEARTBEAT_TIMEOUT = env.int("HEARTBEAT_TIMEOUT", default=60)
+# How often (in seconds) stalled tasks are looked for and maximum number of them handled at once
+HEARTBEAT_REAPER_INTERVAL = env.int("HEARTBEAT_REAPER_INTERVAL", default=30)
+HEARTBEAT_REAPER_BATCH_SIZE = env.int("HEARTBEAT_REAPER_BATCH_SIZE", default=1000)
+# What to do with stalled tasks: "requeue" (at most STALLED_TASKS_MAX_REQUEUES times, then fail) or "fail"
+STALLED_TASKS_POLICY = env("STALLED_TASKS_POLICY", default="requeue")
+STALLED_TASKS_MAX_REQUEUES = env.int("STALLED_TASKS_MAX_REQUEUES", default=1)
+
+# Task progress is written to the database at most once per this interval (in seconds)
+PROGRESS_FLUSH_INTERVAL = env.int("PROGRESS_FLUSH_INTERVAL", default=10)
+# How long (in seconds) the latest task progress is kept in Redis
+PROGRESS_TTL = env.int("PROGRESS_TTL", default=86400)
+
+# Server-side maximums (and defaults) of the task time limits in seconds: when the soft limit is exceeded the task
+# is retried or failed, when the hard limit is exceeded the worker process running the task is killed
+TASK_MAX_SOFT_TIME_LIMIT = env.int("TASK_MAX_SOFT_TIME_LIMIT", default=3600)
+TASK_MAX_TIME_LIMIT = env.int("TASK_MAX_TIME_LIMIT", default=3660)
+
+# Tasks submitted with the `batch` option are routed to this queue and executed by `run_task_batches` (Celery beat
+# runs it every TASK_BATCH_INTERVAL seconds) in batches of at most TASK_BATCH_SIZE tasks
+TASK_BATCH_QUEUE = env("TASK_BATCH_QUEUE", default="batch")
+TASK_BATCH_SIZE = env.int("TASK_BATCH_SIZE", default=100)
+TASK_BATCH_INTERVAL = env.int("TASK_BATCH_INTERVAL", default=1)
+# Maximum (and default) soft time limit in seconds of a batched task, the tasks of a batch run one after another
+# under the time limits of `run_task_batches`, so only short tasks are accepted
+TASK_BATCH_MAX_RUN_TIME = env.int("TASK_BATCH_MAX_RUN_TIME", default=5)
+
+# Write-behind mode: workers publish status transitions to a Redis stream instead of updating TaskMeta rows, the
+# status flusher (`flush_status_updates` command) applies them in batches of at most STATUS_FLUSH_BATCH_SIZE
+# transitions, waiting at most STATUS_FLUSH_MAX_STALENESS seconds to fill a batch
+STATUS_WRITE_BEHIND = env.bool("STATUS_WRITE_BEHIND", default=False)
+STATUS_FLUSH_BATCH_SIZE = env.int("STATUS_FLUSH_BATCH_SIZE", default=1000)
+STATUS_FLUSH_MAX_STALENESS = env.float("STATUS_FLUSH_MAX_STALENESS", default=1.0)
+
+# Fair-share mode: created tasks wait in per-user queues and the dispatcher (run every FAIR_SHARE_INTERVAL seconds)
+# publishes them while fewer than FAIR_SHARE_CAPACITY tasks are queued in the broker or running, sharing the free
+# slots between the users in proportion to FAIR_SHARE_WEIGHTS (`username=weight;...`, 1 by default)
+FAIR_SHARE_DISPATCH = env.bool("FAIR_SHARE_DISPATCH", default=False)
+FAIR_SHARE_CAPACITY = env.int("FAIR_SHARE_CAPACITY", default=100)
+FAIR_SHARE_INTERVAL = env.int("FAIR_SHARE_INTERVAL", default=1)
+FAIR_SHARE_WEIGHTS = env.dict("FAIR_SHARE_WEIGHTS", cast={"value": float}, default={})
+
+# Tracing: spans of the API requests and task executions (linked through the Celery message headers) are sent to
+# the TRACING_EXPORTER (import path, e.g. core.tracing.FileSpanExporter or core.tracing.OTLPHTTPSpanExporter),
+# tracing is disabled if it's empty
+TRACING_EXPORTER = env("TRACING_EXPORTER", default="")
+TRACING_SERVICE_NAME = env("TRACING_SERVICE_NAME", default="task-management")
+TRACING_FILE = env("TRACING_FILE", default=os.path.join(BASE_DIR, "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = env("TRACING_OTLP_ENDPOINT", default="http://localhost:4318")
+TRACING_OTLP_TIMEOUT = env.float("TRACING_OTLP_TIMEOUT", default=2.0)
+
+# Profiling: requests sampled with PROFILING_SAMPLE_RATE (0 - 1) or sent with the `X-Profile: <PROFILING_TOKEN>`
+# header and task executions sampled with TASK_PROFILING_SAMPLE_RATE are profiled with cProfile, the stats and
+# the summaries (durations, SQL queries, serializer time) are saved to PROFILING_DIR
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0)
+PROFILING_TOKEN = env("PROFILING_TOKEN", default="")
+TASK_PROFILING_SAMPLE_RATE = env.float("TASK_PROFILING_SAMPLE_RATE", default=0)
+PROFILING_DIR = env("PROFILING_DIR", default=os.path.join(BASE_DIR, "profiles"))
+
+# Queue backlog monitor (`monitor_queues` command): every AUTOSCALE_MONITOR_INTERVAL seconds it samples the depth of
+# AUTOSCALE_QUEUES, the age of their oldest pending task and the busy ratio of their workers, and recommends the
+# concurrency running the busy tasks at AUTOSCALE_TARGET_BUSY_RATIO and draining the backlog within
+# AUTOSCALE_TARGET_WAIT seconds (with the average run time of the last AUTOSCALE_RUN_TIME_WINDOW seconds).
+# Workers act on the recommendations with WORKER_AUTOSCALER=core.autoscaling:BacklogAutoscaler and --autoscale
+AUTOSCALE_QUEUES = env.list("AUTOSCALE_QUEUES", default=["processes", "threads", "inline"])
+AUTOSCALE_MONITOR_INTERVAL = env.int("AUTOSCALE_MONITOR_INTERVAL", default=10)
+AUTOSCALE_TARGET_WAIT = env.float("AUTOSCALE_TARGET_WAIT", default=30)
+AUTOSCALE_TARGET_BUSY_RATIO = env.float("AUTOSCALE_TARGET_BUSY_RATIO", default=0.8)
+AUTOSCALE_RUN_TIME_WINDOW = env.int("AUTOSCALE_RUN_TIME_WINDOW", default=600)
+AUTOSCALE_MIN_CONCURRENCY = env.int("AUTOSCALE_MIN_CONCURRENCY", default=1)
+AUTOSCALE_MAX_CONCURRENCY = env.int("AUTOSCALE_MAX_CONCURRENCY", default=64)
+WORKER_AUTOSCALER = env("WORKER_AUTOSCALER", default="celery.worker.autoscale:Autoscaler")
+
+# Duration rollups (/api/tasks/analytics/) are refreshed every ANALYTICS_REFRESH_INTERVAL seconds with the tasks
+# finished at least ANALYTICS_REFRESH_DELAY seconds ago, a response contains at most ANALYTICS_MAX_BUCKETS buckets
+ANALYTICS_REFRESH_INTERVAL = env.int("ANALYTICS_REFRESH_INTERVAL", default=60)
+ANALYTICS_REFRESH_DELAY = env.int("ANALYTICS_REFRESH_DELAY", default=60)
+ANALYTICS_MAX_BUCKETS = env.int("ANALYTICS_MAX_BUCKETS", default=1440)
+
+# Retries of a Celery task within the current and the previous RETRY_BUDGET_WINDOW (in seconds) are limited to
+# RETRY_BUDGET_MIN plus RETRY_BUDGET_RATIO of its attempts, tasks failing over the budget aren't retried
+RETRY_BUDGET_WINDOW = env.int("RETRY_BUDGET_WINDOW", default=60)
+RETRY_BUDGET_RATIO = env.float("RETRY_BUDGET_RATIO", default=0.2)
+RETRY_BUDGET_MIN = env.int("RETRY_BUDGET_MIN", default=10)
+
+# Results of the tasks submitted with the `memoize` option are cached in Redis for this time (in seconds) since the
+# last hit
+RESULT_CACHE_TTL = env.int("RESULT_CACHE_TTL", default=3600)
+# Maximum number of cached results, the least recently used ones are evicted
+RESULT_CACHE_MAX_SIZE = env.int("RESULT_CACHE_MAX_SIZE", default=10000)
+
+# Completion webhooks are signed with HMAC-SHA256 using this secret, it's shared with the receivers (so it must not
+# be reused for anything else), webhooks aren't sent without it
+WEBHOOK_SECRET = env("WEBHOOK_SECRET", default="")
+# Webhooks are sent only to hosts resolving to public addresses unless this is set (for local development)
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = env.bool("WEBHOOK_ALLOW_PRIVATE_ADDRESSES", default=False)
+# Number of concurrent deliveries (and pooled HTTP connections per host) of the webhook sender
+WEBHOOK_CONCURRENCY = env.int("WEBHOOK_CONCURRENCY", default=20)
+WEBHOOK_BATCH_SIZE = env.int("WEBHOOK_BATCH_SIZE", default=100)
+# Timeout (in seconds) of a single delivery
+WEBHOOK_TIMEOUT = env.int("WEBHOOK_TIMEOUT", default=10)
+# Timeout (in seconds) of the callback URL host resolution (on the task creation and before every delivery)
+WEBHOOK_DNS_TIMEOUT = env.float("WEBHOOK_DNS_TIMEOUT", default=2)
+# Failed deliveries are retried with exponential backoff and full jitter up to WEBHOOK_MAX_ATTEMPTS attempts
+WEBHOOK_MAX_ATTEMPTS = env.int("WEBHOOK_MAX_ATTEMPTS", default=8)
+WEBHOOK_RETRY_DELAY = env.int("WEBHOOK_RETRY_DELAY", default=10)
+WEBHOOK_RETRY_BACKOFF_MAX = env.int("WEBHOOK_RETRY_BACKOFF_MAX", default=3600)
+# How often (in seconds) the sender checks for new deliveries once the queue is drained
+WEBHOOK_POLL_INTERVAL = env.float("WEBHOOK_POLL_INTERVAL", default=1)
 
 FLOWER_BASIC_AUTH = env("FLOWER_BASIC_AUTH")
 FLOWER_PORT = env("FLOWER_PORT")
@@ -0,0 +1,20 @@
+"""
+Lean settings profile of Celery workers (DJANGO_SETTINGS_MODULE=task_management.settings_worker)
+
+Workers only need the models and the tasks, so the admin, DRF, drf_yasg, templates and views are not loaded.
+"""
+
+from task_management.settings import *  # noqa: F401, F403
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "core",
+]
+
+MIDDLEWARE = []
+
+TEMPLATES = []
+
+# The Celery Django fixup runs system checks on worker start, which would import the web URLconf (views, DRF, drf_yasg)
+ROOT_URLCONF = "task_management.urls_worker"
@@ -0,0 +1,3 @@
+"""Empty URLconf of the Celery workers settings profile"""
+
+urlpatterns = []